@@ -0,0 +1,183 @@
+"""
+Binary columnar dump format (infodump type 'binary'), a much smaller and faster alternative to the 'map' psv dump
+
+the file is a header followed by one fixed-size frame per dump:
+
+	magic (8 bytes) | header length (uint32) | header (json, padded so the frames start on a 64 byte boundary)
+	(for each dump:) time step (int64) | location of each person (int32[people]) | state of each person for each disease (int8[diseases][people])
+
+the header holds the tables the frames index into: person ids (in population order), disease names, disease states
+(codes are indices into this list) and locations (id and the (mapx,mapy) pixel the map psv would have written for it)
+
+frames are only ever appended, and since they're all the same size the whole thing can be read with numpy.memmap
+(see BinaryDump) without reading it in
+"""
+import json
+import numpy as np
+
+MAGIC = b'SINDUMP1'
+HEADER_ALIGNMENT = 64
+DELIMITER = '|'	#same as Simulation.DUMP_FILE_DELIMITER
+
+'''
+numpy dtype of one frame for this many people and diseases
+'''
+def frame_dtype(num_people,num_diseases):
+	return np.dtype([('time','<i8'),('loc','<i4',(num_people,)),('state','i1',(num_diseases,num_people))])
+
+'''
+bytes for the start of a binary dump file
+
+locations is a list of (location id, mapx, mapy)
+'''
+def header_bytes(person_ids,disease_names,states,locations) -> bytes:
+	header = json.dumps({'people':[int(i) for i in person_ids],
+						 'diseases':list(disease_names),
+						 'states':list(states),
+						 'locations':[[int(x) for x in loc] for loc in locations]}).encode('utf-8')
+	unpadded = len(MAGIC) + 4 + len(header)
+	header += b' '*(-unpadded % HEADER_ALIGNMENT)#json doesn't mind trailing whitespace
+	return MAGIC + np.uint32(len(header)).tobytes() + header
+
+'''
+bytes for one frame: loc is the location table index of each person, state is [disease][person] state codes
+'''
+def frame_bytes(time,loc,state) -> bytes:
+	loc = np.asarray(loc)
+	state = np.asarray(state)
+	frame = np.zeros(1,dtype=frame_dtype(len(loc),state.shape[0]))
+	frame['time'] = time
+	frame['loc'] = loc
+	frame['state'] = state
+	return frame.tobytes()
+
+"""
+Read access to a binary dump
+
+frames is a (read only) memmap of every complete frame in the file, so frames['loc'][t] is where everyone was at the
+t'th dump and frames['state'][t,d] is everyone's state for disease d
+"""
+class BinaryDump:
+
+	def __init__(self,fname):
+		import os
+		self.fname = fname
+		with open(fname,'rb') as f:
+			if f.read(len(MAGIC)) != MAGIC:
+				raise AttributeError(fname + ' is not a binary dump file')
+			header_len = int(np.frombuffer(f.read(4),dtype=np.uint32)[0])
+			header = json.loads(f.read(header_len).decode('utf-8'))
+
+		self.person_ids = header['people']
+		self.diseases = header['diseases']
+		self.states = header['states']
+		self.locations = header['locations']
+		self.data_offset = len(MAGIC) + 4 + header_len
+		self.dtype = frame_dtype(len(self.person_ids),len(self.diseases))
+
+		num_frames = (os.path.getsize(fname) - self.data_offset) // self.dtype.itemsize#ignore a frame that's still being written
+		if num_frames > 0:
+			self.frames = np.memmap(fname,dtype=self.dtype,mode='r',offset=self.data_offset,shape=(num_frames,))
+		else:
+			self.frames = np.zeros(0,dtype=self.dtype)
+
+	def __len__(self):
+		return len(self.frames)
+
+	@property
+	def times(self):
+		return self.frames['time']
+
+	'''
+	for each disease, how many people were in each state at the frame_idx'th dump ([disease][state])
+	'''
+	def state_counts(self,frame_idx):
+		return np.array([np.bincount(self.frames['state'][frame_idx,d].astype(np.int64),minlength=len(self.states)) for d in range(len(self.diseases))],dtype=np.int64).reshape(len(self.diseases),len(self.states))
+
+	'''
+	the map psv header repeats everyone's disease states, which we take from the first frame (the simulation writes
+	the header and the first frame at the same time step, though the array engine fills in the header from the
+	previous day's states)
+	'''
+	def map_psv_header(self) -> str:
+		fields = ['TIME STEP']
+		first = self.frames['state'][0] if len(self) > 0 else None
+		for p,pid in enumerate(self.person_ids):
+			fields.append(str(pid))
+			fields.append('CURRENT LOCATION')
+			for d,dname in enumerate(self.diseases):
+				fields.append(dname)
+				fields.append(self.states[first[d,p]] if first is not None else '')
+		return DELIMITER.join(fields)
+
+	def map_psv_row(self,frame_idx) -> str:
+		frame = self.frames[frame_idx]
+		pixels = [str((mapx,mapy)) for _,mapx,mapy in self.locations]
+		fields = [str(int(frame['time']))]
+		for p,pid in enumerate(self.person_ids):
+			fields.append(str(pid))
+			fields.append(pixels[frame['loc'][p]])
+			for d,dname in enumerate(self.diseases):
+				fields.append(dname)
+				fields.append(self.states[frame['state'][d,p]])
+		return DELIMITER.join(fields)
+
+	def infection_psv_header(self) -> str:
+		return DELIMITER.join(['TIME STEP'] + [dname + ' ' + state for dname in self.diseases for state in self.states] + ['TOTAL'])
+
+	def infection_psv_row(self,frame_idx) -> str:
+		counts = self.state_counts(frame_idx)
+		return DELIMITER.join([str(int(self.frames['time'][frame_idx]))] + [str(c) for c in counts.flatten()] + [str(len(self.person_ids))])
+
+	'''
+	write this out as the psv the 'map' (kind = 'map') or 'infection' (kind = 'infection') infodump would have written
+	'''
+	def to_psv(self,psv_fname,kind='map'):
+		if kind == 'map':
+			header,row = self.map_psv_header,self.map_psv_row
+		elif kind == 'infection':
+			header,row = self.infection_psv_header,self.infection_psv_row
+		else:
+			raise AttributeError('kind should be map or infection, not ' + str(kind))
+		with open(psv_fname,'w') as f:
+			f.write(header() + '\n')
+			for i in range(len(self)):
+				f.write(row(i) + '\n')
+
+'''
+convert a 'map' (or 'map_delta') psv dump to a binary dump, reading it a row at a time with DumpReader: once to find
+every location it mentions, then again to write the frames (with map_delta rows filled in from the rows before them)
+
+the psv doesn't know location ids, so the location table is just the distinct pixels it mentions (with id -1)
+'''
+def psv_to_binary(psv_fname,bin_fname,states=None):
+	from DumpReader import DumpReader
+	if states is None:
+		from SINUtil import DISEASE_STATES_LIST
+		states = DISEASE_STATES_LIST
+	state_code = {s:i for i,s in enumerate(states)}
+
+	dr = DumpReader(psv_fname)
+	if (len(dr) > 1) and dr.is_delta(1):
+		raise AttributeError(psv_fname + ' starts with a map_delta row, so there is nothing to apply its changes to')
+	pixel_index = {}
+	with open(psv_fname,'rb') as f:
+		for row in range(1,len(dr)):
+			for _,pixel,_ in dr.parse_row(row,dr.read_row(f,row)):
+				if pixel not in pixel_index:
+					pixel_index.update({pixel:len(pixel_index)})
+
+	person_index = {pid:p for p,pid in enumerate(dr.person_ids)}
+	with open(bin_fname,'wb') as f:
+		f.write(header_bytes(dr.person_ids,dr.diseases,states,[(-1,x,y) for x,y in pixel_index]))
+		if len(dr) < 2:
+			return
+		for t,people in dr.range(int(dr.times[1]),int(dr.times[-1]) + 1):
+			loc = np.zeros(len(dr.person_ids),dtype=np.int32)
+			state = np.zeros((len(dr.diseases),len(dr.person_ids)),dtype=np.int8)
+			for pid,pixel,person_states in people:
+				p = person_index[pid]
+				loc[p] = pixel_index[pixel]
+				for d,dname in enumerate(dr.diseases):
+					state[d,p] = state_code[person_states[dname]]
+			f.write(frame_bytes(t,loc,state))
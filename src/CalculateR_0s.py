@@ -36,8 +36,8 @@ for disease in diseases_to_measure:
 
 	# setup pop builder
 	pb = PopulationBuilder(s.map, pop_size)
-	pb.set_num_friends_distribution(lambda possible_friends: min(max(int(np.random.normal(6, 3)), 0), possible_friends))
-	pb.set_num_coworkers_distribution(lambda possible: min(max(int(np.random.normal(6, 5)), 0), possible))
+	pb.set_num_friends_distribution(lambda possible_friends: min(max(int(RNG.normal(6, 3)), 0), possible_friends))
+	pb.set_num_coworkers_distribution(lambda possible: min(max(int(RNG.normal(6, 5)), 0), possible))
 	pb.set_partners_distribution(lambda num_people_in_house: min(int(coinflip(0.15)),num_people_in_house))
 	s.create_population(pb)
 
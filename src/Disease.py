@@ -68,6 +68,9 @@ class Disease:
 	def __repr__(self):
 		return "Disease " + str(self.disease_id) + ": " + self.name
 
+	def __hash__(self):
+		return self.disease_id#see Person.__hash__
+
 	def recover(self,person:ps.Person):
 		is_in_hopsital = person.currentLocation.loc_type == 'hospital'
 		hospital_effect = 0.
@@ -92,18 +95,18 @@ class Disease:
 
 	def disease_state_transition(self,person:ps.Person):
 		if (person.disease_state[self] == 'II') and (self.symptom_show()):
-			person.disease_state[self] = 'IS'
+			person.set_disease_state(self,'IS')
 		elif (person.disease_state[self] == 'VII') and (self.symptom_show()):
-			person.disease_state[self] = 'VIS'
+			person.set_disease_state(self,'VIS')
 		elif (person.disease_state[self] == 'IS') and (self.recover(person)):
-			person.disease_state[self] = 'R'
+			person.set_disease_state(self,'R')
 		elif (person.disease_state[self] == 'VIS') and (self.recover(person)):
-			person.disease_state[self] = 'VR'
+			person.set_disease_state(self,'VR')
 		elif (person.disease_state[self] == 'IS') and (self.die(person)):
-			person.disease_state[self] = 'D'
+			person.set_disease_state(self,'D')
 			person.die()	#F
 		elif (person.disease_state[self] == 'VIS') and (self.die(person)):
-			person.disease_state[self] = 'VD'
+			person.set_disease_state(self,'VD')
 			person.die()	#F
 
 		#set the diseases showing symptoms variable
@@ -169,9 +172,53 @@ class Disease:
 		if person.disease_state[self] not in DISEASE_STATES_SUSCEPTIBLE:
 			return#already done
 		if person.disease_state[self] in DISEASE_STATES_VACCINATED:
-			person.disease_state[self] = 'VII'
+			person.set_disease_state(self,'VII')
 		else:
-			person.disease_state[self] = 'II'
+			person.set_disease_state(self,'II')
+
+
+"""
+Running count of how many people are in each state of each disease ([disease x state], states in DISEASE_STATES_LIST
+order), so nobody has to go through the whole population to find out
+
+every person in the population gets a reference to this, and Person.set_disease_state keeps it up to date. anything
+that changes someone's disease_state without going through that will make it wrong
+"""
+class DiseaseStateCounts:
+
+	def __init__(self,diseases:list,population:list):
+		self.diseases = list(diseases)
+		self.population = population
+		self.disease_index = {disease:i for i,disease in enumerate(self.diseases)}
+		self.state_index = {state:i for i,state in enumerate(DISEASE_STATES_LIST)}
+		self.counts = np.zeros((len(self.diseases),len(DISEASE_STATES_LIST)),dtype=np.int64)
+		for person in population:
+			for disease in person.disease_state:
+				if disease in self.disease_index:
+					self.counts[self.disease_index[disease],self.state_index[person.disease_state[disease]]] += 1
+			person.disease_state_counts = self
+
+	"""
+	someone just went from from_state to to_state for this disease
+	"""
+	def move(self,disease,from_state,to_state):
+		if disease in self.disease_index:
+			di = self.disease_index[disease]
+			self.counts[di,self.state_index[from_state]] -= 1
+			self.counts[di,self.state_index[to_state]] += 1
+
+	"""
+	how many people are in any of these states for this disease?
+	"""
+	def count(self,disease,states) -> int:
+		di = self.disease_index[disease]
+		return int(sum(self.counts[di,self.state_index[state]] for state in states))
+
+	"""
+	mapping of disease -> state -> count, like Simulation.count_disease_states
+	"""
+	def as_dict(self) -> dict:
+		return {disease:{state:int(self.counts[di,si]) for state,si in self.state_index.items()} for disease,di in self.disease_index.items()}
 
 
 #this part contains some definitions for a few interesting diseases
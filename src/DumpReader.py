@@ -0,0 +1,193 @@
+"""
+Random access to a 'map' (or 'map_delta') psv dump without reading it all in
+
+the first time a dump is opened we find where every row starts (and its time step, and whether it's a map_delta row
+that only lists who changed) and save that next to it (fname + INDEX_SUFFIX). after that, getting at a row is a seek
+and a read, and rows are only split and parsed when someone asks for them
+
+rows are numbered like the lines of the file, so row 0 is the header and reader[i] is the cells of line i, the same as
+the lists MapWriter used to read the whole file into
+"""
+import re
+import numpy as np
+
+from SINUtil import MAP_DELTA_MARKER
+
+DELIMITER = '|'	#same as Simulation.DUMP_FILE_DELIMITER
+INDEX_SUFFIX = '.dumpindex.npz'
+PIXEL_RE = re.compile(r'\(([0-9]+), ?([0-9]+)\)')
+PERSON_ID_RE = re.compile(r'[0-9]+$')
+
+class DumpReader:
+
+	USE_INDEX_FILE = True	#should the row index be saved next to the dump (and read from there next time)?
+	INDEX_VERSION = 1		#change this whenever the index changes, so old index files aren't used
+	SCAN_CHUNK_SIZE = 1 << 24	#bytes read at a time looking for the ends of rows
+
+	def __init__(self,fname,use_index_file=None):
+		self.fname = fname
+		if use_index_file is not None:
+			self.USE_INDEX_FILE = use_index_file
+
+		if (not self.USE_INDEX_FILE) or (not self.load_index()):
+			self.build_index()
+			if self.USE_INDEX_FILE:
+				self.save_index()
+
+		#the header tells us who's in the dump and which diseases they have
+		self.header = self[0]
+		self.diseases = []
+		i = 3#the name of the first disease (4th cell)
+		while (i < len(self.header)) and (not PERSON_ID_RE.match(self.header[i])):
+			self.diseases.append(self.header[i])
+			i += 2
+		self.cells_per_person = 2 + 2*len(self.diseases)
+		self.person_ids = [int(pid) for pid in self.header[1::self.cells_per_person]]
+		self.keyframes = [int(row) for row in np.flatnonzero(~self.delta)]
+
+	'''
+	what the index file has to match: the dump's size and when it was last changed
+	'''
+	def index_key(self):
+		import os
+		st = os.stat(self.fname)
+		return repr((self.INDEX_VERSION,st.st_size,st.st_mtime_ns))
+
+	'''
+	find where each row starts: offsets[i] is the byte the i'th row (0 being the header) starts at, and offsets[-1] is
+	the end of the file. times and delta are the time step of each row and whether it only has changes (neither mean
+	anything for the header)
+	'''
+	def build_index(self):
+		ends = []
+		with open(self.fname,'rb') as f:
+			pos = 0
+			for chunk in iter(lambda: f.read(self.SCAN_CHUNK_SIZE),b''):
+				ends.append(np.flatnonzero(np.frombuffer(chunk,dtype=np.uint8) == ord('\n')) + (pos + 1))
+				pos += len(chunk)
+		ends = np.concatenate(ends + [np.zeros(0,dtype=np.int64)]).astype(np.int64)
+		if (len(ends) == 0) or (ends[-1] != pos):
+			ends = np.append(ends,pos)#the last row doesn't have to end in a newline
+		self.offsets = np.concatenate([[0],ends]).astype(np.int64)
+
+		#all we need from each row is what comes before its second delimiter
+		nrows = len(self.offsets) - 1
+		self.times = np.zeros(nrows,dtype=np.int64)
+		self.delta = np.zeros(nrows,dtype=bool)
+		marker = MAP_DELTA_MARKER.encode('utf-8')
+		with open(self.fname,'rb') as f:
+			for row in range(1,nrows):
+				f.seek(self.offsets[row])
+				start = f.read(min(64,self.offsets[row+1] - self.offsets[row]))
+				cells = start.rstrip(b'\r\n').split(DELIMITER.encode('utf-8'),2)
+				self.times[row] = int(cells[0])
+				self.delta[row] = (len(cells) > 1) and (cells[1] == marker)
+
+	def save_index(self):
+		import os
+		tmp_fname = self.fname + INDEX_SUFFIX + '.tmp'
+		try:
+			with open(tmp_fname,'wb') as f:
+				np.savez(f,key=np.array(self.index_key()),offsets=self.offsets,times=self.times,delta=self.delta)
+			os.replace(tmp_fname,self.fname + INDEX_SUFFIX)
+		except OSError:
+			pass#we'll just have to build it again next time
+
+	'''
+	read the index saved by save_index, returning whether that worked (it won't if the dump has changed since)
+	'''
+	def load_index(self):
+		import zipfile
+		try:
+			with np.load(self.fname + INDEX_SUFFIX,allow_pickle=False) as index:
+				if str(index['key']) != self.index_key():
+					return False
+				self.offsets = index['offsets']
+				self.times = index['times']
+				self.delta = index['delta']
+		except (OSError,KeyError,ValueError,zipfile.BadZipFile):
+			return False
+		return True
+
+	'''
+	number of rows, including the header
+	'''
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	'''
+	the cells of the row'th row
+	'''
+	def __getitem__(self,row):
+		if row < 0:
+			row += len(self)
+		if not (0 <= row < len(self)):
+			raise IndexError('row ' + str(row) + ' is not in ' + self.fname)
+		with open(self.fname,'rb') as f:
+			return self.read_row(f,row)
+
+	def read_row(self,f,row):
+		f.seek(self.offsets[row])
+		line = f.read(self.offsets[row+1] - self.offsets[row]).decode('utf-8')
+		return line.rstrip('\r\n').split(DELIMITER)
+
+	def is_delta(self,row):
+		return bool(self.delta[row])
+
+	'''
+	the row dumped at time step t
+	'''
+	def row_at(self,t):
+		row = 1 + int(np.searchsorted(self.times[1:],t))
+		if (row >= len(self)) or (self.times[row] != t):
+			raise AttributeError('nothing was dumped at time step ' + str(t) + ' in ' + self.fname)
+		return row
+
+	'''
+	the people listed in this row, as a list of (person id, (mapx,mapy), {disease name:state}). cells, if given, are
+	the row's cells (to save reading them again)
+	'''
+	def parse_row(self,row,cells=None):
+		if cells is None:
+			cells = self[row]
+		first = 2 if self.is_delta(row) else 1
+		people = []
+		for i in range(first,len(cells) - 1,self.cells_per_person):
+			pixel = PIXEL_RE.match(cells[i+1])
+			states = dict(zip(cells[i+2:i+self.cells_per_person:2],cells[i+3:i+self.cells_per_person:2]))
+			people.append((int(cells[i]),(int(pixel.group(1)),int(pixel.group(2))),states))
+		return people
+
+	'''
+	everyone, at time step t (even if that row only has changes), as a list of (person id, (mapx,mapy), {disease
+	name:state}) in the order the header lists them
+	'''
+	def frame(self,t):
+		for _,people in self.range(t,t + 1):
+			return people
+		raise AttributeError('nothing was dumped at time step ' + str(t) + ' in ' + self.fname)
+
+	'''
+	(time step, everyone as frame would give them) for every row dumped from time step t0 up to (not including) t1,
+	in order. rows are read one at a time, and map_delta rows are applied to the previous frame rather than going back
+	to the last full row every time
+	'''
+	def range(self,t0,t1):
+		first = 1 + int(np.searchsorted(self.times[1:],t0))
+		last = 1 + int(np.searchsorted(self.times[1:],t1))
+		if first >= last:
+			return
+		start = first
+		if self.is_delta(first):
+			keyframes = [k for k in self.keyframes if 0 < k <= first]
+			if len(keyframes) == 0:
+				raise AttributeError('row ' + str(first) + ' of ' + self.fname + ' only has changes, and there is no full row before it to apply them to')
+			start = keyframes[-1]
+
+		current = {pid:None for pid in self.person_ids}
+		with open(self.fname,'rb') as f:
+			for row in range(start,last):
+				for pid,pixel,states in self.parse_row(row,self.read_row(f,row)):
+					current[pid] = (pid,pixel,states)
+				if row >= first:
+					yield int(self.times[row]),[person for person in current.values() if person is not None]
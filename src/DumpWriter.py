@@ -0,0 +1,132 @@
+"""
+Writing simulation dumps to disk without making the simulation wait on it
+
+Simulation hands every finished row to a DumpWriter, which keeps the dump files open and writes them from a background
+thread. the queue between the two is bounded, so if the disk can't keep up the simulation is made to wait (rather than
+buffering the whole run in memory), but otherwise it never touches the disk itself
+
+anything not yet written when the interpreter exits (without close having been called) is still written out then
+"""
+import atexit
+import queue
+import threading
+
+class DumpWriter:
+
+	QUEUE_SIZE = 1024	#how many rows can be waiting to be written before whoever is writing them has to wait
+	BUFFER_SIZE = 1 << 20	#bytes of buffering on each open file
+
+	'''
+	threaded = False writes everything immediately on the calling thread instead (still keeping the files open)
+	'''
+	def __init__(self,queue_size=QUEUE_SIZE,threaded=True):
+		self.queue_size = queue_size
+		self.threaded = threaded
+		self.files = {}	#file name -> open handle
+		self.started = {}	#file name -> whether it's binary, for files we've written to before (which get appended to rather than truncated if we have to reopen them)
+		self.queue = None
+		self.thread = None
+		self.error = None	#the first thing writing ran into, raised again by every write/flush until close
+		self.closes_at_exit = False	#whether close is registered to run at exit (from the first write until close)
+
+	def open_file(self,fname,mode,binary):
+		if fname not in self.files:
+			if fname in self.started:
+				binary = self.started[fname]
+			if mode is None:
+				mode = 'a' if fname in self.started else 'w'
+			mode = mode.replace('b','') + ('b' if binary else '')
+			self.files.update({fname:open(fname,mode,buffering=self.BUFFER_SIZE)})
+			self.started.update({fname:binary})
+		return self.files[fname]
+
+	'''
+	actually put this on disk (whichever thread we're on)
+	'''
+	def write_now(self,fname,data,mode=None):
+		binary = isinstance(data,bytes) or ((not isinstance(data,str)) and (len(data) > 0) and isinstance(data[0],bytes))
+		f = self.open_file(fname,mode,binary)
+		if isinstance(data,(str,bytes)):
+			f.write(data)
+		else:
+			f.write((b'' if binary else '').join(data))
+
+	def run(self):
+		while True:
+			item = self.queue.get()
+			try:
+				if item is None:
+					return
+				if self.error is None:
+					self.write_now(*item)
+			except Exception as e:
+				self.error = e
+			finally:
+				self.queue.task_done()
+
+	def start(self):
+		self.queue = queue.Queue(maxsize=self.queue_size)
+		self.thread = threading.Thread(target=self.run,name='DumpWriter',daemon=True)
+		self.thread.start()
+
+	'''
+	once something has gone wrong everything after it is refused (rather than written with a hole before it), so the
+	error sticks around until close
+	'''
+	def raise_error(self,clear=False):
+		if self.error is not None:
+			e = self.error
+			if clear:
+				self.error = None
+			raise e
+
+	'''
+	write data (a string, or a list of strings to be joined) to the end of the file fname. bytes (or a list of them)
+	work the same way, for binary files
+
+	the first time we see a file it is truncated, unless mode says otherwise ('w' or 'a', only used when opening)
+	'''
+	def write(self,fname,data,mode=None):
+		self.raise_error()
+		if not self.closes_at_exit:
+			#the thread is a daemon so it can't keep the interpreter from exiting, which means nothing else waits for it
+			atexit.register(self.close)
+			self.closes_at_exit = True
+		if not self.threaded:
+			try:
+				self.write_now(fname,data,mode)
+			except Exception as e:
+				self.error = e
+				raise
+			return
+		if self.thread is None:
+			self.start()
+		self.queue.put((fname,data,mode))#blocks while the queue is full
+
+	'''
+	wait until everything written so far is on disk
+	'''
+	def flush(self):
+		if self.thread is not None:
+			self.queue.join()
+		for f in self.files.values():
+			f.flush()
+		self.raise_error()
+
+	'''
+	flush and close everything. writing again afterwards is fine, the files get reopened (and appended to), even if
+	writing had failed
+	'''
+	def close(self):
+		if self.closes_at_exit:
+			atexit.unregister(self.close)
+			self.closes_at_exit = False
+		if self.thread is not None:
+			self.queue.put(None)
+			self.thread.join()
+			self.thread = None
+			self.queue = None
+		for f in self.files.values():
+			f.close()
+		self.files.clear()
+		self.raise_error(clear=True)
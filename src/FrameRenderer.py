@@ -0,0 +1,75 @@
+"""
+Drawing animation frames from arrays instead of population objects, so that it can be done in other processes (see
+MapWriter.render_frames_parallel)
+
+everything that's the same for every frame (the base image, where people can be drawn in each location, the colors) is
+given to each worker process once, when it starts (with fork it isn't even copied). after that a frame is just where
+everyone is and what color they are
+"""
+import numpy as np
+
+WORKER = {}	#what init_worker gave this process
+SLOT_HASH = 2654435761	#spreads consecutive people out over a location's slots (Knuth's multiplicative hash)
+
+def init_worker(base,slot_order,slot_starts,colors):
+	WORKER.update({'base':base,
+				   'slot_order':slot_order,
+				   'slot_starts':slot_starts,
+				   'colors':colors})
+
+'''
+which pixel each person goes on: person i is in location loc[i] and is person number person_index[i], and location l
+has the slots (flat pixel indices) slot_order[slot_starts[l]:slot_starts[l+1]] (see LocationPixels.slot_layout)
+
+everyone has a preferred slot in each location that only depends on who they are, so people don't jump around from
+frame to frame. if someone else already has it they get the next free one. once a location's slots run out, the
+people left over share them (and the location is reported as crowded)
+
+returns (flat pixel index of each person, -1 if their location has no pixels at all; the crowded locations)
+'''
+def assign_slots(loc,person_index,slot_order,slot_starts):
+	loc = np.asarray(loc,dtype=np.int64)
+	person_index = np.asarray(person_index,dtype=np.int64)
+	placed = np.full(len(loc),-1,dtype=np.int64)
+	crowded = []
+	order = np.lexsort((person_index,loc))#one location at a time, always in the same order
+	bounds = np.flatnonzero(np.diff(loc[order])) + 1
+	for group in np.split(order,bounds):
+		if len(group) == 0:
+			continue
+		l = loc[group[0]]
+		slots = slot_order[slot_starts[l]:slot_starts[l+1]]
+		n = len(slots)
+		if n == 0:
+			continue
+		if len(group) > n:
+			crowded.append(int(l))
+		taken = np.zeros(n,dtype=bool)
+		for count,i in enumerate(group.tolist()):
+			if count >= n:
+				placed[i] = slots[count % n]#full up, so double up
+				continue
+			s = (person_index[i] * SLOT_HASH) % n
+			while taken[s]:
+				s = (s + 1) % n
+			taken[s] = True
+			placed[i] = slots[s]
+	return placed,crowded
+
+'''
+draw a list of (location index, person index, color code) frames (see MapWriter.frame_arrays) with what init_worker
+was given
+'''
+def draw_frames(frames):
+	return [draw_frame(loc,person_index,color_code,**WORKER) for loc,person_index,color_code in frames]
+
+'''
+draw everyone onto a copy of base: person i goes in their slot (see assign_slots) in location loc[i], in
+colors[color_code[i]]
+'''
+def draw_frame(loc,person_index,color_code,base,slot_order,slot_starts,colors):
+	frame = base.copy()
+	placed,_ = assign_slots(loc,person_index,slot_order,slot_starts)
+	drawn = placed >= 0
+	frame.reshape(-1,frame.shape[2])[placed[drawn]] = colors[np.asarray(color_code)[drawn]]
+	return frame
@@ -31,6 +31,8 @@ LOC_TYPE_INDEX = {	'home':0,
 
 LTI_INV = {LOC_TYPE_INDEX[k]:k for k in LOC_TYPE_INDEX}
 
+LOC_TYPE_RGB = {int(LOC_TYPE_COLORS[k],16):LOC_TYPE_INDEX[k] for k in LOC_TYPE_COLORS}#0xrrggbb -> location type index, for reading images
+
 
 """
 We will use this class to read maps from image files
@@ -56,8 +58,12 @@ class MapReader:
 
 	RECORD_LOCATION_PIXELS = False	#should I bother to write down what pixels are a part of what location? this is used only when writing out gifs
 
+	USE_MAP_CACHE = True			#should I save what I read from an image in a file next to it, and read that instead next time? (see create_map_from_file)
+
+	MAP_CACHE_VERSION = 1			#change this whenever the way maps get read changes, so that old cache files aren't used
+
 
-	def __init__(self,PUBLIC_BLOCK_SIZE=None,CAPACITY_PER_PIXEL=None,TIME_STEP_PER_PIXEL=None,RECORD_LOCATION_PIXELS=None):
+	def __init__(self,PUBLIC_BLOCK_SIZE=None,CAPACITY_PER_PIXEL=None,TIME_STEP_PER_PIXEL=None,RECORD_LOCATION_PIXELS=None,USE_MAP_CACHE=None):
 		self.R_LTC_INTERNAL = {LOC_TYPE_INDEX[k]:k for k in LOC_TYPE_INDEX}#this is just the inverse of the edge_type map
 		self.img = None
 		self.next_loc_idx = len(LOC_TYPE_COLORS)#basically, what's the next location index we'll assign?
@@ -70,9 +76,13 @@ class MapReader:
 			self.TIME_STEP_PER_PIXEL = TIME_STEP_PER_PIXEL
 		if RECORD_LOCATION_PIXELS is not None:
 			self.RECORD_LOCATION_PIXELS = RECORD_LOCATION_PIXELS
+		if USE_MAP_CACHE is not None:
+			self.USE_MAP_CACHE = USE_MAP_CACHE
 
 		self.loc_list = []
 		self.loc_px = {}
+		self.adj_indptr = None	#adjacency between the locations in loc_list (by index) in csr form, see assign_adjacencies_from_labels
+		self.adj_indices = None
 
 	'''
 	Convert a triplet of ints (r,g,b) to a hex
@@ -85,15 +95,27 @@ class MapReader:
 
 		return rx + gx + bx
 
+	'''
+	Turn the image array (rows x columns x rgb(a), alpha is ignored) into an int32 array of LOC_TYPE_INDEX values
+	'''
 	def reformat_imgarray(self,iar):
-		ref = []
-		for row in iar:
-			tmpl = []
-			for px in row:
-				hexval = self.int3_to_hex(px)
-				tmpl.append(LOC_TYPE_INDEX[LTC_INV[hexval]])
-			ref.append(tmpl)
-		return ref
+		iar = np.asarray(iar)
+		if (iar.ndim != 3) or (iar.shape[2] < 3):
+			raise AttributeError('map images should be rows x columns x rgb(a), not ' + str(iar.shape))
+
+		#pack each pixel into 0xrrggbb and look it up in the (sorted) table of known colors
+		rgb = iar[:,:,:3].astype(np.uint32)
+		packed = (rgb[:,:,0] << 16) | (rgb[:,:,1] << 8) | rgb[:,:,2]
+		colors = np.array(sorted(LOC_TYPE_RGB),dtype=np.uint32)
+		types = np.array([LOC_TYPE_RGB[c] for c in sorted(LOC_TYPE_RGB)],dtype=np.int32)
+		idx = np.minimum(np.searchsorted(colors,packed),len(colors) - 1)
+		unknown = colors[idx] != packed
+		if unknown.any():
+			bad = np.argwhere(unknown)
+			shown = ', '.join(str((int(x),int(y))) + ' ' + pad(hex(int(packed[y,x]))[2:],6,withch='0',at_beginning=True) for y,x in bad[:10])
+			raise AttributeError(str(len(bad)) + ' pixel(s) of the map have colors that are not in LOC_TYPE_COLORS: ' + shown + (', ...' if len(bad) > 10 else '') + ' (given as (x, y) color)')
+
+		return types[idx]
 
 	'''
 	Do a bfs starting from these start coordinates, assigning a number to each value we see with edges defined as going from a pixel to all its neighbors, corners not included
@@ -230,32 +252,131 @@ class MapReader:
 
 
 
+	'''
+	Find all the contiguous blocks in img (an int32 array of location types), with the correct limits set for public ones
+	
+	this gives the same blocks, in the same order, as scanning for the next unassigned pixel and calling
+	assign_number_to_contiguous_block on it would: every block is found at its first pixel in raster order, and a public
+	block is whatever is contiguous with that pixel in the PUBLIC_BLOCK_SIZE tile extending right and down from it
+	
+	returns a list of (first pixel's flat index, location type index, pixel flat indices) in that order
+	'''
+	def find_blocks(self,img):
+		from scipy import ndimage
+		w = img.shape[1]
+		blocks = []
+
+		#everything but public is just a connected component of its location type
+		for ltype_i in LTI_INV:
+			if (ltype_i == LOC_TYPE_INDEX['VOID']) or (ltype_i == LOC_TYPE_INDEX['public']):
+				continue
+			labels,nlabels = ndimage.label(img == ltype_i)#the default structure is 4-connected, no corners
+			if nlabels == 0:
+				continue
+			flat = labels.ravel()
+			pixels = np.flatnonzero(flat)
+			order = np.argsort(flat[pixels],kind='stable')#group the pixels by label, keeping them in raster order
+			pixels = pixels[order]
+			starts = np.searchsorted(flat[pixels],np.arange(1,nlabels + 1))
+			for block_pixels in np.split(pixels,starts[1:]):
+				blocks.append((int(block_pixels[0]),ltype_i,block_pixels))
+
+		#public is tiled, starting each tile at the first public pixel not already in one
+		public = (img == LOC_TYPE_INDEX['public'])
+		public_flat = np.flatnonzero(public)
+		public_left = public.ravel()#a view, so it sees the pixels that tiles have taken
+		bx,by = self.PUBLIC_BLOCK_SIZE
+		nxt = 0
+		while True:
+			#skip forward to the next public pixel that isn't in a tile yet
+			while (nxt < len(public_flat)) and (not public_left[public_flat[nxt]]):
+				remaining = public_left[public_flat[nxt:nxt + 1024]]
+				nxt += int(np.argmax(remaining)) if remaining.any() else len(remaining)
+			if nxt >= len(public_flat):
+				break
+			y,x = divmod(int(public_flat[nxt]),w)
+			tile = public[y:y + by,x:x + bx]
+			if tile.all():
+				block = np.ones(tile.shape,dtype=bool)
+			else:
+				labels,_ = ndimage.label(tile)
+				block = (labels == labels[0,0])
+			ty,tx = np.nonzero(block)
+			block_pixels = (ty + y) * w + (tx + x)
+			public[ty + y,tx + x] = False
+			blocks.append((int(block_pixels[0]),LOC_TYPE_INDEX['public'],block_pixels))
+
+		blocks.sort(key=lambda b: b[0])
+		return blocks
+
 	'''
 	Do all the contiguous blocks, with the correct limits set for public ones
 	
 	also do the adjacencies while we're at it
 	'''
 	def assign_all_blocks(self,do_adjacencies=True):
-		x,y = self.scan_to_next(0,0,assigned=False)
-		while (x != -1) and (y != -1):
-			endx = endy = None
-			llimx = llimy = None
-			if self.img[y][x] == LOC_TYPE_INDEX['public']:#then we need to impose limits
-				endx = x + self.PUBLIC_BLOCK_SIZE[0]
-				endy = y + self.PUBLIC_BLOCK_SIZE[1]
+		img = np.asarray(self.img,dtype=np.int32)
+		w = img.shape[1]
+		blocks = self.find_blocks(img)
 
-				llimx = x
-				llimy = y
-			self.assign_number_to_contiguous_block(x,y,endx=endx,endy=endy,llimx=llimx,llimy=llimy)
+		#now size everything up all at once
+		block_of_pixel = np.concatenate([np.full(len(b[2]),i,dtype=np.int64) for i,b in enumerate(blocks)]) if len(blocks) > 0 else np.zeros(0,dtype=np.int64)
+		pixels = np.concatenate([b[2] for b in blocks]) if len(blocks) > 0 else np.zeros(0,dtype=np.int64)
+		npixels = np.bincount(block_of_pixel,minlength=len(blocks))
+		sumx = np.bincount(block_of_pixel,weights=pixels % w,minlength=len(blocks))
+		sumy = np.bincount(block_of_pixel,weights=pixels // w,minlength=len(blocks))
 
-			x,y = self.scan_to_next(x,y,assigned=False)
+		from PersonState import Location
+		labels = img.copy()
+		for i,(first,ltype_i,_) in enumerate(blocks):
+			l = Location(LTI_INV[ltype_i],capacity=int(npixels[i] * self.CAPACITY_PER_PIXEL))
+			l.mapx_center = float(sumx[i]) / float(npixels[i])
+			l.mapy_center = float(sumy[i]) / float(npixels[i])
+			l.mapy,l.mapx = divmod(first,w)#these are examples of pixels known to be within the location
+			l.travel_time = np.sqrt(npixels[i]) * self.TIME_STEP_PER_PIXEL#travel time is assumed to be linear in the side length of a square with equivalent area
+			self.loc_list.append(l)
+		labels.ravel()[pixels] = self.next_loc_idx + block_of_pixel
+		self.next_loc_idx += len(blocks)
+		self.img = labels
 
 		#now do the adjacencies
 		if do_adjacencies:
-			x, y = self.scan_to_next(0, 0, assigned=True)
-			while (x != -1) and (y != -1):
-				self.assign_loc_adjacencies(x,y)
-				x, y = self.scan_to_next(x, y, assigned=True)
+			self.assign_adjacencies_from_labels(labels)
+
+	'''
+	Using the label raster (location numbers as assigned by assign_all_blocks), find which locations touch each other
+	(left-right or up-down, corners don't count) and add them to each other's adj_locs
+
+	this also records the adjacency as csr arrays (adj_indptr, adj_indices: the neighbors of loc_list[i] are
+	loc_list[adj_indices[adj_indptr[i]:adj_indptr[i+1]]]) and, if RECORD_LOCATION_PIXELS is set, fills in loc_px
+	'''
+	def assign_adjacencies_from_labels(self,labels):
+		first = len(LOC_TYPE_COLORS)
+		n = len(self.loc_list)
+
+		#compare every pixel with the one to its right and the one below it
+		a = np.concatenate([labels[:,:-1].ravel(),labels[:-1,:].ravel()]).astype(np.int64)
+		b = np.concatenate([labels[:,1:].ravel(),labels[1:,:].ravel()]).astype(np.int64)
+		touching = (a != b) & (a >= first) & (b >= first)
+		a = a[touching] - first
+		b = b[touching] - first
+		edges = np.unique(np.concatenate([a*n + b,b*n + a]))#both directions, sorted by origin
+		origin,dest = np.divmod(edges,n)
+
+		self.adj_indptr = np.searchsorted(origin,np.arange(n + 1)).astype(np.int64)
+		self.adj_indices = dest.astype(np.int64)
+		for i,j in zip(origin.tolist(),dest.tolist()):
+			self.loc_list[i].adj_locs.add(self.loc_list[j])
+
+		if self.RECORD_LOCATION_PIXELS:
+			self.record_location_pixels(labels)
+
+	'''
+	set loc_px from the label raster
+	'''
+	def record_location_pixels(self,labels):
+		first = len(LOC_TYPE_COLORS)
+		self.loc_px = LocationPixels(np.where(labels >= first,labels - first,-1),self.loc_list)
 
 
 	'''
@@ -267,14 +388,203 @@ class MapReader:
 		self.img = self.reformat_imgarray(farray)
 
 
+	'''
+	what a cache file for reading this image with these settings has to match: the image's contents and every setting
+	that changes what we read out of it
+	'''
+	def map_cache_key(self,fname):
+		import hashlib
+		h = hashlib.sha256()
+		with open(fname,'rb') as f:
+			for chunk in iter(lambda: f.read(1 << 20),b''):
+				h.update(chunk)
+		h.update(repr((self.MAP_CACHE_VERSION,tuple(self.PUBLIC_BLOCK_SIZE),self.CAPACITY_PER_PIXEL,self.TIME_STEP_PER_PIXEL,bool(self.RECORD_LOCATION_PIXELS))).encode('utf-8'))
+		return h.hexdigest()
+
+	def map_cache_fname(self,fname,key):
+		return fname + '.' + key[:16] + '.mapcache.npz'
+
+	'''
+	save everything we read from the image (the locations from loc_list[first_loc] on) to cache_fname
+
+	the label raster is only kept if RECORD_LOCATION_PIXELS is set, since that's the only time anyone needs it
+	'''
+	def save_map_cache(self,cache_fname,key,first_loc):
+		import os
+		locs = self.loc_list[first_loc:]
+		base = self.next_loc_idx - len(locs)#the label of locs[0]
+		contents = {'key':np.array(key),
+					'loc_type':np.array([LOC_TYPE_INDEX[loc.loc_type] for loc in locs],dtype=np.int8),
+					'capacity':np.array([loc.capacity for loc in locs],dtype=np.int64),
+					'mapx':np.array([loc.mapx for loc in locs],dtype=np.int64),
+					'mapy':np.array([loc.mapy for loc in locs],dtype=np.int64),
+					'mapx_center':np.array([loc.mapx_center for loc in locs],dtype=np.float64),
+					'mapy_center':np.array([loc.mapy_center for loc in locs],dtype=np.float64),
+					'travel_time':np.array([loc.travel_time for loc in locs],dtype=np.float64),
+					'adj_indptr':self.adj_indptr[first_loc:] - self.adj_indptr[first_loc],
+					'adj_indices':self.adj_indices[self.adj_indptr[first_loc]:] - first_loc}
+		if self.RECORD_LOCATION_PIXELS:
+			contents.update({'labels':np.where(self.img >= base,self.img - base,-1).astype(np.int32)})
+
+		tmp_fname = cache_fname + '.tmp'
+		try:
+			with open(tmp_fname,'wb') as f:
+				np.savez(f,**contents)
+			os.replace(tmp_fname,cache_fname)#so nobody ever sees half a cache file
+		except OSError:
+			pass#we just won't have a cache (e.g. the image is somewhere we can't write to)
+
+	'''
+	read the locations from a cache file saved by save_map_cache, as if we'd just read the image
+
+	returns whether that worked (it won't if there is no cache file, or it's for something else)
+	'''
+	def load_map_cache(self,cache_fname,key):
+		import zipfile
+		try:
+			with np.load(cache_fname,allow_pickle=False) as cache:
+				if str(cache['key']) != key:
+					return False
+				contents = {k:cache[k] for k in cache.files}
+		except (OSError,KeyError,ValueError,zipfile.BadZipFile):
+			return False
+
+		from PersonState import Location
+		first_loc = len(self.loc_list)
+		base = self.next_loc_idx
+		for i in range(len(contents['loc_type'])):
+			l = Location(LTI_INV[int(contents['loc_type'][i])],capacity=int(contents['capacity'][i]))
+			l.mapx_center = float(contents['mapx_center'][i])
+			l.mapy_center = float(contents['mapy_center'][i])
+			l.mapx = int(contents['mapx'][i])
+			l.mapy = int(contents['mapy'][i])
+			l.travel_time = contents['travel_time'][i]
+			self.loc_list.append(l)
+		self.next_loc_idx += len(contents['loc_type'])
+
+		indptr = contents['adj_indptr']
+		indices = contents['adj_indices'] + first_loc
+		for i in range(len(indptr) - 1):
+			loc = self.loc_list[first_loc + i]
+			for j in indices[indptr[i]:indptr[i+1]].tolist():
+				loc.adj_locs.add(self.loc_list[j])
+		self.adj_indptr = np.concatenate([np.zeros(first_loc,dtype=np.int64),indptr]).astype(np.int64)
+		self.adj_indices = indices.astype(np.int64)
+
+		self.img = None
+		if 'labels' in contents:
+			self.img = np.where(contents['labels'] >= 0,contents['labels'] + base,LOC_TYPE_INDEX['VOID']).astype(np.int32)
+			self.record_location_pixels(self.img)
+		return True
+
+	'''
+	Given an image file, create a map from it. unless USE_MAP_CACHE is turned off, what we read gets saved next to the
+	image (see map_cache_key for when that gets used again)
+	'''
 	def create_map_from_file(self,fname):
-		self.read_from_file(fname)
-		self.assign_all_blocks()
+		cache_fname = key = None
+		if self.USE_MAP_CACHE:
+			key = self.map_cache_key(fname)
+			cache_fname = self.map_cache_fname(fname,key)
+		first_loc = len(self.loc_list)
+		if (cache_fname is None) or (not self.load_map_cache(cache_fname,key)):
+			self.read_from_file(fname)
+			self.assign_all_blocks()
+			if cache_fname is not None:
+				self.save_map_cache(cache_fname,key,first_loc)
 		m = Map(self.loc_list,TIME_STEP_PER_PIXEL=self.TIME_STEP_PER_PIXEL)
+		m.set_adjacency_csr(self.adj_indptr,self.adj_indices)
 		if self.RECORD_LOCATION_PIXELS:
 			m.loc_px = self.loc_px
 		return m
 
+"""
+Which pixels of a map image belong to which locations, as a raster of location indices
+
+labels[y,x] is the index (in loc_list) of the location that pixel (x,y) belongs to, or -1 if it isn't part of one. the
+flat indices of every location's pixels are kept too (grouped by location), so going either way is just an array read
+"""
+class LocationPixels:
+
+	def __init__(self,labels,loc_list):
+		self.labels = np.asarray(labels,dtype=np.int32)
+		self.loc_list = loc_list
+		self.loc_index = {loc:i for i,loc in enumerate(loc_list)}
+
+		flat = self.labels.ravel()
+		pixels = np.flatnonzero(flat >= 0)
+		self.pixel_order = pixels[np.argsort(flat[pixels],kind='stable')].astype(np.int32 if flat.size < (1 << 31) else np.int64)
+		self.starts = np.searchsorted(flat[self.pixel_order],np.arange(len(loc_list) + 1))#location i's pixels are pixel_order[starts[i]:starts[i+1]]
+
+	@property
+	def shape(self):
+		return self.labels.shape
+
+	'''
+	the location at pixel (x,y), or None if there isn't one (or it's off the map)
+	'''
+	def location_at(self,x,y):
+		if (x < 0) or (y < 0) or (y >= self.labels.shape[0]) or (x >= self.labels.shape[1]):
+			return None
+		i = self.labels[y,x]
+		return self.loc_list[i] if i >= 0 else None
+
+	'''
+	flat (y * width + x) indices of the location's pixels
+	'''
+	def pixel_indices(self,location):
+		i = self.loc_index[location]
+		return self.pixel_order[self.starts[i]:self.starts[i+1]]
+
+	'''
+	the location's pixels as arrays (xs,ys)
+	'''
+	def pixel_coords(self,location):
+		ys,xs = np.divmod(self.pixel_indices(location),self.labels.shape[1])
+		return xs,ys
+
+	def npixels(self,location):
+		i = self.loc_index[location]
+		return int(self.starts[i+1] - self.starts[i])
+
+	'''
+	the location's pixels as a set of (x,y)
+	'''
+	def __getitem__(self,location):
+		xs,ys = self.pixel_coords(location)
+		return set(zip(xs.tolist(),ys.tolist()))
+
+	def __contains__(self,location):
+		return (location in self.loc_index) and (self.npixels(location) > 0)
+
+	'''
+	where people can be drawn in each location so that nobody's within separation pixels of anyone else (in any
+	direction, corners included): the pixels on a grid with spacing separation + 1. a location too small to have any
+	of those gets one slot in the middle of its pixels anyway
+
+	returns (slot_order, slot_starts): location i's slots are the flat pixel indices slot_order[slot_starts[i]:slot_starts[i+1]]
+	'''
+	def slot_layout(self,separation):
+		w = self.labels.shape[1]
+		ys,xs = np.divmod(self.pixel_order,w)
+		on_grid = ((xs % (separation + 1)) == 0) & ((ys % (separation + 1)) == 0)
+		loc_of_pixel = np.repeat(np.arange(len(self.loc_list)),np.diff(self.starts))
+		slots = self.pixel_order[on_grid]
+		slot_locs = loc_of_pixel[on_grid]
+
+		no_slots = np.flatnonzero((np.bincount(slot_locs,minlength=len(self.loc_list)) == 0) & (np.diff(self.starts) > 0))
+		slots = np.concatenate([slots,self.pixel_order[(self.starts[no_slots] + self.starts[no_slots + 1]) // 2]])
+		slot_locs = np.concatenate([slot_locs,no_slots])
+
+		order = np.argsort(slot_locs,kind='stable')
+		return slots[order],np.searchsorted(slot_locs[order],np.arange(len(self.loc_list) + 1))
+
+	'''
+	the same thing for the image blown up factor times in each direction
+	'''
+	def expand(self,factor):
+		return LocationPixels(np.repeat(np.repeat(self.labels,factor,axis=0),factor,axis=1),self.loc_list)
+
 """
 This consists essentially of a network of locations that we can travel between where locations are, as defined in PersonState (Location class):
 
@@ -288,26 +598,100 @@ This consists essentially of a network of locations that we can travel between w
 class Map:
 
 	TIME_STEP_PER_PIXEL = 1  # how many time steps does it take to traverse 1 pixel?
+	ROUTE_CACHE_SIZE = 100000	#how many (origin,destination) routes get_path remembers before it starts forgetting the least recently used ones
 
-	def __init__(self,loc_list,TIME_STEP_PER_PIXEL=None):
+	def __init__(self,loc_list,TIME_STEP_PER_PIXEL=None,ROUTE_CACHE_SIZE=None):
 
 		self.loc_list = loc_list#list of locations, they each maintain their own adjacencies
 
-		self.loc_px = {}	#map from location to all the pixels belonging to this location (doesn't get filled except when writing gifs)
+		self.loc_px = None	#LocationPixels saying which pixels belong to which location (doesn't get filled except when writing gifs)
 
 		self.loc_map = {x.id:x for x in self.loc_list}
 
+		self.loc_type_changes = 0	#bumped whenever one of our locations has its type changed, so we know when to redo anything worked out from location types
+		self.watch_locations()
+
 		self.avg_ages_assigned = False
 
 		if TIME_STEP_PER_PIXEL is not None:
 			self.TIME_STEP_PER_PIXEL = TIME_STEP_PER_PIXEL
+		if ROUTE_CACHE_SIZE is not None:
+			self.ROUTE_CACHE_SIZE = ROUTE_CACHE_SIZE
+
+		from collections import OrderedDict
+		self.route_cache = OrderedDict()	#(origin id, destination id) -> path, in least to most recently used order
+		self.route_cache_hits = 0
+		self.route_cache_misses = 0
+
+		self.nearest_hospitals = {}	#location id -> nearest hospital to that location, see get_nearest_hospital_table
+		self.nearest_hospitals_key = None	#what the locations looked like when that was worked out
+
+		self.placable = None	#(placable locations, their avg_age, their age_stdev) see get_placable_table
+		self.placable_key = None	#what the locations looked like when that was worked out
 
+		self.adj_indptr = None	#location adjacency in csr form over positions in loc_list, see get_adjacency_csr
+		self.adj_indices = None
+		self.adj_key = None	#what the locations looked like when that was worked out
+
+
+	'''
+	have all our locations (including any added to loc_list since) bump loc_type_changes when their type changes
+	'''
+	def watch_locations(self):
+		for loc in self.loc_list:
+			if self not in loc.maps:
+				loc.maps.append(self)
 
 	def get_location_by_loc_idx(self,lidx:int):
 		return self.loc_map[lidx]
 
 	'''
-	give me a path I can use to go from a to b along the map
+	give me a path I can use to go from a to b along the map (see calc_path)
+
+	paths are remembered by (a,b) so that everyone's daily commutes only get calculated once. the caller gets their own
+	copy of the path since people use them up as they travel
+	'''
+	def get_path(self,a,b,h=MAP_OPTIMIZATION_FUNCTION,verbose=False):
+		if (h is not MAP_OPTIMIZATION_FUNCTION) or verbose or (self.ROUTE_CACHE_SIZE <= 0):
+			return self.calc_path(a,b,h,verbose)
+
+		key = (a.id,b.id)
+		if key in self.route_cache:
+			self.route_cache_hits += 1
+			self.route_cache.move_to_end(key)
+			return list(self.route_cache[key])
+
+		self.route_cache_misses += 1
+		path = self.calc_path(a,b,h)
+		self.route_cache.update({key:tuple(path)})
+		if len(self.route_cache) > self.ROUTE_CACHE_SIZE:
+			self.route_cache.popitem(last=False)#forget the least recently used one
+		return path
+
+	'''
+	forget all the routes we've remembered (e.g. if locations or their adjacencies have changed)
+	'''
+	def clear_route_cache(self):
+		self.route_cache.clear()
+		self.route_cache_hits = 0
+		self.route_cache_misses = 0
+
+	'''
+	fill in the route cache with the routes these people are going to be taking every day: between home and work, home
+	and their places, and home and the nearest hospital
+	'''
+	def precompute_routes(self,population):
+		for person in population:
+			if person.home is None:
+				continue
+			destinations = [person.workplace,self.get_nearest_hospital(person)] + list(person.places)
+			for dest in destinations:
+				if (dest is not None) and (dest != person.home):
+					self.get_path(person.home,dest)
+					self.get_path(dest,person.home)
+
+	'''
+	calculate a path I can use to go from a to b along the map
 	
 	uses dijkstra/uniform cost with A* manhattan heuristic, moving only on public spaces (the first move is to go from this location to the nearest public one
 		h (parameter) is the heuristic function
@@ -315,7 +699,7 @@ class Map:
 	because the map isn't perfectly represented by such a heuristic, it's technically not admissable, so we're not guaranteed optimality. That doesn't really matter since we only really care that people get from point a to point b and not so much how fast it takes them but how much we spend doing the calculation (euclidean is at least closer to being admissable, but since it generally visits like 2x as many places, we're using manhattan)
 	
 	'''
-	def get_path(self,a,b,h=MAP_OPTIMIZATION_FUNCTION,verbose=False):
+	def calc_path(self,a,b,h=MAP_OPTIMIZATION_FUNCTION,verbose=False):
 		if a == b:
 			return []#we're already there
 		path = []
@@ -431,7 +815,14 @@ class Map:
 		if workable is None:
 			workable = list(filter(lambda x: x.loc_type in WORKABLE_LOCATION_TYPES, self.loc_list))
 
-		return np.random.choice(workable), workable
+		return RNG.choice(workable), workable
+
+	'''
+	n random workable locations (with replacement) at once
+	'''
+	def get_random_workable_locations(self,n):
+		workable = [loc for loc in self.loc_list if loc.loc_type in WORKABLE_LOCATION_TYPES]
+		return RNG.choices(workable,n)
 
 	'''
 	Given a distribution function () -> int, assign to each (relevant) location an average age
@@ -446,49 +837,149 @@ class Map:
 				loc.avg_age = ages_avg_distrib()
 				loc.age_stdev = ages_stdev_distrib()
 		self.avg_ages_assigned = True
+		self.placable_key = None
+
+	'''
+	the placable locations (in loc_list order) with their avg_age and age_stdev as arrays, so that everyone's age_prob
+	can be worked out at once. this is worked out on first use and again whenever locations have been added or had
+	their type changed since
+	'''
+	def get_placable_table(self):
+		key = (len(self.loc_list),self.loc_type_changes)
+		if key != self.placable_key:
+			self.watch_locations()
+			placable = [loc for loc in self.loc_list if loc.loc_type in PLACABLE_LOCATION_TYPES]
+			self.placable = (placable,
+							 np.array([loc.avg_age for loc in placable],dtype=np.float64),
+							 np.array([loc.age_stdev for loc in placable],dtype=np.float64))
+			self.placable_key = key
+		return self.placable
 
 	'''
 	use this person's age to find a random location relevant to them and assign it to them
 	'''
 	def add_random_placable_location(self,person,ages_avg_distrib,ages_stdev_distrib):
-		self.assign_avg_ages(ages_avg_distrib,ages_stdev_distrib)
+		self.add_random_placable_locations(person,1,ages_avg_distrib,ages_stdev_distrib)
 
-		np.random.shuffle(self.loc_list)#in random order
-		loc_closest = self.loc_list[0]
-		loc_closest_val = self.loc_list[0].age_prob(person.age)
-		for loc in self.loc_list:
-			if (loc.loc_type in PLACABLE_LOCATION_TYPES) and (loc not in person.places):#only considering valid values that aren't already in their places list
-				if coinflip(loc.age_prob(person.age)):#with probability Norm(mu,sig), add this to the person's location
-					#then this one is added
-					person.add_place(loc)
-					return
-				else:
-					this_val = loc.age_prob(person.age)
-					if this_val > loc_closest_val:
-						loc_closest = loc
-						loc_closest_val = this_val
+	'''
+	the same thing n times over (without picking anywhere twice)
 
-		person.add_place(loc_closest)#just add the one with the highest probability
+	each time, every placable location they don't already have is added with probability age_prob (Norm(mu,sig)), and
+	if more than one is we take one of those at random (which is what going through them in a random order and taking
+	the first would do). if none are, they get the one with the highest probability
+	'''
+	def add_random_placable_locations(self,person,n,ages_avg_distrib,ages_stdev_distrib):
+		from scipy import stats
+		self.assign_avg_ages(ages_avg_distrib,ages_stdev_distrib)
+		placable,avg_age,age_stdev = self.get_placable_table()
+		if (n <= 0) or (len(placable) == 0):
+			return
+
+		available = np.array([loc not in person.places for loc in placable],dtype=bool)
+		prob = stats.norm.pdf(person.age,avg_age,age_stdev)
+		flips = coinflips(np.broadcast_to(prob,(n,len(placable))))#all the coin flips at once
+		for k in range(n):
+			candidates = np.flatnonzero(available)
+			if len(candidates) == 0:
+				return#they already go everywhere
+			chosen = candidates[flips[k,candidates]]
+			if len(chosen) > 0:
+				i = chosen[RNG.integer(0,len(chosen))]
+			else:
+				i = candidates[np.argmax(prob[candidates])]#just add the one with the highest probability
+			person.add_place(placable[i])
+			available[i] = False
 
 
 	def get_random_house(self,houses=None):
 		if houses is None:
 			houses = list(filter(lambda x: x.loc_type == 'home', self.loc_list))
 
-		hidx = np.random.choice(range(len(houses)))
+		hidx = RNG.integer(0,len(houses))
 		h = houses[hidx]
 		while (h.is_full()) and (len(houses) > 1):
 			del houses[hidx]
-			hidx = np.random.choice(range(len(houses)))
+			hidx = RNG.integer(0,len(houses))
 			h = houses[hidx]
 
 		return h,houses
 
+	'''
+	homes for n people at once, as if get_random_house had been called for each of them in turn and they'd moved in
+
+	everyone picks a house that isn't full at random, all at the same time. houses with fewer spaces left than people
+	who picked them take those who picked them first, and everyone else picks again from the houses that still have
+	room, until everyone has a home
+	'''
+	def get_random_houses(self,n):
+		houses = [loc for loc in self.loc_list if loc.loc_type == 'home']
+		room = np.maximum(np.array([loc.capacity - len(loc.people) for loc in houses],dtype=np.int64),0)
+		assigned = np.full(n,-1,dtype=np.int64)
+		todo = np.arange(n)
+		while len(todo) > 0:
+			open_houses = np.flatnonzero(room > 0)
+			if len(open_houses) == 0:
+				raise AttributeError('the houses do not have enough capacity for ' + str(n) + ' more inhabitants.')
+			picks = open_houses[(RNG.randoms(len(todo))*len(open_houses)).astype(np.int64)]
+
+			#how many people picked the same house before each person did
+			order = np.argsort(picks,kind='stable')
+			sorted_picks = picks[order]
+			group_start = np.flatnonzero(np.concatenate([[True],sorted_picks[1:] != sorted_picks[:-1]]))
+			rank = np.empty(len(picks),dtype=np.int64)
+			rank[order] = np.arange(len(picks)) - np.repeat(group_start,np.diff(np.append(group_start,len(picks))))
+
+			moved_in = rank < room[picks]
+			assigned[todo[moved_in]] = picks[moved_in]
+			room -= np.bincount(picks[moved_in],minlength=len(houses))
+			todo = todo[~moved_in]
+		return [houses[i] for i in assigned]
+
 	'''
 	Find and return the nearest hospital to this person, given by h(x)
 	'''
 	def get_nearest_hospital(self,person,h = MAP_OPTIMIZATION_FUNCTION):
-		person_loc = (person.currentLocation.mapx_center,person.currentLocation.mapy_center)
+		if h is MAP_OPTIMIZATION_FUNCTION:
+			return self.get_nearest_hospital_table()[person.currentLocation.id]
+		return self.calc_nearest_hospital(person.currentLocation,h)
+
+	'''
+	the nearest hospital (by MAP_OPTIMIZATION_FUNCTION) to every location on the map, keyed by location id
+
+	this is worked out on first use and again whenever locations have been added or had their type changed since
+	'''
+	def get_nearest_hospital_table(self):
+		key = (len(self.loc_list),self.loc_type_changes)
+		if key != self.nearest_hospitals_key:
+			self.watch_locations()
+			self.nearest_hospitals = {loc.id:self.calc_nearest_hospital(loc) for loc in self.loc_list}
+			self.nearest_hospitals_key = key
+		return self.nearest_hospitals
+
+	'''
+	the adjacency between locations as csr arrays (indptr,indices): the neighbors of loc_list[i] are
+	loc_list[indices[indptr[i]:indptr[i+1]]], in loc_list order
+
+	maps from MapReader come with this already; otherwise it's built from adj_locs, and rebuilt if locations get added
+	(if you change adj_locs by hand, call calc_adjacency_csr)
+	'''
+	def get_adjacency_csr(self):
+		if (self.adj_indptr is None) or (self.adj_key != len(self.loc_list)):
+			self.calc_adjacency_csr()
+		return self.adj_indptr,self.adj_indices
+
+	def calc_adjacency_csr(self):
+		index = {loc:i for i,loc in enumerate(self.loc_list)}
+		indices = [sorted(index[adj] for adj in loc.adj_locs if adj in index) for loc in self.loc_list]
+		self.set_adjacency_csr(np.cumsum([0] + [len(adj) for adj in indices]).astype(np.int64),np.array([i for adj in indices for i in adj],dtype=np.int64))
+
+	def set_adjacency_csr(self,indptr,indices):
+		self.adj_indptr = indptr
+		self.adj_indices = indices
+		self.adj_key = len(self.loc_list)
+
+	def calc_nearest_hospital(self,location,h = MAP_OPTIMIZATION_FUNCTION):
+		person_loc = (location.mapx_center,location.mapy_center)
 		min_dist = float('inf')
 		min_loc = None
 		for loc in self.loc_list:
@@ -520,6 +1011,10 @@ class MapWriter:
 
 	PEOPLE_MIN_SEPARATION = 1	#measured in pixels, how close can people be to one another (distance of 1 means that there must be a gap of at least 1 pixel in every direction, including the corners)
 
+	ANIMATION_LOOKAHEAD = 4	#how many frames animate can have drawn but not yet written
+
+	FRAME_CHUNK_SIZE = 4	#how many frames each job given to a worker process draws, when drawing them in parallel
+
 
 	DISEASE_STATE_COLOR_MAP_NO_VAX_DISTINCTION = map_tuple_to_uint8({
 		'S' : (43,124,75,255),
@@ -556,19 +1051,22 @@ class MapWriter:
 		self.img_src = None
 		self.M = None
 		self.data = None								#the data we get from the data file
+		self.keyframes = []								#which rows of data are full rows (all of them, except in map_delta dumps)
+		self.loaded_dat_idx = None						#which row of data the population currently reflects
 
 		self.img_expansion_factor = 4					#how much (how many times) bigger should the resulting images be than the original (too small an expansion factor may result in people being drawn on top of each other). in practice, it should be about 2x as big as the original capacity per pixel to make sure there's enough room for everyone
 		self.desaturate_map = False						# how much should we desaturate the map by, in absolute (0-255) value
-		self.src_pixel_map = {}							#mapping of source pixels to the location object they correspond to
-		self.expansion_src_pixel_map = {}				#mapping of original source pixels to new ones (needed for reading the file correctly)
+		self.img_expanded_by = 1						#how many times bigger img_src (and the map's loc_px) is than the image the simulation used
 		self.fps = 10.									#how many frames should I display every second?
 		self.color_map = MapWriter.DISEASE_STATE_COLOR_MAP_NO_VAX_DISTINCTION#this is just the color map we actually use in the logic, some options are defined above
 		self.loop_anim = False
 
 
 		self.anim = []									#the frames of the animation
-		self.occupied_pixels_current = set()			#which pixels are occupied in the current frame? (using this prevents people from being placed on top of one another
+		self.slots = None								#where people can be drawn in each location, see get_slot_layout
+		self.slots_key = None							#what the map and PEOPLE_MIN_SEPARATION were when slots was worked out
 		self.population = []							#this will need to be inferred from the data
+		self.population_index = {}						#person -> their index in population (i.e. their id in the data)
 		self.diseases = {}								#mapping of disease names onto corresponding objects
 
 
@@ -579,52 +1077,51 @@ class MapWriter:
 			mr.RECORD_LOCATION_PIXELS = True#make sure this is set
 
 		self.M = mr.create_map_from_file(img_fname)
-		self.img_src = self.imageio.imread(img_fname)  # the array consisting of the original image, on which we will build the frames of the animation
+		self.img_src = np.asarray(self.imageio.imread(img_fname),dtype=np.uint8)  # the array consisting of the original image, on which we will build the frames of the animation
+		if self.img_src.shape[2] == 3:
+			self.img_src = np.concatenate([self.img_src,np.full(self.img_src.shape[:2] + (1,),255,dtype=np.uint8)],axis=2)#frames are rgba
 
+	'''
+	open the dump data_fname (rows are only read from it when they're needed, see DumpReader)
+	'''
 	def read_data(self,data_fname):
-		with open(data_fname,'r') as df:
-			self.data = list(map(lambda x: x.split('|'),df.readlines()))
-			#drop all the newlines
-			self.data = [list(map(lambda x: x.replace('\n',''),l)) for l in self.data]
+		from DumpReader import DumpReader
+		self.data = DumpReader(data_fname)
+		self.keyframes = [dat_idx for dat_idx in self.data.keyframes if dat_idx > 0]
+		self.loaded_dat_idx = None
+
+	def is_delta_row(self,dat_idx):
+		return self.data.is_delta(dat_idx)
 
 	def format_img(self):
 		if self.desaturate_map:
-			#desaturate the source image
-			for i,row in enumerate(self.img_src):
-				for j in range(len(row)):
-					pxsum = 0
-					for c in row[j]:
-						pxsum += c
-
-					pxavg = np.uint8(pxsum / 3.)
-					self.img_src[i][j] = (pxavg,pxavg,pxavg,255)
+			#desaturate the source image (every pixel becomes the average of its rgb, fully opaque)
+			img = np.asarray(self.img_src)
+			pxavg = (img[:,:,:3].astype(np.uint32).sum(axis=2) // 3).astype(np.uint8)
+			self.img_src = np.stack([pxavg,pxavg,pxavg,np.full(pxavg.shape,255,dtype=np.uint8)],axis=2)
 
 		self.expand_img()
 
 	def initialize_map_objects(self):
 		# grab the population and the diseases from the data
-		# note: format is (person id | current location | (disease name | disease state))
-		import re
-		# first just the disease names, since it'll be repeated for everyone
-		i = 3  # i should be on the name of the first disease (4th cell)
-		while not re.match(r'[0-9]+', self.data[0][i]):  # while the current cell isn't a number (i.e. a person's id)
+		# note: format is (person id | current location | (disease name | disease state)), the reader has already
+		# worked out the disease names and people from the header
+		for dis_name in self.data.diseases:
 			# make a dummy disease to sit here with the right name (need this for typing to work right)
 			from Disease import Disease
 			Disease.DISEASE_ID_COUNTER = 0
-			dis = Disease(self.data[0][i])
-			self.diseases.update({self.data[0][i]: dis})
-			i += 2
+			dis = Disease(dis_name)
+			self.diseases.update({dis_name: dis})
 
 		# now go ahead and add the right amount of people
-		# total number of cells = (num of people) * ((num of diseases) * 2 + 2) + 1
-		# so num of people = (number of cells - 1) / (2 * (num of diseases))
-		num_people = int((len(self.data[0]) - 1) / ((2 * len(self.diseases)) + 2))
+		num_people = len(self.data.person_ids)
 		from PersonState import Person
 		houses = None
 		for _ in range(num_people):
 			house, houses = self.M.get_random_house(houses)
 			p = Person(house, self.M)  # doesn't really matter what their home is
 			self.population.append(p)
+		self.population_index = {p:i for i,p in enumerate(self.population)}
 
 	def initialize_all(self,img_fname:str,data_fname:str,mr:MapReader = None):
 		self.read_img(img_fname,mr)
@@ -633,101 +1130,174 @@ class MapWriter:
 		self.initialize_map_objects()
 
 
+	'''
+	blow up the image (and which pixels belong to which locations) img_expansion_factor times in each direction
+	'''
 	def expand_img(self):
-		nimg = [[(0,0,0,0) for _ in range(len(self.img_src[0]) * self.img_expansion_factor)] for i in range(len(self.img_src) * self.img_expansion_factor)]
-		loc_px = {loc:self.M.loc_px[loc].copy() for loc in self.M.loc_px}#we need to do this because by expanding locations they'll start to bleed over into new ones
-		for i,row in enumerate(self.img_src):
-			for j,px in enumerate(row):
-				#fill the appropriate number and location in nimg
-				loc = self.get_location_by_src_pixel((i,j),cache=False)
-				self.expansion_src_pixel_map.update({(i,j) : (i*self.img_expansion_factor,j*self.img_expansion_factor)})
-				for ii in range(i*self.img_expansion_factor,i*self.img_expansion_factor+self.img_expansion_factor):
-					for jj in range(j*self.img_expansion_factor,j*self.img_expansion_factor+self.img_expansion_factor):
-						#copy the pixel into this index of nimg
-						nimg[ii][jj] = px
-						loc_px[loc].add((ii,jj))
-
-		self.img_src = nimg
-		self.M.loc_px = loc_px
-
-	'''
-	get the location object whose source pixel is spx, using the cached map if we can and caching it if we can't
-	'''
-	def get_location_by_src_pixel(self,spx,cache=True):
-		if spx in self.src_pixel_map:
-			return self.src_pixel_map[spx]
-
-		#otherwise, find it
-		for loc in self.M.loc_list:
-			if spx in self.M.loc_px[loc]:
-				if cache:
-					self.src_pixel_map.update({spx:loc})
-				return loc
+		f = self.img_expansion_factor
+		self.img_src = np.repeat(np.repeat(np.asarray(self.img_src),f,axis=0),f,axis=1)
+		self.M.loc_px = self.M.loc_px.expand(f)
+		self.img_expanded_by *= f
 
 	'''
-	Given a location (rather, its index in the map's loc list and px list), return a map from the people currently there to coordinates to place them at on the map 
+	get the location object at source pixel spx = (x,y), i.e. where it was on the image the simulation used (before
+	expanding it)
+	'''
+	def get_location_by_src_pixel(self,spx):
+		return self.M.loc_px.location_at(spx[0] * self.img_expanded_by,spx[1] * self.img_expanded_by)
+
+	'''
+	the slot layout (see LocationPixels.slot_layout) for the map as it is now, worked out the first time it's needed
+	'''
+	def get_slot_layout(self):
+		key = (id(self.M.loc_px),self.PEOPLE_MIN_SEPARATION)
+		if key != self.slots_key:
+			self.slots = self.M.loc_px.slot_layout(self.PEOPLE_MIN_SEPARATION)
+			self.slots_key = key
+		return self.slots
+
+	'''
+	Given a location, return a map from the (living) people currently there to coordinates to place them at on the map
+
+	each person goes in one of the location's slots (pixels at least PEOPLE_MIN_SEPARATION apart, see
+	get_slot_layout), the one their population index hashes to or the next free one after it, so they stay put from
+	frame to frame (see FrameRenderer.assign_slots). if there are more people than slots some of them end up on top
+	of each other, which is a warning (or, with error_on_overlay, an AttributeError)
 	'''
 	def place_people(self,location,error_on_overlay=False):
-		location_pixels = self.M.loc_px[location]
-		occupy = {}#maps people to pixels (x,y)
-		for person in location.people:
-			if not person.is_dead:#we'll just not display dead people
-				#pick a random pixel from the set of those pixels not currently occupied that are within the location
-				valid_pixels = location_pixels - self.occupied_pixels_current	#all those pixels in the location that are not occupied
-				if len(valid_pixels) == 0:
-					#pick one anyway, but chastise the user for making such a poor selection
-					if error_on_overlay:
-						raise AttributeError('not enough room in ' + str(location) + ' (npixels = ' + str(len(self.M.loc_px[location])) + ') to display ' + str(len(location.people)) + ' people with ' + str(self.PEOPLE_MIN_SEPARATION) + ' minimum pixel separation. People may be displayed on top of one another!')
-					else:
-						#just warn them
-						print('WARNING: not enough room in ' + str(location) + ' (npixels = ' + str(len(self.M.loc_px[location])) + ') to display ' + str(len(location.people)) + ' people with ' + str(self.PEOPLE_MIN_SEPARATION) + ' minimum pixel separation. Attempting to fix by relaxing the constraint (people may be displayed on top of one another!)')
-					valid_pixels = location_pixels	#doesn't matter at this point, just has to be in the right location
-				#pick one of these pixels to put this person at
-				list_valid_pixels = list(valid_pixels)
-				place = list_valid_pixels[np.random.choice(len(list_valid_pixels))]
-				occupy.update({person:place})
-
-				#now mark this pixel and all the ones around it (up to the minimum separation) as occupied
-				for xadd in range(-self.PEOPLE_MIN_SEPARATION,self.PEOPLE_MIN_SEPARATION+1):
-					for yadd in range(-self.PEOPLE_MIN_SEPARATION,self.PEOPLE_MIN_SEPARATION+1):
-						current_px = (place[0] + xadd, place[1] + yadd)
-						if current_px in location_pixels:
-							#only actually mark it as occupied if it's in the same place (if not there's probably a wall between those pixels anyway)
-							self.occupied_pixels_current.add(current_px)
-
-		return occupy
+		from FrameRenderer import assign_slots
+		people = [person for person in location.people if not person.is_dead]#we'll just not display dead people
+		if len(people) == 0:
+			return {}
+
+		#everyone gets a slot (the same one every frame, as long as someone else hasn't got it first)
+		slot_order,slot_starts = self.get_slot_layout()
+		l = self.M.loc_px.loc_index[location]
+		placed,crowded = assign_slots(np.full(len(people),l),np.array([self.population_index.get(person,person.id) for person in people]),slot_order,slot_starts)
+		if len(crowded) > 0:
+			nslots = int(slot_starts[l+1] - slot_starts[l])
+			if error_on_overlay:
+				raise AttributeError('not enough room in ' + str(location) + ' (nslots = ' + str(nslots) + ') to display ' + str(len(people)) + ' people with ' + str(self.PEOPLE_MIN_SEPARATION) + ' minimum pixel separation. People may be displayed on top of one another!')
+			else:
+				#just warn them
+				print('WARNING: not enough room in ' + str(location) + ' (nslots = ' + str(nslots) + ') to display ' + str(len(people)) + ' people with ' + str(self.PEOPLE_MIN_SEPARATION) + ' minimum pixel separation. Some people will be displayed on top of one another!')
+
+		w = self.M.loc_px.shape[1]
+		return {person:(int(p % w),int(p // w)) for person,p in zip(people,placed.tolist()) if p >= 0}
 
 	'''
 	Put all the people at the location and with the disease states specified by this dat idx
+
+	rows from a map_delta dump only say who changed, so for those we start from the nearest keyframe before it and
+	apply everything since (or, if we're moving forward from the last row we loaded without passing a keyframe, just
+	the rows in between)
 	'''
 	def load_sim_config(self,dat_idx):
-		import re
-		i = 1
-		while i < len(self.data[dat_idx]):
-			person_id = int(self.data[dat_idx][i])
-			cloc_match = re.match(r'\(([0-9]+), ?([0-9]+)\)',self.data[dat_idx][i+1])
-			current_loc_src_pixel = (int(cloc_match.group(1)),int(cloc_match.group(2)))
-			current_loc = self.get_location_by_src_pixel(self.expansion_src_pixel_map[current_loc_src_pixel])#make sure we apply the remap to get the right locations
-			current_loc.arrive(self.population[person_id])#this will also add them to the location's people list
-
-			#now get their infection states
-			i += 2#now on the name of the first disease
-			while i < len(self.data[dat_idx]) and (not re.match(r'[0-9]+',self.data[dat_idx][i])):
-				dis_name = self.data[dat_idx][i]
-				dis_state = self.data[dat_idx][i+1]
-				self.population[person_id].disease_state[self.diseases[dis_name]] = dis_state
+		for idx in self.sim_config_rows(dat_idx,self.loaded_dat_idx):
+			self.apply_sim_config_row(idx)
+		self.loaded_dat_idx = dat_idx
+
+	'''
+	which rows of the data have to be applied, in order, to get from row loaded_dat_idx (None if nothing's been loaded)
+	to row dat_idx (see load_sim_config)
+	'''
+	def sim_config_rows(self,dat_idx,loaded_dat_idx=None):
+		if not self.is_delta_row(dat_idx):
+			return [dat_idx]
+		import bisect
+		k = bisect.bisect_right(self.keyframes,dat_idx) - 1
+		if k < 0:
+			raise AttributeError('row ' + str(dat_idx) + ' of the data only has changes, and there is no full row before it to apply them to')
+		keyframe = self.keyframes[k]
+		if (loaded_dat_idx is not None) and (keyframe <= loaded_dat_idx < dat_idx):
+			return list(range(loaded_dat_idx + 1,dat_idx + 1))
+		return list(range(keyframe,dat_idx + 1))
+
+	'''
+	the people listed in this row of the data, as a list of (person id, (mapx,mapy), {disease name:state})
+	'''
+	def sim_config_row_people(self,dat_idx):
+		return self.data.parse_row(dat_idx)
+
+	'''
+	put the people listed in this row of the data where it says, in the disease states it says
+	'''
+	def apply_sim_config_row(self,dat_idx):
+		for person_id,current_loc_src_pixel,states in self.sim_config_row_people(dat_idx):
+			person = self.population[person_id]
+			self.get_location_by_src_pixel(current_loc_src_pixel).arrive(person)#this will also add them to the location's people list
+			for dis_name,dis_state in states.items():
+				person.disease_state[self.diseases[dis_name]] = dis_state
 				if dis_state in DISEASE_STATES_DEAD:
-					self.population[person_id].is_dead = True
-				i += 2
+					person.is_dead = True
+
+	'''
+	for each of these rows of the data (in order), where everyone who should be drawn is and what color they are, as
+	(index in loc_list of their location, index in population, index of their color in state_color_table) arrays
+
+	this is load_sim_config without the population objects, for drawing frames in other processes
+	'''
+	def frame_arrays(self,rows):
+		states,_ = self.state_color_table()
+		code = {s:i for i,s in enumerate(states)}
+		disease_index = {name:d for d,name in enumerate(self.diseases)}
+		loc = np.full(len(self.population),-1,dtype=np.int32)
+		person_states = np.full((len(self.population),max(len(self.diseases),1)),-1,dtype=np.int8)
+		is_dead = np.zeros(len(self.population),dtype=bool)
+
+		loaded_dat_idx = None
+		for dat_idx in rows:
+			for idx in self.sim_config_rows(dat_idx,loaded_dat_idx):
+				for person_id,(x,y),person_states_now in self.sim_config_row_people(idx):
+					loc[person_id] = self.M.loc_px.labels[y * self.img_expanded_by,x * self.img_expanded_by]
+					for dis_name,dis_state in person_states_now.items():
+						person_states[person_id,disease_index[dis_name]] = code[dis_state]
+						is_dead[person_id] |= dis_state in DISEASE_STATES_DEAD
+			loaded_dat_idx = dat_idx
+
+			drawn = np.flatnonzero((loc >= 0) & (~is_dead))
+			yield loc[drawn],drawn,person_states[drawn].max(axis=1)
 
 	def copy_img_src(self):
-		copy = [[(r,g,b,a) for (r,g,b,a) in row] for row in self.img_src]
-		return copy
+		return np.array(self.img_src,dtype=np.uint8)
+
+	'''
+	the disease states in order of DISEASE_STATE_COLOR_PRECEDENCE (so a state's index is its precedence), and the color
+	of each (a uint8 array [state][channel])
+	'''
+	def state_color_table(self):
+		states = sorted(self.DISEASE_STATE_COLOR_PRECEDENCE,key=lambda s: self.DISEASE_STATE_COLOR_PRECEDENCE[s])
+		return states,np.array([self.color_map[s] for s in states],dtype=np.uint8).reshape(len(states),-1)
 
 	'''
-	creates a single frame of the animation from the data at dat_idx
+	the color (rgba, as a uint8 array [person][channel]) each of these people should be drawn in
+
+	people with more than one disease get the color of whichever of their states comes last in
+	DISEASE_STATE_COLOR_PRECEDENCE (effectively the union of them)
+	'''
+	def person_colors(self,people):
+		states,colors = self.state_color_table()
+		code = {s:i for i,s in enumerate(states)}
+		if len(people) == 0:
+			return np.zeros((0,colors.shape[1]),dtype=np.uint8)
+
+		#[person][disease] state codes, padded with -1 for people with fewer diseases than others
+		ndiseases = max(len(person.disease_state) for person in people)
+		person_states = np.full((len(people),ndiseases),-1,dtype=np.int64)
+		for i,person in enumerate(people):
+			person_states[i,:len(person.disease_state)] = [code[s] for s in person.disease_state.values()]
+		return colors[person_states.max(axis=1)]
+
+	'''
+	creates a single frame of the animation from the data at dat_idx, and adds it to anim
 	'''
 	def create_single_frame(self,dat_idx):
+		self.anim.append(self.render_frame(dat_idx))
+
+	'''
+	draws the frame of the animation for the data at dat_idx (a rows x columns x rgba uint8 array)
+	'''
+	def render_frame(self,dat_idx):
 		#put everyone in the right place and make sure all their disease states are correct
 		self.load_sim_config(dat_idx)
 		#create the base image
@@ -735,36 +1305,105 @@ class MapWriter:
 		occupy = {}
 		#now find a place to put everyone
 		for location in self.M.loc_list:
-			occupy.update(self.place_people(location))
+			if len(location.people) > 0:
+				occupy.update(self.place_people(location))
 
-		#now that everyone has a place, clear the occupied pixels for the next frame
-		self.occupied_pixels_current.clear()
+		#now color everyone in at once (pixels are (x,y), frames are rows of pixels)
+		people = list(occupy)
+		if len(people) > 0:
+			pixels = np.array([occupy[person] for person in people],dtype=np.int64)
+			frame[pixels[:,1],pixels[:,0]] = self.person_colors(people)
 
-		#reverse the occupy dict (pixels point to people)
-		occupy = {occupy[k]:k for k in occupy}
+		return frame
 
-		#now color in all the pixels
-		for i,row in enumerate(frame):
-			for j in range(len(row)):
-				if (i,j) in occupy:
-					person = occupy[(i,j)]
-					#resolve multiple diseases using the precedence of states (effectively union them)
-					highest_precedence_state = None
-					highest_precedence_state_val = -1
-					for disease in person.disease_state:
-						state = person.disease_state[disease]
-						if self.DISEASE_STATE_COLOR_PRECEDENCE[state] > highest_precedence_state_val:
-							highest_precedence_state = state
-							highest_precedence_state_val = self.DISEASE_STATE_COLOR_PRECEDENCE[state]
-						frame[i][j] = self.color_map[highest_precedence_state]
+	'''
+	which rows of the data to animate: those dumped between start_time and end_time (inclusive, None meaning no limit),
+	and of those only every every'th one
+	'''
+	def animation_rows(self,start_time=None,end_time=None,every=1):
+		if every < 1:
+			raise AttributeError('every should be at least 1, not ' + str(every))
+		times = self.data.times
+		rows = np.arange(1,len(self.data))
+		if start_time is not None:
+			rows = rows[times[rows] >= start_time]
+		if end_time is not None:
+			rows = rows[times[rows] <= end_time]
+		return [int(dat_idx) for dat_idx in rows[::every]]
+
+	'''
+	draw the frames for these rows of the data in a pool of processes worker processes (None for one per core), in order
 
-		self.anim.append(frame)
+	the population objects stay here: we read the rows into arrays (frame_arrays) and the workers, who were given the
+	base image and the slot layout once when they started, draw FRAME_CHUNK_SIZE frames at a time from those. at most
+	two chunks per worker are ever waiting to be drawn or collected. people go in the same slots render_frame would
+	put them in, so the frames are the same either way
+	'''
+	def render_frames_parallel(self,rows,processes=None):
+		import os
+		import multiprocessing
+		from collections import deque
+		import FrameRenderer
+		if processes is None:
+			processes = os.cpu_count()
+		_,colors = self.state_color_table()
+		slot_order,slot_starts = self.get_slot_layout()
+		with multiprocessing.Pool(processes,initializer=FrameRenderer.init_worker,initargs=(self.img_src,slot_order,slot_starts,colors)) as pool:
+			pending = deque()
+			chunk = []
+			for frame in self.frame_arrays(rows):
+				chunk.append(frame)
+				if len(chunk) == self.FRAME_CHUNK_SIZE:
+					pending.append(pool.apply_async(FrameRenderer.draw_frames,(chunk,)))
+					chunk = []
+				while len(pending) > 2*processes:
+					yield from pending.popleft().get()
+			if len(chunk) > 0:
+				pending.append(pool.apply_async(FrameRenderer.draw_frames,(chunk,)))
+			while len(pending) > 0:
+				yield from pending.popleft().get()
 
+	'''
+	write the animation (see animation_rows for which frames are in it) to the gif dest_fname
 
-	def animate(self,dest_fname):
-		for dat_idx in range(1,len(self.data)):
-			self.create_single_frame(dat_idx)
+	frames are written as they're drawn, on another thread; drawing is allowed to get at most ANIMATION_LOOKAHEAD frames
+	ahead of writing, so only that many frames are ever in memory however long the animation is
 
+	processes other than 1 draws the frames in that many processes (None for one per core, see render_frames_parallel)
+	'''
+	def animate(self,dest_fname,start_time=None,end_time=None,every=1,processes=1):
+		import queue
+		import threading
+		rows = self.animation_rows(start_time,end_time,every)
 		loop = 0 if self.loop_anim else 1
-
-		self.imageio.mimwrite(dest_fname,np.array(self.anim),format='GIF-PIL',fps=self.fps,loop=loop)
\ No newline at end of file
+		if processes == 1:
+			rendered = (self.render_frame(dat_idx) for dat_idx in rows)
+		else:
+			rendered = self.render_frames_parallel(rows,processes)
+
+		frames = queue.Queue(maxsize=self.ANIMATION_LOOKAHEAD)
+		errors = []
+		def write_frames():
+			done = False
+			try:
+				with self.imageio.get_writer(dest_fname,format='GIF-PIL',mode='I',fps=self.fps,loop=loop) as writer:
+					frame = frames.get()
+					while frame is not None:
+						writer.append_data(frame)
+						frame = frames.get()
+					done = True
+			except Exception as e:
+				errors.append(e)
+				while not done:#keep taking frames so drawing doesn't wait on us forever
+					done = frames.get() is None
+
+		writer_thread = threading.Thread(target=write_frames,name='MapWriter',daemon=True)
+		writer_thread.start()
+		try:
+			for frame in rendered:
+				frames.put(frame)#blocks while we're too far ahead
+		finally:
+			frames.put(None)
+			writer_thread.join()
+		if len(errors) > 0:
+			raise errors[0]
\ No newline at end of file
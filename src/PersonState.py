@@ -35,7 +35,6 @@ a person is most likely to interact with their immediate friends and family, and
 essentially, we're modeling the probability of interacting between two people as a decaying function of the geodesic distance between the people
 
 """
-import random as rnd
 from SINUtil import *
 
 
@@ -60,7 +59,8 @@ class Person:
 				raise AttributeError(str(self) + "'s home does not have enough capacity for all its inhabitants.")
 		else:
 			#this person is homeless, so plonk them down some random public place
-			self.currentLocation = M.arrive_at_random_nonfull_public_location(self)
+			self.currentLocation = None
+			M.arrive_at_random_nonfull_public_location(self)
 
 		self.currentActivity = Activity('idle')
 		self.age = -1
@@ -73,6 +73,8 @@ class Person:
 		self.coworkers = set()  # or schoolmates
 		self.is_dead = False
 		self.healthiness = 0.
+		self.social_distances = None	#SocialDistanceIndex shared by the population, if there is one (otherwise affinity does its own bfs)
+		self.disease_state_counts = None	#DiseaseStateCounts for the population we're in, if anyone is keeping track
 
 		# infection info
 		self.disease_state = {}	#mapping of diseases onto what state I'm in for them (all need to be present in this list)
@@ -92,6 +94,11 @@ class Person:
 	def __repr__(self):
 		return "Person " + str(self.id)
 
+	#sets of people get iterated over (and drawn from) all the time, so they have to come out in an order that doesn't
+	#depend on where in memory everyone is, or seeding RNG wouldn't make runs reproducible
+	def __hash__(self):
+		return self.id
+
 	def get_effective_healthiness(self) -> float:
 		disease_mod = 0.
 		if self.diseasesShowingSymptoms:
@@ -135,6 +142,8 @@ class Person:
 		self.set_workplace(None)
 		for loc in self.places:
 			loc.clientele.remove(self)
+		if self.social_distances is not None:
+			self.social_distances.invalidate(self)
 		# self.currentLocation = None	#leave this for now, since we want to know where people are when they die
 
 	"""
@@ -153,6 +162,14 @@ class Person:
 		for disease in self.disease_state:
 			disease.disease_state_transition(self)
 
+	"""
+	move into this state for this disease, keeping the population's running counts (if there are any) up to date
+	"""
+	def set_disease_state(self,disease,state):
+		if self.disease_state_counts is not None:
+			self.disease_state_counts.move(disease,self.disease_state[disease],state)
+		self.disease_state[disease] = state
+
 	"""
 	Assign an affinity score between me and this person
 	essentially, it's how likely we are to interact, assuming we're in the same place
@@ -165,8 +182,12 @@ class Person:
 			return max(0., 0.8 - (self.hygiene_coef if self.diseasesShowingSymptoms else 0.))#we like to interact with our partners
 
 		rolling_prob = 0.
-		cw_dist = calc_bfs_dist(self,'work', person)#distance on the coworker network
-		fr_dist = calc_bfs_dist(self,'friend',person)#distance on the friend network
+		if self.social_distances is not None:
+			cw_dist = self.social_distances.distance(self,person,'work')
+			fr_dist = self.social_distances.distance(self,person,'friend')
+		else:
+			cw_dist = calc_bfs_dist(self,'work', person)#distance on the coworker network
+			fr_dist = calc_bfs_dist(self,'friend',person)#distance on the friend network
 		is_friend_first = fr_dist <= cw_dist#I see this person more as a friend than as a coworker
 
 		if self.currentLocation == self.workplace:
@@ -255,7 +276,7 @@ class Person:
 
 		#now go down that list and flip a biased coin for everyone. if heads, return them, otherwise return nothing
 		for p,aff in ph_sort:
-			if rnd.random() < aff:
+			if RNG.random() < aff:
 				#we have a winner
 				#just go ahead and create the activity object
 				act = Activity('talking')
@@ -280,7 +301,8 @@ class Person:
 	def go_to(self,place):
 		if self.is_dead:
 			return None
-		assert(place is not None)
+		if place is None:
+			return Activity('idle')#nowhere to go (e.g. the homeless going home), so stay put
 
 		if self.currentLocation == place:
 			return Activity('idle')#we're already there
@@ -328,7 +350,7 @@ class Person:
 			return None
 		# stop with probability (1 - affinity with this person)
 		aff = self.affinity(self.currentActivity.to)
-		if rnd.random() < aff:  # continue with probability aff
+		if RNG.random() < aff:  # continue with probability aff
 			return self.currentActivity
 		else:  # stop with prob 1 - aff
 			#reset the other person's activity too
@@ -354,8 +376,8 @@ class Person:
 			if self.currentActivity.activity_type == 'sleep':
 				return self.currentActivity#don't do anything
 
-			if self.currentLocation == self.home:
-				return Activity('sleep')#go to sleep
+			if (self.currentLocation == self.home) or (self.home is None):
+				return Activity('sleep')#go to sleep (the homeless sleep wherever they are)
 
 			#we're not at home and we're not asleep, but we should be
 			#go home
@@ -411,7 +433,7 @@ class Person:
 				possible_actions = ['idle','talking','intimate','traveling']
 
 				#pick one at random and try to do it, if we can't remove it from the set and try another
-				act_do = np.random.choice(possible_actions)
+				act_do = RNG.choice(possible_actions)
 				while len(possible_actions) > 0:#idle and talking never get removed, so it won't ever reach zero but safety
 					#do the action
 					if act_do == 'idle':
@@ -423,7 +445,7 @@ class Person:
 						parts_here = list(set(self.partners).intersection(set(people_here)))
 						if len(parts_here) != 0:
 							#just assume we boink a random one
-							b = np.random.choice(parts_here)
+							b = RNG.choice(parts_here)
 							act = Activity('intimate')
 							act.to = b
 							act2 = Activity('intimate')
@@ -431,12 +453,12 @@ class Person:
 							b.currentActivity = act2
 							return act
 						possible_actions.remove('intimate')#nevermind then
-						act_do = np.random.choice(possible_actions)
+						act_do = RNG.choice(possible_actions)
 					elif act_do == 'traveling':
 						if len(self.places) != 0:
 							return self.go_to(self.pick_rtravel_loc())
 						possible_actions.remove('traveling')#nevermind then
-						act_do = np.random.choice(possible_actions)
+						act_do = RNG.choice(possible_actions)
 			else:
 				#action stops
 				if (self.currentActivity.activity_type == 'talking') or (self.currentActivity.activity_type == 'intimate'):
@@ -480,7 +502,7 @@ class Person:
 			possible_actions = ['idle', 'talking', 'traveling']
 
 			# pick one at random and try to do it, if we can't remove it from the set and try another
-			act_do = np.random.choice(possible_actions)
+			act_do = RNG.choice(possible_actions)
 			while len(possible_actions) >= 0:
 				# do the action
 				if act_do == 'idle':
@@ -491,11 +513,13 @@ class Person:
 					if len(self.places) != 0:
 						return self.go_to(self.pick_rtravel_loc())
 					possible_actions.remove('traveling')
-					act_do = np.random.choice(possible_actions)
+					act_do = RNG.choice(possible_actions)
 		else:
 			# action stops
 			if self.currentActivity.activity_type == 'talking':
 				return self.continue_interaction()
+			elif self.currentActivity.activity_type == 'sleep':
+				return Activity('idle')#the homeless wake up wherever they slept
 			else:
 				raise AttributeError("massive wat -- we can't be traveling and be not in public, this should never happen")
 
@@ -559,6 +583,89 @@ def calc_bfs_dist(start, edge_type, target_person, depth=4):
 	return float('inf')
 
 
+"""
+Lookup table for the distances calc_bfs_dist would give, so affinity doesn't have to do two bfs's every time it's called
+
+for every person (as they're first asked about, or everyone at once with build) we keep the distance to everyone within
+depth of them on each network, keyed by person id. after that any distance is a dictionary lookup (anyone missing is
+farther than depth away). the networks don't change after the population is built, but if someone dies the distances
+involving them are thrown out and recalculated when they're next needed
+"""
+class SocialDistanceIndex:
+
+	EDGE_TYPES = ['work','friend']
+
+	def __init__(self,depth=4):
+		self.depth = depth
+		self.ego_distances = {edge_type:{} for edge_type in self.EDGE_TYPES}#edge type -> person id -> {person id:distance}
+
+	"""
+	calc_bfs_dist from start to everyone at once
+	"""
+	def calc_ego_distances(self,start,edge_type):
+		dist = {start.id:0}
+		frontier = [start]
+		d = 0
+		while (len(frontier) > 0) and (d < self.depth):
+			d += 1
+			next_frontier = []
+			for current in frontier:
+				for n in (current.coworkers if edge_type == 'work' else current.friends):
+					if n.id not in dist:
+						dist.update({n.id:d})
+						next_frontier.append(n)
+			frontier = next_frontier
+		return dist
+
+	def get_ego_distances(self,person,edge_type):
+		if edge_type not in self.ego_distances:
+			raise AttributeError("Illegal argument to SocialDistanceIndex, edge_type should be work or friend, not " + str(edge_type))
+		egos = self.ego_distances[edge_type]
+		if person.id not in egos:
+			egos.update({person.id:self.calc_ego_distances(person,edge_type)})
+		return egos[person.id]
+
+	"""
+	same as calc_bfs_dist(a,edge_type,b,depth)
+	"""
+	def distance(self,a,b,edge_type):
+		if a == b:
+			return 0
+		return self.get_ego_distances(a,edge_type).get(b.id,float('inf'))
+
+	"""
+	fill in everyone up front instead of as they come up
+	"""
+	def build(self,population):
+		for person in population:
+			for edge_type in self.EDGE_TYPES:
+				self.get_ego_distances(person,edge_type)
+
+	"""
+	forget everything we know involving this person (both their own distances and anyone else's distance to them)
+	"""
+	def invalidate(self,person):
+		for egos in self.ego_distances.values():
+			egos.pop(person.id,None)
+			for pid in [pid for pid,ego in egos.items() if person.id in ego]:
+				del egos[pid]
+
+	"""
+	approximately how many bytes this is taking up
+	"""
+	def memory_usage(self) -> int:
+		import sys
+		total = sys.getsizeof(self.ego_distances)
+		for egos in self.ego_distances.values():
+			total += sys.getsizeof(egos)
+			for ego in egos.values():
+				total += sys.getsizeof(ego)#keys and values are small ints, which python mostly shares
+		return total
+
+	def __len__(self):
+		return sum(len(ego) for egos in self.ego_distances.values() for ego in egos.values())
+
+
 """
 A class which allows for the creation of populations of people, along with all of their parameters, including the social networks
 
@@ -574,6 +681,20 @@ In order to do this, we need:
 	proportion of population with partners (probability that a given person has a partner)
 	the maximum number of people to generate that are in school
 """
+'''
+start this person off susceptible to this disease, unless they're vaccinated
+'''
+def assign_initial_disease_state(person,disease):
+	is_vaccinated = disease.decide_is_vaccinated(person)
+	if is_vaccinated:
+		vaccine_works = coinflip(disease.vaccination_effectiveness)
+		if vaccine_works:
+			person.disease_state.update({disease: 'VU'})	#vaccinated, unsusceptible
+		else:
+			person.disease_state.update({disease:'VS'})		#vacinated, susceptible
+	else:
+		person.disease_state.update({disease:'S'})
+
 class PopulationBuilder:
 
 	from Map import Map
@@ -584,33 +705,35 @@ class PopulationBuilder:
 		self.N = N
 
 		#optionally defined by the user (defaults defined here)
-		self.age_dist = lambda: int(max(np.random.normal(38.2,22.7549),0))											#numbers from https://www.kff.org/other/state-indicator/distribution-by-age/ and https://www.cia.gov/library/publications/resources/the-world-factbook/geos/us.html
-		self.hygiene_dist = lambda age: np.random.uniform(0,1)													#simple model assumes perfectly uniform hygiene, but more complex ones should take age into account
-		self.location_ages_avg_dist = lambda: max(np.random.normal(20,15),0)									#normal distribution, mean 20 stdev 15 (years)
+		self.age_dist = lambda: int(max(RNG.normal(38.2,22.7549),0))											#numbers from https://www.kff.org/other/state-indicator/distribution-by-age/ and https://www.cia.gov/library/publications/resources/the-world-factbook/geos/us.html
+		self.hygiene_dist = lambda age: RNG.uniform(0,1)													#simple model assumes perfectly uniform hygiene, but more complex ones should take age into account
+		self.location_ages_avg_dist = lambda: max(RNG.normal(20,15),0)									#normal distribution, mean 20 stdev 15 (years)
 		self.location_ages_stdev_dist = lambda: 5																#5 years stdev every time
-		self.coworkers_dist = lambda num_employees: min(max(int(np.random.normal(5,3)),0),num_employees)		#normal distribution, mean 5 stdev 3, >= 0
-		self.friends_dist = lambda possible_friends: min(max(int(np.random.normal(5,3)),0),possible_friends)	#normal distribution, mean 5 stdev 3, >= 0
+		self.coworkers_dist = lambda num_employees: min(max(int(RNG.normal(5,3)),0),num_employees)		#normal distribution, mean 5 stdev 3, >= 0
+		self.friends_dist = lambda possible_friends: min(max(int(RNG.normal(5,3)),0),possible_friends)	#normal distribution, mean 5 stdev 3, >= 0
 		self.partners_dist = lambda num_people_in_house: min(int(coinflip(0.05)),num_people_in_house)			#5% chance of having one partner, 95% of not having any
-		self.num_places_dist = lambda: max(int(np.random.normal(3,2)),0)										#normal distribution, mean = 3, stdev = 2
+		self.num_places_dist = lambda: max(int(RNG.normal(3,2)),0)										#normal distribution, mean = 3, stdev = 2
 		self.school_range = (0,0)																				#tuple of ages, between which people are in school (e.g. (0,18) means everyone from age 0 to age 18 is in school)
 		self.max_school_size = 0
 		self.avg_places = 0
 		self.homeless_prob = 0.
 		self.jobless_prob = 0.
-		self.work_begin_avg_dist = lambda: tconv(str(np.random.choice(range(0,24))))										#uniform distribution, starting on the hour
-		self.work_duration_avg_dist = lambda: tconv(str(np.random.choice(range(2,12))))										#uniform from 2 hours to 12 hours
+		self.work_begin_avg_dist = lambda: tconv(str(RNG.integer(0,24)))										#uniform distribution, starting on the hour
+		self.work_duration_avg_dist = lambda: tconv(str(RNG.integer(2,12)))										#uniform from 2 hours to 12 hours
 		self.work_begin_stdev_dist = lambda: tconv("05")																	#always 5 hours
 		self.work_duration_stdev_dist = lambda: tconv("01")																	#always 1 hour
-		self.sleep_begin_dist = lambda work_time_tuple: int(np.random.normal(work_time_tuple[1] + tconv("03"),tconv("00:30")))	#3 hours after work ends on average
-		self.sleep_duration_dist = lambda: int(np.random.normal(tconv("07"),tconv("01")))
+		self.sleep_begin_dist = lambda work_time_tuple: int(RNG.normal(work_time_tuple[1] + tconv("03"),tconv("00:30")))	#3 hours after work ends on average
+		self.sleep_duration_dist = lambda: int(RNG.normal(tconv("07"),tconv("01")))
 		self.disease_list = []																								#list of disease objects, the builder will attempt to initialize the population with them
-		self.healthiness_dist = lambda age: np.random.uniform(0,1)															#function from age of person -> person's healthiness coefficient
+		self.healthiness_dist = lambda age: RNG.uniform(0,1)															#function from age of person -> person's healthiness coefficient
+		self.precompute_routes = False																						#fill in the map's route cache with everyone's regular routes once the population is built
+		self.materialize_networks = True																					#fill in everyone's coworkers, friends and partners sets (only the array engine can do without them)
 
 
 		#logical variables
 		self.current_school_people = 0		#how many people are currently in school
 		self.workable_locations = None	#locations that are not public (i.e. workable)
-		self.houses = None
+		self.networks = None	#the PopulationNetworks of the last population created
 
 
 	def set_num_friends_distribution(self,dist):
@@ -676,6 +799,12 @@ class PopulationBuilder:
 	def set_healithiness_coefficient_distribution(self,dist):
 		self.healthiness_dist = dist
 
+	def set_precompute_routes(self,precompute:bool):
+		self.precompute_routes = precompute
+
+	def set_materialize_networks(self,materialize:bool):
+		self.materialize_networks = materialize
+
 	"""
 	Assign all of the primitive details randomly to this person (they already need to have a home)
 		age
@@ -692,6 +821,8 @@ class PopulationBuilder:
 				#age is valid now
 				#then this person is in school
 				person.set_workplace(self.M.get_school())
+				if person.workplace is not None:
+					self.current_school_people += 1
 
 		if (not ((person.age >= self.school_range[0]) and (person.age <= self.school_range[1]))) and (person.home is not None):
 			if not coinflip(self.jobless_prob):
@@ -699,10 +830,47 @@ class PopulationBuilder:
 				wp,self.workable_locations = self.M.get_random_workable_location(workable=self.workable_locations)
 				person.set_workplace(wp)
 
+		self.assign_remaining_details(person)
+
+	'''
+	assign_primitive_details for everyone in plist at once (they already need to have their homes): ages one at a time,
+	but who goes to school, who's jobless and where everyone else works all in one go
+	'''
+	def assign_ages_and_workplaces(self, plist):
+		for person in plist:
+			person.age = self.age_dist()
+		ages = np.array([person.age for person in plist],dtype=np.int64)
+		has_home = np.array([person.home is not None for person in plist],dtype=bool)
+		school_age = (ages >= self.school_range[0]) & (ages <= self.school_range[1])
+
+		#school aged people with homes go to school in order until it's full, after which any more school aged people are
+		#made older so that they aren't (the homeless get skipped, but do get made older once it's full)
+		wants_school = school_age & has_home
+		in_school = wants_school & (np.cumsum(wants_school) <= self.max_school_size - self.current_school_people)
+		in_school_before = np.cumsum(in_school) - in_school
+		too_many = school_age & (~in_school) & (self.current_school_people + in_school_before >= self.max_school_size)
+		ages[too_many] += self.school_range[1]
+		for i in np.flatnonzero(too_many):
+			plist[i].age = int(ages[i])
+		if in_school.any():
+			school = self.M.get_school()
+			for i in np.flatnonzero(in_school):
+				plist[i].set_workplace(school)
+			self.current_school_people += int(in_school.sum())
+
+		#everyone else with a home gets a job, unless they're jobless
+		can_work = np.flatnonzero((~((ages >= self.school_range[0]) & (ages <= self.school_range[1]))) & has_home)
+		working = can_work[~coinflips(np.full(len(can_work),self.jobless_prob))]
+		for i,wp in zip(working,self.M.get_random_workable_locations(len(working))):
+			plist[i].set_workplace(wp)
+
+	'''
+	everything in assign_primitive_details after the age and workplace
+	'''
+	def assign_remaining_details(self, person:Person):
 		#now the person has a workplace (if relevant) and an age, assign their locations
 		nlocs = self.num_places_dist()
-		for _ in range(nlocs):
-			self.M.add_random_placable_location(person, self.location_ages_avg_dist, self.location_ages_stdev_dist)
+		self.M.add_random_placable_locations(person, nlocs, self.location_ages_avg_dist, self.location_ages_stdev_dist)
 
 
 		#hygiene
@@ -716,8 +884,8 @@ class PopulationBuilder:
 				person.workplace.work_begin_stdev = self.work_begin_stdev_dist()
 				person.workplace.avg_work_duration = self.work_duration_avg_dist()
 				person.workplace.work_duration_stdev = self.work_duration_stdev_dist()
-			work_begin_time = negsafe_mod(int(np.random.normal(person.workplace.avg_work_begin_time, person.workplace.work_begin_stdev)), TIME_STEPS_PER_DAY)
-			work_duration = max(int(np.random.normal(person.workplace.avg_work_duration, person.workplace.work_duration_stdev)), 0)
+			work_begin_time = negsafe_mod(int(RNG.normal(person.workplace.avg_work_begin_time, person.workplace.work_begin_stdev)), TIME_STEPS_PER_DAY)
+			work_duration = max(int(RNG.normal(person.workplace.avg_work_duration, person.workplace.work_duration_stdev)), 0)
 			work_end_time = negsafe_mod((work_begin_time + work_duration), TIME_STEPS_PER_DAY)
 			person.work_schedule = (work_begin_time, work_end_time)
 		else:
@@ -730,15 +898,7 @@ class PopulationBuilder:
 
 		#set the disease state modifiers
 		for disease in self.disease_list:
-			is_vaccinated = disease.decide_is_vaccinated(person)
-			if is_vaccinated:
-				vaccine_works = coinflip(disease.vaccination_effectiveness)
-				if vaccine_works:
-					person.disease_state.update({disease: 'VU'})	#vaccinated, unsusceptible
-				else:
-					person.disease_state.update({disease:'VS'})		#vacinated, susceptible
-			else:
-				person.disease_state.update({disease:'S'})
+			assign_initial_disease_state(person,disease)
 
 		person.healthiness = self.healthiness_dist(person.age)
 
@@ -759,7 +919,7 @@ class PopulationBuilder:
 			return
 
 		k = self.coworkers_dist(len(p.workplace.employees_residents))
-		assign_to = np.random.choice(list(p.workplace.employees_residents),size=k)
+		assign_to = RNG.choices(list(p.workplace.employees_residents),k)
 		for emp in assign_to:
 			if emp != p:
 				p.coworkers.add(emp)
@@ -777,7 +937,7 @@ class PopulationBuilder:
 			return
 
 		k = self.partners_dist(len(p.home.employees_residents))
-		assign_to = np.random.choice(list(p.home.employees_residents),size=k)
+		assign_to = RNG.choices(list(p.home.employees_residents),k)
 		for oth in assign_to:
 			if oth != p:
 				p.partners.add(oth)
@@ -796,19 +956,18 @@ class PopulationBuilder:
 			return
 
 		#first figure out how many possible friends we could have
-		possible = p.home.employees_residents.copy()
-		possible.remove(p)#not myself
+		possible = p.home.employees_residents - {p} if p.home is not None else set()#not myself
 		for place in p.places:
 			possible = possible.union(place.clientele)
 		k = self.friends_dist(len(possible))
 		assigned = 0
-		pick_from = {p.home}.union(p.places)
+		pick_from = ({p.home} if p.home is not None else set()).union(p.places)
 		while (assigned < k) and (len(pick_from) > 0):
 			#pick a random location in our places
-			loc = np.random.choice(list(pick_from))
+			loc = RNG.choice(list(pick_from))
 			possible_friends = loc.clientele - p.friends - {p}
 			if len(possible_friends) > 0:
-				assign = np.random.choice(list(possible_friends))
+				assign = RNG.choice(list(possible_friends))
 				p.friends.add(assign)
 				if BIDIRECTIONAL_FRIENDS:
 					assign.friends.add(p)
@@ -826,28 +985,30 @@ class PopulationBuilder:
 		if self.max_school_size > 0:
 			self.M.create_school(self.max_school_size)
 
-		#create all the people and assign them to houses
-		plist = []
-		for _ in range(self.N):
-			if coinflip(self.homeless_prob):
-				h = None
-			else:
-				h,self.houses = self.M.get_random_house()
+		#create all the people and assign them to houses (all at once)
+		homeless = coinflips(np.full(self.N,self.homeless_prob))
+		houses = iter(self.M.get_random_houses(int((~homeless).sum())))
+		plist = [Person(None if is_homeless else next(houses),self.M) for is_homeless in homeless]
 
-			p = Person(h,self.M)
+		#everyone now has a home and has been instantiated, assign their primitive details
+		self.assign_ages_and_workplaces(plist)
+		for p in plist:
+			self.assign_remaining_details(p)
+		#nothing else can be done in this loop since we need everyone's primitives to be defined before they can be assigned friends etc.
 
-			#person person now has a home and has been instantiated, assign their primitive details
-			self.assign_primitive_details(p)
+		#now that all the primitive details are in, we can assign the network details (everyone's at once)
+		from PopulationNetworks import PopulationNetworks
+		self.networks = PopulationNetworks.build(self,plist)
+		if self.materialize_networks:
+			self.networks.materialize(plist)
 
-			#add them to the person list
-			plist.append(p)
-			#nothing else can be done in this loop since we need everyone's primitives to be defined before they can be assigned friends etc.
+		#the networks are done now, so affinity can stop doing bfs's
+		social_distances = SocialDistanceIndex()
+		for p in plist:
+			p.social_distances = social_distances
 
-		for i,p in enumerate(plist):
-			#now that all the primitive details are in, we can assign the network details
-			plist[i] = self.assign_coworkers(p)
-			plist[i] = self.assign_friends(p)
-			plist[i] = self.assign_partners(p)
+		if self.precompute_routes:
+			self.M.precompute_routes(plist)
 
 		return plist
 
@@ -879,6 +1040,7 @@ class Location:
 	def __init__(self,loc_type,capacity=-1):
 		self.people = []
 		self.capacity = capacity
+		self.maps = []#the maps this location is on, which get told whenever its type changes (see Map.watch_locations)
 		self.loc_type = loc_type
 		self.id = Location.LOCATION_ID_COUNTER
 		Location.LOCATION_ID_COUNTER += 1
@@ -910,6 +1072,16 @@ class Location:
 		self.work_begin_stdev = -1
 		self.work_duration_stdev = -1
 
+	@property
+	def loc_type(self):
+		return self._loc_type
+
+	@loc_type.setter
+	def loc_type(self,loc_type):
+		self._loc_type = loc_type
+		for M in self.maps:
+			M.loc_type_changes += 1
+
 	'''
 	Given an age, what is the probability this location would be one of their places?
 	'''
@@ -974,6 +1146,9 @@ class Location:
 	def __repr__(self):
 		return self.loc_type + ' ' + str(self.id)
 
+	def __hash__(self):
+		return self.id#see Person.__hash__
+
 
 """
 This part contains all of the information relevant to activities that people can do.
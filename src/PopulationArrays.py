@@ -0,0 +1,695 @@
+"""
+This file contains the structure-of-arrays version of the population, used by the 'array' engine in Simulation.
+
+Instead of asking every Person object what it wants to do every time step, everything we need to know about the
+population lives in flat numpy arrays indexed by position in the population list:
+
+	location index (into the map's loc_list)
+	activity code (index into ACTIVITY_TYPES)
+	interaction target (index of the person we're talking to/being intimate with, -1 if none)
+	travel destination, route and travel counter
+	home, workplace, work and sleep schedules
+	hygiene and healthiness
+	disease state matrix [disease x person] of indices into DISEASE_STATES_LIST
+	coworker, friend and partner networks as sparse adjacency matrices
+
+the minute loop (step) is then a handful of masked array operations over the whole population. the decision logic
+mirrors Person.get_action_transition and Person.do_current_action as closely as batching allows.
+"""
+
+from SINUtil import *
+from PersonState import Activity, ACTIVITY_TYPES, aff_decay
+from Map import Map, LOC_TYPE_INDEX
+import scipy.sparse as sp
+
+ACTIVITY_CODES = {a:i for i,a in enumerate(ACTIVITY_TYPES)}
+ACT_IDLE = ACTIVITY_CODES['idle']
+ACT_SLEEP = ACTIVITY_CODES['sleep']
+ACT_TRAVELING = ACTIVITY_CODES['traveling']
+ACT_TALKING = ACTIVITY_CODES['talking']
+ACT_INTIMATE = ACTIVITY_CODES['intimate']
+
+STATE_CODES = {s:i for i,s in enumerate(DISEASE_STATES_LIST)}
+
+#boolean lookup tables over state codes
+def state_mask(states):
+	return np.array([s in states for s in DISEASE_STATES_LIST])
+
+STATE_IS_SUSCEPTIBLE = state_mask(DISEASE_STATES_SUSCEPTIBLE)
+STATE_IS_INFECTIOUS = state_mask(DISEASE_STATES_INFECTIOUS)
+STATE_IS_SYMPTOMATIC = state_mask(DISEASE_STATES_SYMPTOMATIC)
+STATE_IS_VACCINATED = state_mask(DISEASE_STATES_VACCINATED)
+
+ARRAY_TALK_SAMPLES = 4	#how many people at the same location does someone who wants to talk consider? (Person.talk_to goes down everyone in the location, which is too much work for crowded places)
+
+AFFINITY_DEPTH = 4		#same as the default depth for calc_bfs_dist
+
+
+'''
+Within-window test for arrays of times, equivalent to time_within_tuple
+'''
+def times_within(time,begin,end):
+	wraps = begin > end
+	return np.where(wraps, (time >= begin) | (time <= end), (time >= begin) & (time <= end))
+
+'''
+For each element of keys, how many elements before it (in order) have the same key?
+'''
+def group_rank(keys):
+	order = np.argsort(keys,kind='stable')
+	sorted_keys = keys[order]
+	starts = np.searchsorted(sorted_keys,sorted_keys,side='left')
+	rank = np.empty(len(keys),dtype=np.int64)
+	rank[order] = np.arange(len(keys)) - starts
+	return rank
+
+
+class PopulationArrays:
+
+	'''
+	networks (a PopulationNetworks for this population) is where the networks come from if given, otherwise they're read
+	out of everyone's coworkers, friends and partners sets
+	'''
+	def __init__(self,population:list,diseases:list,M:Map,networks=None):
+		self.population = population
+		self.diseases = diseases
+		self.M = M
+		self.N = len(population)
+		N = self.N
+
+		#location tables
+		self.loc_list = M.loc_list	#PopulationBuilder shuffles this while building, so only index it once the population exists
+		self.loc_index = {loc:i for i,loc in enumerate(self.loc_list)}
+		self.loc_type = np.array([LOC_TYPE_INDEX[loc.loc_type] for loc in self.loc_list],dtype=np.int64)
+		self.loc_capacity = np.array([loc.capacity for loc in self.loc_list],dtype=np.int64)
+		self.loc_travel_time = np.array([loc.travel_time for loc in self.loc_list],dtype=float)
+		self.loc_center = np.array([(loc.mapx_center,loc.mapy_center) for loc in self.loc_list],dtype=float).reshape(-1,2)
+		self.nearest_hospital = self.calc_nearest_hospitals()
+
+		#routes are stored in one flat pool (grown by doubling), with (origin,destination) -> (start,end) in the pool
+		self.route_index = {}
+		self.route_pool = np.zeros(64,dtype=np.int64)
+		self.route_pool_len = 0
+
+		#person arrays
+		person_index = {p:i for i,p in enumerate(population)}
+		lidx = lambda loc: -1 if loc is None else self.loc_index[loc]
+		self.ids = np.array([p.id for p in population],dtype=np.int64)
+		self.loc = np.array([lidx(p.currentLocation) for p in population],dtype=np.int64)
+		self.home = np.array([lidx(p.home) for p in population],dtype=np.int64)
+		self.workplace = np.array([lidx(p.workplace) for p in population],dtype=np.int64)
+		self.alive = np.array([not p.is_dead for p in population],dtype=bool)
+		self.hygiene = np.array([p.hygiene_coef for p in population],dtype=float)
+		self.healthiness = np.array([p.healthiness for p in population],dtype=float)
+		self.has_places = np.array([len(p.places) > 0 for p in population],dtype=bool)
+		self.travel_counter = np.array([p.travel_counter for p in population],dtype=np.int64)
+		work_schedules = [p.work_schedule if p.work_schedule is not None else (0,0) for p in population]
+		self.work_begin = np.array([w[0] for w in work_schedules],dtype=np.int64).reshape(N)
+		self.work_end = np.array([w[1] for w in work_schedules],dtype=np.int64).reshape(N)
+		self.sleep_begin = np.array([p.sleep_schedule[0] for p in population],dtype=np.int64).reshape(N)
+		self.sleep_end = np.array([p.sleep_schedule[1] for p in population],dtype=np.int64).reshape(N)
+
+		self.activity = np.full(N,ACT_IDLE,dtype=np.int64)
+		self.target = np.full(N,-1,dtype=np.int64)
+		self.dest = np.full(N,-1,dtype=np.int64)
+		self.route_start = np.zeros(N,dtype=np.int64)
+		self.route_pos = np.full(N,-1,dtype=np.int64)
+		for i,p in enumerate(population):
+			act = p.currentActivity
+			if act is None:
+				continue
+			self.activity[i] = ACTIVITY_CODES[act.activity_type]
+			if act.activity_type == 'traveling':
+				self.dest[i] = lidx(act.to)
+				self.route_start[i],self.route_pos[i] = self.add_route([lidx(l) for l in act.path])
+			elif (act.to is not None) and (act.to in person_index):
+				self.target[i] = person_index[act.to]
+
+		#how many people are in each location (dead people still take up space, same as with Location.people)
+		self.loc_occupancy = np.bincount(self.loc[self.loc >= 0],minlength=len(self.loc_list))
+
+		#networks
+		if networks is not None:
+			if networks.N != N:
+				raise AttributeError('the networks are for ' + str(networks.N) + ' people, but the population has ' + str(N))
+			self.coworkers = networks.matrix('coworkers')
+			self.friends = networks.matrix('friends')
+			self.partners = networks.matrix('partners')
+		else:
+			self.coworkers = self.network_matrix(population,person_index,lambda p: p.coworkers)
+			self.friends = self.network_matrix(population,person_index,lambda p: p.friends)
+			self.partners = self.network_matrix(population,person_index,lambda p: p.partners)
+		self.partners_degree = np.diff(self.partners.indptr)
+		self.partner_keys = self.edge_keys(self.partners)
+		#the networks don't change once they're built, so work out every distance affinity can use up front
+		self.coworker_distances = self.distance_table(self.coworkers)
+		self.friend_distances = self.distance_table(self.friends)
+
+		#disease arrays
+		D = len(diseases)
+		self.state = np.array([[STATE_CODES[p.disease_state[d]] for p in population] for d in diseases],dtype=np.int64).reshape(D,N)
+		self.infected_by = np.array([[person_index.get(p.infected_by.get(d),-1) for p in population] for d in diseases],dtype=np.int64).reshape(D,N)
+		self.infectivity = np.array([[d.infectivity[a] for a in ACTIVITY_TYPES] for d in diseases],dtype=float).reshape(D,len(ACTIVITY_TYPES))
+		self.state_infectability = np.array([[d.state_infectability_modifiers[s] for s in DISEASE_STATES_LIST] for d in diseases],dtype=float).reshape(D,len(DISEASE_STATES_LIST))
+		self.max_symptom_health_effect = max([d.symptom_health_effect for d in diseases],default=0.)
+
+	def calc_nearest_hospitals(self):
+		table = self.M.get_nearest_hospital_table()
+		return np.array([-1 if table[loc.id] is None else self.loc_index[table[loc.id]] for loc in self.loc_list],dtype=np.int64)
+
+	def network_matrix(self,population,person_index,edges):
+		rows = []
+		cols = []
+		for i,p in enumerate(population):
+			for q in edges(p):
+				if q in person_index:
+					rows.append(i)
+					cols.append(person_index[q])
+		data = np.ones(len(rows),dtype=bool)
+		return sp.csr_matrix((data,(rows,cols)),shape=(self.N,self.N),dtype=bool)
+
+	'''
+	put this path (list of location indices) into the route pool, returning the (start,pos) pair a traveler uses to walk it
+
+	paths are popped from the end, just like Activity.path
+	'''
+	def add_route(self,path):
+		start = self.route_pool_len
+		while start + len(path) > len(self.route_pool):
+			self.route_pool = np.concatenate([self.route_pool,np.zeros(len(self.route_pool),dtype=np.int64)])
+		self.route_pool[start:start + len(path)] = path
+		self.route_pool_len += len(path)
+		return start,start + len(path) - 1
+
+	def get_route(self,origin,dest):
+		if (origin,dest) not in self.route_index:
+			path = self.M.get_path(self.loc_list[origin],self.loc_list[dest])
+			self.route_index.update({(origin,dest):self.add_route([self.loc_index[l] for l in path])})
+		return self.route_index[(origin,dest)]
+
+	def coinflips(self,p):
+		return RNG.coinflips(p)
+
+	def symptomatic(self):
+		return STATE_IS_SYMPTOMATIC[self.state].any(axis=0)
+
+	'''
+	vectorized Person.get_effective_healthiness
+	'''
+	def effective_healthiness(self,idx):
+		return np.maximum(0.,self.healthiness[idx] - self.symptomatic()[idx] * self.max_symptom_health_effect)
+
+	'''
+	every edge out of nodes[i] in adj, as (i, where the edge goes) arrays grouped by i
+	'''
+	def neighbours(self,adj,nodes):
+		deg = adj.indptr[nodes+1] - adj.indptr[nodes]
+		offsets = np.arange(deg.sum()) - np.repeat(np.cumsum(deg) - deg,deg)
+		return np.repeat(np.arange(len(nodes)),deg),adj.indices[np.repeat(adj.indptr[nodes],deg) + offsets]
+
+	'''
+	every (from * N + to) key within `depth` steps along adj (a breadth first search from everyone at once), sorted, along
+	with the distance for each
+	'''
+	def distance_table(self,adj,depth=AFFINITY_DEPTH):
+		N = self.N
+		reached = np.arange(N) * (N + 1)	#everyone is 0 steps from themselves
+		all_key,all_dist = [reached],[np.zeros(N,dtype=np.int8)]
+		frontier = reached
+		for k in range(1,depth+1):
+			which,node = self.neighbours(adj,frontier % N)
+			if len(node) == 0:
+				break
+			key = np.unique((frontier // N)[which] * N + node)
+			#only keep what we haven't already got to in fewer steps
+			pos = np.minimum(np.searchsorted(reached,key),len(reached) - 1)
+			frontier = key[reached[pos] != key]
+			if len(frontier) == 0:
+				break
+			reached = np.sort(np.concatenate([reached,frontier]))
+			all_key.append(frontier)
+			all_dist.append(np.full(len(frontier),k,dtype=np.int8))
+		key = np.concatenate(all_key)
+		order = np.argsort(key)
+		return key[order],np.concatenate(all_dist)[order]
+
+	'''
+	how far apart are a[i] and b[i] in the network this distance_table is for? equivalent to calc_bfs_dist (inf if b[i] is
+	further than the table's depth)
+	'''
+	def network_distances(self,table,a,b):
+		keys,dists = table
+		q = a * self.N + b
+		pos = np.minimum(np.searchsorted(keys,q),len(keys) - 1)
+		return np.where(keys[pos] == q,dists[pos],float('inf'))
+
+	'''
+	sorted (row * N + column) keys for every edge in this network, so membership checks are a binary search
+	'''
+	def edge_keys(self,adj):
+		rows = np.repeat(np.arange(self.N),np.diff(adj.indptr))
+		return np.sort(rows * self.N + adj.indices)
+
+	'''
+	is b[i] one of a[i]'s partners?
+	'''
+	def is_partner(self,a,b):
+		if (len(a) == 0) or (len(self.partner_keys) == 0):
+			return np.zeros(len(a),dtype=bool)
+		q = a * self.N + b
+		pos = np.minimum(np.searchsorted(self.partner_keys,q),len(self.partner_keys) - 1)
+		return self.partner_keys[pos] == q
+
+	'''
+	vectorized Person.affinity between a[i] and b[i]
+	'''
+	def affinity(self,a,b):
+		aff = np.zeros(len(a))
+		if len(a) == 0:
+			return aff
+		same = self.loc[a] == self.loc[b]
+		sym_penalty = self.hygiene[a] * self.symptomatic()[a]
+		is_partner = self.is_partner(a,b)
+
+		cw_dist = self.network_distances(self.coworker_distances,a,b)
+		fr_dist = self.network_distances(self.friend_distances,a,b)
+		is_friend_first = fr_dist <= cw_dist
+		at_work = self.loc[a] == self.workplace[a]
+
+		#at work
+		work_prob = aff_decay(0.7,0.1)(cw_dist)
+		work_prob = np.where(is_friend_first,weighted_prob_combination(work_prob,0.6,aff_decay(0.75,0.2)(fr_dist),0.4),work_prob)
+		#everywhere else
+		other_prob = aff_decay(0.8,0.2)(fr_dist)
+		other_prob = np.where(is_friend_first,other_prob,np.maximum(0,weighted_prob_combination(other_prob,0.8,-aff_decay(0.6,0.1)(cw_dist),0.2)))
+
+		rolling_prob = np.where(at_work,work_prob,other_prob)
+		semifinal = np.maximum(0,rolling_prob - sym_penalty)
+		aff = np.minimum(semifinal + INTERACTION_EXPLORATION_REWARD,1)
+		aff = np.where(is_partner,np.maximum(0.,0.8 - sym_penalty),aff)
+		return np.where(same,aff,0.)
+
+	'''
+	batched Location.arrive: move people[i] to locs[i] if there's room, in population order
+	'''
+	def arrive(self,people,locs):
+		ok = (locs >= 0) & (self.loc[people] >= 0) & ((self.loc_occupancy[np.maximum(locs,0)] + group_rank(locs)) < self.loc_capacity[np.maximum(locs,0)])
+		movers = people[ok]
+		self.loc_occupancy -= np.bincount(self.loc[movers],minlength=len(self.loc_list))
+		self.loc_occupancy += np.bincount(locs[ok],minlength=len(self.loc_list))
+		self.loc[movers] = locs[ok]
+		return ok
+
+	'''
+	batched Person.go_to
+	'''
+	def go_to(self,people,places):
+		#nowhere to go (e.g. the homeless going home), so stay put
+		valid = places >= 0
+		self.activity[people[~valid]] = ACT_IDLE
+		self.target[people[~valid]] = -1
+		people = people[valid]
+		places = places[valid]
+		already_there = self.loc[people] == places
+		self.activity[people[already_there]] = ACT_IDLE
+		self.target[people[already_there]] = -1
+
+		already_going = (self.activity[people] == ACT_TRAVELING) & (self.dest[people] == places)
+		starting = ~already_there & ~already_going
+		for i,place in zip(people[starting],places[starting]):
+			self.route_start[i],self.route_pos[i] = self.get_route(self.loc[i],place)
+		self.activity[people[starting]] = ACT_TRAVELING
+		self.dest[people[starting]] = places[starting]
+		self.target[people[starting]] = -1
+
+	'''
+	Person.pick_rtravel_loc only ever settles on home (when we're sick) or the current location, since places are only
+	considered when `loc.is_empty` is falsy. this does the same, so the two engines agree
+	'''
+	def pick_rtravel_loc(self,people):
+		go_home = self.coinflips(self.hygiene[people] * self.symptomatic()[people])
+		return np.where(go_home,self.home[people],self.loc[people])
+
+	'''
+	batched Person.continue_interaction
+	'''
+	def continue_interaction(self,people):
+		lost = people[self.target[people] < 0]
+		self.activity[lost] = ACT_IDLE
+		people = people[self.target[people] >= 0]
+		cont = self.coinflips(self.affinity(people,self.target[people]))
+		stop = people[~cont]
+		partners = self.target[stop]
+		self.activity[stop] = ACT_IDLE
+		self.target[stop] = -1
+		partners = partners[partners >= 0]
+		self.activity[partners] = ACT_IDLE
+		self.target[partners] = -1
+
+	'''
+	batched Person.talk_to: each talker looks at up to ARRAY_TALK_SAMPLES random people here and flips a coin weighted by
+	affinity for each. everyone who found someone is then paired off so no one ends up in two conversations
+	'''
+	def talk_to(self,people):
+		self.activity[people] = ACT_IDLE
+		self.target[people] = -1
+		if len(people) == 0:
+			return
+
+		#group everyone alive by location
+		living = np.flatnonzero(self.alive)
+		order = living[np.argsort(self.loc[living],kind='stable')]
+		sorted_locs = self.loc[order]
+		group_start = np.searchsorted(sorted_locs,self.loc[people],side='left')
+		group_size = np.searchsorted(sorted_locs,self.loc[people],side='right') - group_start
+		position = np.empty(self.N,dtype=np.int64)
+		position[order] = np.arange(len(order))
+
+		#everyone draws all of their samples at once, and takes the first one that works out. the samples are a run of
+		#different people starting from a random one, so where there's no more than ARRAY_TALK_SAMPLES others here,
+		#everyone gets considered exactly once like they would be by Person.talk_to
+		chosen = np.full(len(people),-1,dtype=np.int64)
+		others = group_size - 1
+		num_samples = np.minimum(others,ARRAY_TALK_SAMPLES)
+		looking = np.repeat(np.arange(len(people)),num_samples)
+		talkers = people[looking]
+		offset = np.arange(len(looking)) - np.repeat(np.cumsum(num_samples) - num_samples,num_samples)
+		r = ((RNG.randoms(len(people)) * np.maximum(others,1)).astype(np.int64)[looking] + offset) % others[looking]
+		r += r >= (position[talkers] - group_start[looking])#skip over ourselves
+		candidates = order[group_start[looking] + r]
+		accepted = self.coinflips(self.affinity(talkers,candidates))
+		#assigning in reverse order means the earliest accepted sample is the one that sticks
+		chosen[looking[accepted][::-1]] = candidates[accepted][::-1]
+
+		#pair people off, first come first served in a random order
+		found = np.flatnonzero(chosen != -1)
+		found = found[RNG.permutation(len(found))]
+		a = people[found]
+		b = chosen[found]
+		endpoints = np.concatenate([a,b])
+		proposal = np.concatenate([np.arange(len(a)),np.arange(len(a))])
+		first = np.full(self.N,len(a),dtype=np.int64)
+		np.minimum.at(first,endpoints,proposal)
+		paired = (first[a] == np.arange(len(a))) & (first[b] == np.arange(len(a)))
+		a = a[paired]
+		b = b[paired]
+		self.activity[a] = ACT_TALKING
+		self.target[a] = b
+		self.activity[b] = ACT_TALKING
+		self.target[b] = a
+
+	'''
+	batched intimate choice at home: pick a random one of the partners who are here. returns the mask of people who had no one
+	'''
+	def be_intimate(self,people):
+		found = np.zeros(len(people),dtype=bool)
+		if len(people) == 0:
+			return ~found
+		owner,partner = self.neighbours(self.partners,people)
+		here = self.alive[partner] & (self.loc[partner] == self.loc[people[owner]])
+		owner = owner[here]
+		partner = partner[here]
+		num_here = np.bincount(owner,minlength=len(people))
+		has = np.flatnonzero(num_here > 0)
+		first = np.cumsum(num_here) - num_here
+		a = people[has]
+		b = partner[first[has] + (RNG.randoms(len(has)) * num_here[has]).astype(np.int64)]
+		self.activity[a] = ACT_INTIMATE
+		self.target[a] = b
+		self.activity[b] = ACT_INTIMATE
+		self.target[b] = a
+		found[has] = True
+		return ~found
+
+	'''
+	batched version of the idle branch in get_action_transition: pick uniformly from the actions we're actually able to do
+	(which is what trying them in random order and crossing off the ones we can't do comes out to)
+
+	returns the people who decided to talk, so everyone can be paired off at once
+	'''
+	def choose_idle_action(self,people,allow_intimate):
+		if len(people) == 0:
+			return people
+		can_intimate = np.zeros(len(people),dtype=bool)
+		if allow_intimate:
+			can_intimate = self.partners_degree[people] > 0
+		can_travel = self.has_places[people]
+		options = 2 + can_intimate + can_travel
+		pick = (RNG.randoms(len(people)) * options).astype(np.int64)
+		#0 = idle, 1 = talking, 2 = intimate (if possible) else traveling, 3 = traveling
+		do_intimate = can_intimate & (pick == 2)
+		do_travel = (pick == 3) | (~can_intimate & (pick == 2))
+
+		self.activity[people[pick == 0]] = ACT_IDLE
+		self.target[people[pick == 0]] = -1
+		talkers = [people[pick == 1]]
+		if do_intimate.any():
+			no_partner = people[do_intimate][self.be_intimate(people[do_intimate])]
+			#no partner here after all: choose again from what's left
+			again = self.has_places[no_partner] & (RNG.randoms(len(no_partner)) < 1./3.)
+			self.go_to(no_partner[again],self.pick_rtravel_loc(no_partner[again]))
+			rest = no_partner[~again]
+			coin = RNG.randoms(len(rest)) < 0.5
+			self.activity[rest[coin]] = ACT_IDLE
+			talkers.append(rest[~coin])
+		travelers = people[do_travel]
+		self.go_to(travelers,self.pick_rtravel_loc(travelers))
+		return np.concatenate(talkers)
+
+	'''
+	vectorized Person.day_begin for everyone: go through the disease state transitions
+	'''
+	def day_begin(self):
+		living = np.flatnonzero(self.alive)
+		in_hospital = self.loc_type[self.loc[living]] == LOC_TYPE_INDEX['hospital']
+		died = np.zeros(len(living),dtype=bool)
+		for di,disease in enumerate(self.diseases):
+			s = self.state[di,living]
+			new_s = s.copy()
+			hospital_effect = in_hospital * HOSPITAL_TREATMENT_EFFECT * disease.treatability
+			for infected,symptomatic,recovered,dead in [('II','IS','R','D'),('VII','VIS','VR','VD')]:
+				shows = (s == STATE_CODES[infected]) & self.coinflips(np.full(len(living),disease.symptom_show_rate))
+				new_s[shows] = STATE_CODES[symptomatic]
+
+				sick = s == STATE_CODES[symptomatic]
+				recovers = sick & self.coinflips(np.minimum(disease.recovery_rate + hospital_effect,1.))
+				new_s[recovers] = STATE_CODES[recovered]
+				dies = sick & ~recovers & self.coinflips(1 - self.effective_healthiness(living)) & self.coinflips(np.maximum(0,disease.die_probability - hospital_effect))
+				new_s[dies] = STATE_CODES[dead]
+				died |= dies
+			self.state[di,living] = new_s
+
+		#the dead stop whatever they were doing, and so does anyone interacting with them
+		dead = living[died]
+		self.alive[dead] = False
+		partners = self.target[dead]
+		partners = partners[partners >= 0]
+		self.activity[partners] = ACT_IDLE
+		self.target[partners] = -1
+		self.activity[dead] = ACT_IDLE
+		self.target[dead] = -1
+
+	'''
+	vectorized Person.do_current_action for everyone, returns the number of infections
+	'''
+	def do_current_actions(self):
+		#traveling
+		traveling = np.flatnonzero(self.alive & (self.activity == ACT_TRAVELING))
+		ready = self.travel_counter[traveling] >= self.loc_travel_time[self.loc[traveling]]
+		self.travel_counter[traveling[~ready]] += 1
+		movers = traveling[ready]
+		exhausted = self.route_pos[movers] < self.route_start[movers]
+		self.activity[movers[exhausted]] = ACT_IDLE
+		self.dest[movers[exhausted]] = -1
+		movers = movers[~exhausted]
+		next_locs = self.route_pool[self.route_pos[movers]]
+		self.route_pos[movers] -= 1
+		self.arrive(movers,next_locs)
+		arrived = movers[self.loc[movers] == self.dest[movers]]
+		self.activity[arrived] = ACT_IDLE
+		self.dest[arrived] = -1
+
+		#interactions
+		a = np.flatnonzero(self.alive & ((self.activity == ACT_TALKING) | (self.activity == ACT_INTIMATE)) & (self.target >= 0))
+		b = self.target[a]
+		infections = 0
+		for di,disease in enumerate(self.diseases):
+			sa = self.state[di,a]
+			sb = self.state[di,b]
+			cand = np.flatnonzero(STATE_IS_INFECTIOUS[sa] & STATE_IS_SUSCEPTIBLE[sb])
+			if len(cand) == 0:
+				continue
+			ca = a[cand]
+			cb = b[cand]
+			symptom_effect = disease.symptom_infectivity_modifier * STATE_IS_SYMPTOMATIC[sa[cand]]
+			a_washed = self.coinflips(self.hygiene[ca]).astype(np.int64)
+			b_washed = self.coinflips(self.hygiene[cb]).astype(np.int64)
+			hand_wash_effect = disease.hand_wash_coef * np.array(HANDWASH_EFFECT_MODIFIERS)[a_washed,b_washed]
+			intimate_effect = INTIMATE_EFFECT_MODIFIER * (self.activity[ca] == ACT_INTIMATE)
+			net_symbio_effect = np.zeros(len(cand))
+			for dj in range(len(self.diseases)):
+				if dj != di:
+					net_symbio_effect += self.state_infectability[dj,self.state[dj,cb]]
+			infectivity = self.infectivity[di,self.activity[ca]] + symptom_effect + hand_wash_effect + intimate_effect + net_symbio_effect
+			success = self.coinflips(infectivity)
+
+			#only the first infection of any one person counts, just like the sequential version
+			_, first = np.unique(cb[success],return_index=True)
+			ia = ca[success][first]
+			ib = cb[success][first]
+			self.infected_by[di,ib] = ia
+			self.state[di,ib] = np.where(STATE_IS_VACCINATED[self.state[di,ib]],STATE_CODES['VII'],STATE_CODES['II'])
+			infections += len(ib)
+			if disease.calculate_R_0:
+				for infector in ia:
+					p = self.population[infector]
+					disease.num_infected_by.update({p:disease.num_infected_by.get(p,0) + 1})
+
+		return infections
+
+	'''
+	vectorized Person.action_transition for everyone
+	'''
+	def action_transitions(self,time):
+		act = self.activity.copy()	#decide based on what people were doing at the start of the time step
+		symptomatic = self.symptomatic()
+		undecided = self.alive.copy()
+		during_sleep = times_within(time,self.sleep_begin,self.sleep_end)
+		during_work = times_within(time,self.work_begin,self.work_end) & (self.workplace >= 0)
+		continuing = []
+		talking = []
+		idle_home = []
+		idle_elsewhere = []
+
+		#going to bed logic
+		m = undecided & during_sleep
+		homeless = self.home < 0
+		to_bed = m & (act != ACT_SLEEP) & ((self.loc == self.home) | homeless)
+		self.activity[to_bed] = ACT_SLEEP
+		self.target[to_bed] = -1
+		going_home = np.flatnonzero(m & (act != ACT_SLEEP) & (self.loc != self.home) & ~homeless)
+		self.go_to(going_home,self.home[going_home])
+		undecided &= ~m
+
+		#sickness -> go to the hospital?
+		m = np.flatnonzero(undecided & symptomatic)
+		go_hospital = m[self.coinflips(weighted_prob_combination(self.hygiene[m],0.5,1 - self.effective_healthiness(m),0.5))]
+		self.go_to(go_hospital,self.nearest_hospital[self.loc[go_hospital]])
+		undecided[go_hospital] = False
+
+		#going to work
+		m = undecided & during_work & (self.loc != self.workplace) & ~((act == ACT_TRAVELING) & (self.dest == self.workplace))
+		commuters = np.flatnonzero(m)
+		self.go_to(commuters,self.workplace[commuters])
+		undecided &= ~m
+
+		#at work
+		m = undecided & (self.loc == self.workplace)
+		off_work = np.flatnonzero(m & ~during_work)
+		self.go_to(off_work,self.home[off_work])
+		continuing.append(np.flatnonzero(m & during_work & (act == ACT_TALKING)))
+		m_idle = np.flatnonzero(m & during_work & (act != ACT_TALKING))
+		talk = self.coinflips(np.full(len(m_idle),GENERAL_TALK_PROBABILITY))
+		talking.append(m_idle[talk])
+		self.activity[m_idle[~talk]] = ACT_IDLE
+		undecided &= ~m
+
+		#at home
+		m = undecided & (self.loc == self.home)
+		idle_home.append(np.flatnonzero(m & (act == ACT_IDLE)))
+		continuing.append(np.flatnonzero(m & ((act == ACT_TALKING) | (act == ACT_INTIMATE))))
+		undecided &= ~m
+
+		#at a hospital
+		m = undecided & (self.loc_type[self.loc] == LOC_TYPE_INDEX['hospital'])
+		leaving = np.flatnonzero(m & ~symptomatic)
+		self.go_to(leaving,self.home[leaving])
+		continuing.append(np.flatnonzero(m & symptomatic & (act == ACT_TALKING)))
+		m_idle = np.flatnonzero(m & symptomatic & (act != ACT_TALKING))
+		talk = self.coinflips(np.full(len(m_idle),GENERAL_TALK_PROBABILITY))
+		talking.append(m_idle[talk])
+		self.activity[m_idle[~talk]] = ACT_IDLE
+		undecided &= ~m
+
+		#in public, traveling people keep on truckin
+		undecided &= ~((self.loc_type[self.loc] == LOC_TYPE_INDEX['public']) & (act == ACT_TRAVELING))
+
+		#everything else
+		self.activity[undecided & (act == ACT_SLEEP)] = ACT_IDLE	#the homeless wake up wherever they slept
+		idle_elsewhere.append(np.flatnonzero(undecided & (act == ACT_IDLE)))
+		continuing.append(np.flatnonzero(undecided & ((act == ACT_TALKING) | (act == ACT_INTIMATE))))
+
+		#interactions go last since they also change what the other person is doing
+		self.continue_interaction(np.concatenate(continuing))
+		talking.append(self.choose_idle_action(np.concatenate(idle_home),allow_intimate=True))
+		talking.append(self.choose_idle_action(np.concatenate(idle_elsewhere),allow_intimate=False))
+		self.talk_to(np.concatenate(talking))
+
+	'''
+	do one time step for everyone, returns the number of direct infections
+	'''
+	def step(self,time):
+		infections = self.do_current_actions()
+		self.action_transitions(time)
+		return infections
+
+	'''
+	how many people are in each state for each disease? (list, in self.diseases order, of lists in DISEASE_STATES_LIST order)
+	'''
+	def disease_state_counts(self):
+		return [np.bincount(self.state[di],minlength=len(DISEASE_STATES_LIST)) for di in range(len(self.diseases))]
+
+	'''
+	put everyone back at these locations (indices into loc_list), idle, alive or not (a boolean per person) and in
+	these disease states ([disease][person] indices into DISEASE_STATES_LIST), without having to go through the Person
+	objects again (see Simulation.reset). the routes worked out so far are kept
+	'''
+	def reset(self,location,state,alive):
+		self.loc[:] = location
+		self.activity[:] = ACT_IDLE
+		self.target[:] = -1
+		self.dest[:] = -1
+		self.route_start[:] = 0
+		self.route_pos[:] = -1
+		self.travel_counter[:] = 0
+		self.alive[:] = alive
+		self.state[:] = state
+		self.infected_by[:] = -1
+		self.loc_occupancy = np.bincount(self.loc[self.loc >= 0],minlength=len(self.loc_list))
+
+	'''
+	read these people's (indices into the population) disease states from their Person objects again, for when
+	something outside the simulation (e.g. picking a patient zero) has changed them
+	'''
+	def read_disease_states(self,people):
+		for i in people:
+			p = self.population[i]
+			for di,d in enumerate(self.diseases):
+				self.state[di,i] = STATE_CODES[p.disease_state[d]]
+
+	'''
+	copy everything back into the Person and Location objects so code that looks at those sees the same thing
+	'''
+	def write_back(self):
+		for loc in self.loc_list:
+			loc.people = []
+		for i,p in enumerate(self.population):
+			for di,disease in enumerate(self.diseases):
+				p.set_disease_state(disease,DISEASE_STATES_LIST[self.state[di,i]])
+				if self.infected_by[di,i] != -1:
+					p.infected_by.update({disease:self.population[self.infected_by[di,i]]})
+			p.diseasesShowingSymptoms = any(s in DISEASE_STATES_SYMPTOMATIC for s in p.disease_state.values())
+			if (not self.alive[i]) and (not p.is_dead):
+				p.die()
+			p.travel_counter = int(self.travel_counter[i])
+			if self.loc[i] >= 0:
+				p.currentLocation = self.loc_list[self.loc[i]]
+				p.currentLocation.people.append(p)
+
+			act = Activity(ACTIVITY_TYPES[self.activity[i]])
+			if self.activity[i] == ACT_TRAVELING:
+				act.to = self.loc_list[self.dest[i]]
+				act.path = [self.loc_list[l] for l in self.route_pool[self.route_start[i]:self.route_pos[i]+1]]
+			elif self.target[i] != -1:
+				act.to = self.population[self.target[i]]
+			p.currentActivity = act
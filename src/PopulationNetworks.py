@@ -0,0 +1,135 @@
+"""
+Building the coworker, friend and partner networks for a whole population at once
+
+PopulationBuilder.assign_coworkers/assign_friends/assign_partners do this one person at a time, picking from sets of
+Person objects. here every network is a pair of (source, destination) arrays of positions in the population list, and
+every tie in the population is drawn in a handful of array operations:
+
+	coworkers: k from coworkers_dist (given how many people work there) draws from the people at the same workplace
+	partners: k from partners_dist (given how many people live there) draws from the people in the same home
+	friends: k from friends_dist (given how many people share a home or place with them) people, each drawn by picking
+		one of their home and places and then someone else whose home or place that is
+
+the Person sets can then be filled in from the arrays (materialize), or not at all if only the array engine is going to
+run (PopulationArrays takes the arrays as they are)
+"""
+
+from SINUtil import *
+import scipy.sparse as sp
+
+EDGE_TYPES = ['coworkers','friends','partners']
+
+'''
+group the positions of keys by key: order lists the positions sorted by key, and group g (the g'th distinct key,
+keys[order[starts[g]]]) is order[starts[g]:starts[g] + sizes[g]]. group_of[i] is the group of keys[i]
+'''
+def groups(keys):
+	order = np.argsort(keys,kind='stable')
+	sorted_keys = keys[order]
+	first = np.concatenate([[True],sorted_keys[1:] != sorted_keys[:-1]]) if len(keys) > 0 else np.zeros(0,dtype=bool)
+	starts = np.flatnonzero(first)
+	sizes = np.diff(np.append(starts,len(keys)))
+	group_of = np.empty(len(keys),dtype=np.int64)
+	group_of[order] = np.cumsum(first) - 1
+	return order,starts,sizes,group_of
+
+'''
+one uniformly random member of each of these groups (see groups)
+'''
+def draw_members(group,order,starts,sizes):
+	return order[starts[group] + (RNG.randoms(len(group))*sizes[group]).astype(np.int64)]
+
+'''
+the distinct edges (no self loops) among these, plus the reversed ones if bidirectional, sorted by source
+'''
+def unique_edges(src,dst,N,bidirectional=False):
+	src = np.asarray(src,dtype=np.int64)
+	dst = np.asarray(dst,dtype=np.int64)
+	if bidirectional:
+		src,dst = np.concatenate([src,dst]),np.concatenate([dst,src])
+	keys = np.unique((src*N + dst)[src != dst])
+	return keys // N,keys % N
+
+class PopulationNetworks:
+
+	FRIEND_ROUNDS = 4	#how many times people who drew the same friend twice (or themselves) get to draw again
+
+	def __init__(self,N):
+		self.N = N
+		self.edges = {edge_type:(np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64)) for edge_type in EDGE_TYPES}	#edge type -> (sources,destinations)
+
+	'''
+	draw all three networks for plist, with the builder's degree distributions
+	'''
+	@classmethod
+	def build(cls,builder,plist):
+		networks = cls(len(plist))
+		N = len(plist)
+		loc_index = {}
+		lidx = lambda loc: -1 if loc is None else loc_index.setdefault(loc,len(loc_index))
+		home = np.array([lidx(p.home) for p in plist],dtype=np.int64).reshape(N)
+		workplace = np.array([lidx(p.workplace) for p in plist],dtype=np.int64).reshape(N)
+
+		#coworkers and partners: k draws from the group they're in, k depending on how big the group is
+		for edge_type,group_key,dist,bidirectional in [('coworkers',workplace,builder.coworkers_dist,BIDIRECTIONAL_COWORKERS),
+													   ('partners',home,builder.partners_dist,True)]:
+			people = np.flatnonzero(group_key >= 0)
+			order,starts,sizes,group_of = groups(group_key[people])
+			k = np.array([dist(int(sizes[g])) for g in group_of],dtype=np.int64).reshape(len(people))
+			src = np.repeat(np.arange(len(people)),np.maximum(k,0))
+			dst = draw_members(group_of[src],order,starts,sizes)
+			networks.edges.update({edge_type:unique_edges(people[src],people[dst],N,bidirectional)})
+
+		#friends: everyone's home and places, and who else has each of those
+		member_person = []
+		member_loc = []
+		for i,p in enumerate(plist):
+			for loc in ([p.home] if p.home is not None else []) + list(p.places):
+				member_person.append(i)
+				member_loc.append(lidx(loc))
+		member_person = np.array(member_person,dtype=np.int64)
+		member_loc = np.array(member_loc,dtype=np.int64)
+		loc_order,loc_starts,loc_sizes,loc_group = groups(member_loc)
+		person_order,person_starts,person_sizes,person_group = groups(member_person)
+		members = np.unique(member_person)#people with somewhere to meet anyone (person_group numbers them in this order)
+
+		#how many people they could be friends with: everyone they share somewhere with, counted once per place (which
+		#is only an upper bound when the same person turns up in more than one of them)
+		possible = np.bincount(member_person,weights=loc_sizes[loc_group] - 1,minlength=N).astype(np.int64)
+		k = np.zeros(N,dtype=np.int64)
+		k[members] = [builder.friends_dist(int(possible[i])) for i in members]
+
+		src = np.zeros(0,dtype=np.int64)
+		dst = np.zeros(0,dtype=np.int64)
+		short = k.copy()
+		for _ in range(cls.FRIEND_ROUNDS):
+			drawing = np.repeat(np.arange(N),np.maximum(short,0))
+			if len(drawing) == 0:
+				break
+			#a random one of their places (the membership rows of person p are person_order[...] of p's group), then someone there
+			rows = draw_members(np.searchsorted(members,drawing),person_order,person_starts,person_sizes)
+			friend = member_person[draw_members(loc_group[rows],loc_order,loc_starts,loc_sizes)]
+			src,dst = unique_edges(np.concatenate([src,drawing]),np.concatenate([dst,friend]),N)
+			short = k - np.bincount(src,minlength=N)
+		networks.edges.update({'friends':unique_edges(src,dst,N,BIDIRECTIONAL_FRIENDS)})
+		return networks
+
+	'''
+	fill in everyone's coworkers, friends and partners sets from the arrays (plist being the population the networks
+	were built for)
+	'''
+	def materialize(self,plist):
+		if len(plist) != self.N:
+			raise AttributeError('these networks are for ' + str(self.N) + ' people, not ' + str(len(plist)))
+		for edge_type in EDGE_TYPES:
+			src,dst = self.edges[edge_type]
+			bounds = np.searchsorted(src,np.arange(self.N + 1))
+			for i in np.flatnonzero(np.diff(bounds)):
+				getattr(plist[i],edge_type).update(plist[j] for j in dst[bounds[i]:bounds[i+1]].tolist())
+
+	'''
+	the network as a boolean N x N csr matrix (the way PopulationArrays keeps it)
+	'''
+	def matrix(self,edge_type):
+		src,dst = self.edges[edge_type]
+		return sp.csr_matrix((np.ones(len(src),dtype=bool),(src,dst)),shape=(self.N,self.N),dtype=bool)
@@ -0,0 +1,209 @@
+"""
+Saving a built population to a file and loading it back, so the same city can be used for any number of runs without
+going through PopulationBuilder every time (see Simulation.save_population/load_population)
+
+a snapshot is an npz of flat arrays, one entry per person (or per location, or per tie), indexed by position in the
+population list and the map's loc_list:
+
+	people: home, workplace, current location, age, hygiene, healthiness, work and sleep schedules, whether they're dead
+	places and the coworker, friend and partner networks as (person, location) and (person, person) edge lists
+	disease states [disease][person] by disease name, as indices into the list of state names saved with them
+	locations: everything PopulationBuilder changes about them (capacity, school, place ages, work times)
+
+a snapshot only fits the map it was made on, which is checked by map_key. what people are doing (their current
+activity, who infected whom) isn't kept, it's meant for populations that haven't been simulated yet
+"""
+
+from SINUtil import *
+
+SNAPSHOT_VERSION = 2	#change this whenever what goes in a snapshot changes, so old ones aren't read wrong
+
+LOCATION_FIELDS = {'capacity':np.int64,'is_school':bool,'avg_age':np.float64,'age_stdev':np.float64,
+				   'avg_work_begin_time':np.float64,'work_begin_stdev':np.float64,'avg_work_duration':np.float64,'work_duration_stdev':np.float64}
+PERSON_FIELDS = {'age':np.int64,'hygiene_coef':np.float64,'healthiness':np.float64,'is_dead':bool}
+
+'''
+something that identifies the map's locations (what they are and where, in loc_list order), for telling whether a
+snapshot belongs to it
+'''
+def map_key(M):
+	import hashlib
+	from Map import LOC_TYPE_INDEX
+	layout = np.array([(LOC_TYPE_INDEX[loc.loc_type],loc.mapx,loc.mapy) for loc in M.loc_list],dtype=np.int64).reshape(-1,3)
+	return hashlib.sha256(layout.tobytes()).hexdigest()
+
+'''
+(source, destination) index arrays for everyone's edges(p), where index gives each destination's index
+'''
+def edge_list(population,edges,index):
+	src = []
+	dst = []
+	for i,p in enumerate(population):
+		for q in edges(p):
+			if q in index:
+				src.append(i)
+				dst.append(index[q])
+	return np.array(src,dtype=np.int64),np.array(dst,dtype=np.int64)
+
+'''
+write population (on the map M) to fname. networks (their PopulationNetworks) is where the networks come from if given,
+otherwise they come from everyone's sets
+'''
+def save_population(fname,population,M,networks=None):
+	loc_index = {loc:i for i,loc in enumerate(M.loc_list)}
+	person_index = {p:i for i,p in enumerate(population)}
+	lidx = lambda loc: -1 if loc is None else loc_index[loc]
+	N = len(population)
+
+	contents = {'version':np.array(SNAPSHOT_VERSION),
+				'map_key':np.array(map_key(M)),
+				'avg_ages_assigned':np.array(M.avg_ages_assigned),
+				'home':np.array([lidx(p.home) for p in population],dtype=np.int64).reshape(N),
+				'workplace':np.array([lidx(p.workplace) for p in population],dtype=np.int64).reshape(N),
+				'location':np.array([lidx(p.currentLocation) for p in population],dtype=np.int64).reshape(N),
+				'work_schedule':np.array([p.work_schedule if p.work_schedule is not None else (0,0) for p in population],dtype=np.int64).reshape(N,2),
+				'sleep_schedule':np.array([p.sleep_schedule for p in population],dtype=np.int64).reshape(N,2)}
+	for field,dtype in PERSON_FIELDS.items():
+		contents.update({'person_' + field:np.array([getattr(p,field) for p in population],dtype=dtype).reshape(N)})
+	for field,dtype in LOCATION_FIELDS.items():
+		contents.update({'loc_' + field:np.array([getattr(loc,field) for loc in M.loc_list],dtype=dtype).reshape(len(M.loc_list))})
+
+	contents.update(dict(zip(['places_src','places_dst'],edge_list(population,lambda p: p.places,loc_index))))
+	for edge_type in ['coworkers','friends','partners']:
+		if networks is not None:
+			src,dst = networks.edges[edge_type]
+		else:
+			src,dst = edge_list(population,lambda p: getattr(p,edge_type),person_index)
+		contents.update({edge_type + '_src':src,edge_type + '_dst':dst})
+
+	diseases = []
+	for p in population:
+		for disease in p.disease_state:
+			if disease.name not in diseases:
+				diseases.append(disease.name)
+	by_name = [{disease.name:state for disease,state in p.disease_state.items()} for p in population]
+	contents.update({'diseases':np.array(diseases,dtype=str),
+					 'states':np.array(DISEASE_STATES_LIST,dtype=str),#the order of DISEASE_STATES_LIST isn't the same from one run to the next
+					 'disease_state':np.array([[DISEASE_STATES_LIST.index(states.get(name,'S')) for states in by_name] for name in diseases],dtype=np.int8).reshape(len(diseases),N)})
+
+	with open(fname,'wb') as f:
+		np.savez_compressed(f,**contents)
+
+'''
+read a population saved by save_population onto the map M (which has to be the same map, without anyone on it yet),
+returning (population, PopulationNetworks)
+
+diseases are matched to the saved disease states by name, and anyone who wasn't saved with one of them starts off the
+way PopulationBuilder would have started them. materialize_networks = False leaves everyone's coworkers, friends and
+partners sets empty (the array engine only needs the PopulationNetworks)
+'''
+def load_population(fname,M,diseases=(),materialize_networks=True):
+	from PersonState import Person, SocialDistanceIndex, assign_initial_disease_state
+	from PopulationNetworks import PopulationNetworks
+	with np.load(fname,allow_pickle=False) as snapshot:
+		if int(snapshot['version']) != SNAPSHOT_VERSION:
+			raise AttributeError(fname + ' is a version ' + str(int(snapshot['version'])) + ' population snapshot, this can only read version ' + str(SNAPSHOT_VERSION))
+		if str(snapshot['map_key']) != map_key(M):
+			raise AttributeError(fname + ' was saved on a different map')
+		s = {k:snapshot[k] for k in snapshot.files}
+
+	#the locations first, since the people need them the way they were (homes big enough, the school where it was)
+	for field in LOCATION_FIELDS:
+		for loc,value in zip(M.loc_list,s['loc_' + field].tolist()):
+			setattr(loc,field,value)
+	M.avg_ages_assigned = bool(s['avg_ages_assigned'])
+
+	locs = M.loc_list
+	population = []
+	for i,(home,workplace,location) in enumerate(zip(s['home'].tolist(),s['workplace'].tolist(),s['location'].tolist())):
+		p = Person(locs[home] if home >= 0 else None,M)
+		if (location >= 0) and (p.currentLocation is not locs[location]):
+			locs[location].arrive(p)
+		if workplace >= 0:
+			p.set_workplace(locs[workplace])
+		p.work_schedule = tuple(s['work_schedule'][i].tolist())
+		p.sleep_schedule = tuple(s['sleep_schedule'][i].tolist())
+		population.append(p)
+	for field in PERSON_FIELDS:
+		for p,value in zip(population,s['person_' + field].tolist()):
+			setattr(p,field,value)
+	for i,l in zip(s['places_src'].tolist(),s['places_dst'].tolist()):
+		population[i].add_place(locs[l])
+
+	saved = {name:d for d,name in enumerate(s['diseases'].tolist())}
+	states = s['states'].tolist()
+	for disease in diseases:
+		if disease.name in saved:
+			for p,code in zip(population,s['disease_state'][saved[disease.name]].tolist()):
+				p.disease_state.update({disease:states[code]})
+		else:
+			for p in population:
+				assign_initial_disease_state(p,disease)
+
+	networks = PopulationNetworks(len(population))
+	for edge_type in networks.edges:
+		networks.edges.update({edge_type:(s[edge_type + '_src'],s[edge_type + '_dst'])})
+	if materialize_networks:
+		networks.materialize(population)
+
+	social_distances = SocialDistanceIndex()
+	for p in population:
+		p.social_distances = social_distances
+	return population,networks
+
+"""
+Where a population started, kept in memory so that it can be put back there for another run (see Simulation.reset)
+
+only what a simulation changes is kept, as arrays: where everyone was and their disease states. putting them back is a
+pass over the people setting a handful of attributes (and everyone's networks, places, schedules etc. are left alone,
+since nothing changes those), which is much cheaper than building the population again or copying it
+"""
+class PopulationState:
+
+	def __init__(self,population,M,diseases):
+		self.population = population
+		self.M = M
+		self.diseases = list(diseases)
+		self.members = set(population)
+		loc_index = {loc:i for i,loc in enumerate(M.loc_list)}
+		N = len(population)
+		self.location = np.array([-1 if p.currentLocation is None else loc_index[p.currentLocation] for p in population],dtype=np.int64).reshape(N)
+		self.state = np.array([[DISEASE_STATES_LIST.index(p.disease_state[d]) for p in population] for d in self.diseases],dtype=np.int8).reshape(len(self.diseases),N)
+		self.was_dead = np.array([p.is_dead for p in population],dtype=bool).reshape(N)
+
+	'''
+	put everyone back where they were, idle, in the disease states they started in, and alive (if they were)
+	'''
+	def restore(self):
+		from PersonState import Activity, SocialDistanceIndex
+		for loc in self.M.loc_list:
+			if len(loc.people) > 0:
+				loc.people = [q for q in loc.people if q not in self.members]
+
+		locs = self.M.loc_list
+		social_distances = SocialDistanceIndex()
+		for i,(p,l,was_dead) in enumerate(zip(self.population,self.location.tolist(),self.was_dead.tolist())):
+			if p.is_dead and (not was_dead):
+				#dying takes people off their home's, workplace's and places' lists (but leaves those on them)
+				p.is_dead = False
+				if p.home is not None:
+					p.home.employees_residents.add(p)
+					p.home.clientele.add(p)
+				if p.workplace is not None:
+					p.workplace.employees_residents.add(p)
+				for loc in p.places:
+					loc.clientele.add(p)
+			p.currentLocation = locs[l] if l >= 0 else None
+			if l >= 0:
+				locs[l].people.append(p)
+			p.currentActivity = Activity('idle')
+			p.travel_counter = 0
+			p.disease_state = {d:DISEASE_STATES_LIST[self.state[di,i]] for di,d in enumerate(self.diseases)}
+			p.infected_by = {}
+			p.diseasesShowingSymptoms = False
+			p.idle_infection_count = 0
+			p.disease_state_counts = None
+			p.social_distances = social_distances
+
+		for d in self.diseases:
+			d.num_infected_by = {}
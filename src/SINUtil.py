@@ -50,6 +50,8 @@ HOSPITAL_TREATMENT_EFFECT = 0.5	#to what extent (modulo the treatability of the
 
 DISABLE_IDLE_INFECTION = True	#makes it so that idle infections (where people aren't explicitly interacting) aren't modeled
 
+MAP_DELTA_MARKER = 'DELTA'	#second field of the rows of a map_delta dump that only list what changed (see Simulation.dump_map_delta_info)
+
 """
 Given a "time string" (HH:MM:SS, HH:MM, or just HH), convert that string into the equivalent number of time steps after midnight
 """
@@ -81,7 +83,7 @@ def swap(a,idx1,idx2):
 	a[idx2] = temp
 
 def partition(a,low,high,comp):
-	pivotIdx = np.random.choice(list(range(low,high)))
+	pivotIdx = RNG.integer(low,high)
 	pivot = a[pivotIdx]
 	swap(a,pivotIdx,high-1)
 	j = low
@@ -111,7 +113,7 @@ comp function defines how to compare two elements. this one gives "descending" o
 def stoch_sort(a,levels=1,comp = lambda x,y: x > y):
 	if levels == 0:
 		aa = np.array(a)
-		np.random.shuffle(aa)
+		RNG.shuffle(aa)
 		return [list(x) for x in aa]#shuffle instead of sort
 	else:
 		aa = a.copy()
@@ -125,9 +127,94 @@ Combine these probabilities into a unified one depending on given weights which
 def weighted_prob_combination(p1,w1,p2,w2):
 	return p1*w1 + p2*w2
 
+"""
+Source of all the randomness in the simulation
+
+uniforms are drawn from the generator in big blocks and handed out one at a time, since asking numpy for them one by
+one (or worse, building an array of choices and validating probabilities every time like np.random.choice does) is
+most of the cost of a coinflip. anything that wants a lot of random numbers at once should use the vectorized ones
+(randoms, coinflips) which go straight to the generator
+"""
+class RandomPool:
+
+	BLOCK_SIZE = 1 << 16
+
+	def __init__(self,seed=None,block_size=BLOCK_SIZE):
+		self.block_size = block_size
+		self.seed(seed)
+
+	'''
+	start over from this seed (None for fresh entropy), throwing away anything already drawn
+	'''
+	def seed(self,seed=None):
+		self.generator = np.random.default_rng(seed)
+		self.block = []
+		self.pos = 0
+
+	'''
+	uniform in [0,1)
+	'''
+	def random(self) -> float:
+		if self.pos >= len(self.block):
+			self.block = self.generator.random(self.block_size).tolist()#python floats are much cheaper to hand out than numpy scalars
+			self.pos = 0
+		r = self.block[self.pos]
+		self.pos += 1
+		return r
+
+	'''
+	array of uniforms in [0,1) with the given shape
+	'''
+	def randoms(self,shape):
+		return self.generator.random(shape)
+
+	def coinflip(self,p) -> bool:
+		return self.random() < p#p <= 0 never happens, p >= 1 always does
+
+	def coinflips(self,p):
+		p = np.asarray(p)
+		return self.randoms(p.shape) < p
+
+	'''
+	integer in [low,high)
+	'''
+	def integer(self,low,high) -> int:
+		return low + int(self.random()*(high - low))
+
+	'''
+	uniformly random element of the sequence seq
+	'''
+	def choice(self,seq):
+		return seq[int(self.random()*len(seq))]
+
+	'''
+	size uniformly random elements of the sequence seq (with replacement)
+	'''
+	def choices(self,seq,size):
+		return [seq[i] for i in (self.randoms(size)*len(seq)).astype(np.int64)]
+
+	def uniform(self,low=0.,high=1.) -> float:
+		return low + (high - low)*self.random()
+
+	def normal(self,loc=0.,scale=1.) -> float:
+		return self.generator.normal(loc,scale)
+
+	'''
+	shuffle the list (or array) a in place
+	'''
+	def shuffle(self,a):
+		self.generator.shuffle(a)
+
+	def permutation(self,n):
+		return self.generator.permutation(n)
+
+RNG = RandomPool()#the one everything uses, Simulation(seed=...) reseeds it
+
 def coinflip(p):
-	p = max(min(p,1),0)
-	return np.random.choice([True,False],p=[p,1-p])
+	return RNG.coinflip(p)
+
+def coinflips(p):
+	return RNG.coinflips(p)
 
 
 """
@@ -9,16 +9,28 @@ from SINUtil import *
 from PersonState import Person, Location, Activity, PopulationBuilder
 from Map import Map, MapReader
 from Disease import *
+from DumpWriter import DumpWriter
+import BinaryDump
 
 class Simulation:
 
 	DUMP_FILE_DELIMITER = '|'
+	MAP_DELTA_KEYFRAME_INTERVAL = 10	#for map_delta dumps: how many dumps (including the keyframe itself) there are per full keyframe
+
+	ENGINES = {'object','array'}
 
 	'''
-	infodump type should be a list of strings in {infection,network,map}, with the file to dump them to in the same order in infodump_file
+	infodump type should be a list of strings in {infection,network,map,map_delta,binary}, with the file to dump them to in the same order in infodump_file
+	(map_delta and binary hold the same information as map in much smaller files, see dump_map_delta_info and BinaryDump)
 	file should be a list -- one for each
+
+	engine is either 'object' (every Person decides for themselves every time step) or 'array' (the whole population is
+	stepped at once as numpy arrays, see PopulationArrays)
+
+	seed (if given) reseeds the random source (SINUtil.RNG) that everything draws from, so that building the
+	population and running the simulation afterwards are reproducible
 	'''
-	def __init__(self,infodump_file=None,time_steps_per_infodump=100,ensure_non_immune_patient_zero=False,infodump_type=None):
+	def __init__(self,infodump_file=None,time_steps_per_infodump=100,ensure_non_immune_patient_zero=False,infodump_type=None,engine='object',seed=None):
 
 		self.diseases = all_diseases	#default to everything
 		self.population = []
@@ -43,16 +55,125 @@ class Simulation:
 		if self.infodump_file is not None:
 			self.initial_infodump_done = [False for _ in self.infodump_file]
 
+		if engine not in self.ENGINES:
+			raise AttributeError('engine should be one of ' + str(self.ENGINES) + ', not ' + str(engine))
+		self.engine = engine
+		self.population_arrays = None	#only used by the array engine, built from the population on the first simulated day
+		self.population_networks = None	#the population's PopulationNetworks, if it came with them (the array engine uses these instead of everyone's sets)
+		self.initial_state = None	#PopulationSnapshot.PopulationState the population started in, which reset goes back to
+		self.disease_state_counts = None	#running DiseaseStateCounts for the population, see get_disease_state_counts
+		self.dump_writer = DumpWriter()	#keeps the infodump files open and writes them in the background, see close_dumps
+		self.binary_dump_loc_index = None	#location -> index in the binary dump's location table, set when its header is written
+		self.map_delta_previous = {}	#map_delta dump file -> map_info_people at its last dump
+		self.map_delta_dumps_since_keyframe = {}	#map_delta dump file -> how many dumps since (and including) its last keyframe
+
+		self.seed = seed
+		if seed is not None:
+			RNG.seed(seed)
+
 	def read_map_from_image(self,mr:MapReader,fname:str):
 		self.map = mr.create_map_from_file(fname)
 
 	def set_diseases(self,to:list):
 		self.diseases = to
 		self.true_R_0 = {disease:0. for disease in self.diseases}
+		self.disease_state_counts = None
 
 	def create_population(self,pb: PopulationBuilder):
 		pb.set_diseases_present(self.diseases)
 		self.population = pb.create_population()
+		self.population_networks = pb.networks
+		self.population_arrays = None
+		self.disease_state_counts = None
+		self.save_initial_state()
+
+	'''
+	save the population (which should not have been simulated yet) to fname, so that load_population can use it again
+	(see PopulationSnapshot)
+	'''
+	def save_population(self,fname):
+		import PopulationSnapshot
+		M = self.map if self.map is not None else self.population[0].M
+		networks = self.population_networks
+		if (networks is not None) and (networks.N != len(self.population)):
+			networks = None
+		PopulationSnapshot.save_population(fname,self.population,M,networks=networks)
+
+	'''
+	use the population saved in fname instead of building one (the map has to be the one it was saved on, read the same
+	way, and the diseases need to be set first)
+	'''
+	def load_population(self,fname,materialize_networks=True):
+		import PopulationSnapshot
+		self.population,self.population_networks = PopulationSnapshot.load_population(fname,self.map,self.diseases,materialize_networks)
+		self.population_arrays = None
+		self.disease_state_counts = None
+		self.save_initial_state()
+
+	'''
+	remember where the population is now (where they are and their disease states) as where reset puts them back to.
+	this happens by itself when the population is created or loaded, and when full_simulation starts if the population
+	was set some other way
+	'''
+	def save_initial_state(self):
+		from PopulationSnapshot import PopulationState
+		M = self.map if self.map is not None else self.population[0].M
+		self.initial_state = PopulationState(self.population,M,self.diseases)
+
+	'''
+	go back to the start, so the same population can be run again: everyone goes back home (or wherever they were),
+	idle and in the disease states they started in (vaccinated or not), the clock goes back to 0, and all the counts and
+	R_0 estimates start over. the dump files get written again from the beginning
+
+	the array engine's arrays are put back too rather than built again
+	'''
+	def reset(self):
+		if (self.initial_state is None) or (self.initial_state.population is not self.population):
+			raise AttributeError('there is no saved initial state for this population to reset to (see save_initial_state)')
+		self.close_dumps()
+		self.dump_writer = DumpWriter()
+		if self.infodump_file is not None:
+			self.initial_infodump_done = [False for _ in self.infodump_file]
+		self.binary_dump_loc_index = None
+		self.map_delta_previous = {}
+		self.map_delta_dumps_since_keyframe = {}
+
+		state = self.initial_state
+		self.diseases = list(state.diseases)
+		state.restore()
+		if self.population_arrays is not None:
+			if self.population_arrays.diseases == self.diseases:
+				self.population_arrays.reset(state.location,state.state,~state.was_dead)
+			else:
+				self.population_arrays = None
+		self.disease_state_counts = None
+
+		self.current_time = 0
+		self.total_direct_infections_today = 0
+		self.total_idle_infections_today = 0
+		self.prev_infection_counts = []
+		self.true_R_0 = {disease:0. for disease in self.diseases}
+		self.R_0_calculation_finished = False
+
+	'''
+	the running count of people in each disease state (DiseaseStateCounts), which is built by going through the
+	population the first time it's asked for (or if the population has been replaced since) and kept up to date as
+	people change state after that
+	'''
+	def get_disease_state_counts(self) -> DiseaseStateCounts:
+		if (self.disease_state_counts is None) or (self.disease_state_counts.population is not self.population):
+			self.disease_state_counts = DiseaseStateCounts(self.diseases,self.population)
+		return self.disease_state_counts
+
+	'''
+	for each disease, how many people are in each state? (mapping of disease -> state -> count)
+	'''
+	def count_disease_states(self) -> dict:
+		if self.population_arrays is not None:
+			counts = self.population_arrays.disease_state_counts()
+			return {disease:{state:int(counts[di][si]) for si,state in enumerate(DISEASE_STATES_LIST)} for di,disease in enumerate(self.population_arrays.diseases)}
+
+		return self.get_disease_state_counts().as_dict()
 
 	def inc_time_step(self):
 		if (self.infodump_file is not None) or self.store_R_0s:
@@ -61,31 +182,29 @@ class Simulation:
 		self.current_time += 1
 
 	def infection_info_format(self):
-		retstr = 'TIME STEP' + self.DUMP_FILE_DELIMITER
+		fields = ['TIME STEP']
 		for disease in self.diseases:
 			for stype in DISEASE_STATES_LIST:
-				retstr += disease.name + ' '
-				retstr += stype + self.DUMP_FILE_DELIMITER
+				fields.append(disease.name + ' ' + stype)
 
-		retstr += 'TOTAL'
-		return retstr
+		fields.append('TOTAL')
+		return self.DUMP_FILE_DELIMITER.join(fields)
 	'''
 	just the info on how many people were infected:
 	
 	time step | (for each disease: disease name | (for each state: count of people in that state))
 	'''
 	def dump_infection_info(self) -> str:
-		retstr = str(self.current_time) + self.DUMP_FILE_DELIMITER
+		fields = [str(self.current_time)]
+		counts = self.count_disease_states()
 		for disease in self.diseases:
-			disease_state_counts = {state: 0 for state in DISEASE_STATES_LIST}
-			for person in self.population:
-				disease_state_counts[person.disease_state[disease]] += 1
+			disease_state_counts = counts[disease]
 
 			for state in DISEASE_STATES_LIST:
-				retstr += str(disease_state_counts[state]) + self.DUMP_FILE_DELIMITER
+				fields.append(str(disease_state_counts[state]))
 
-		retstr += str(len(self.population))
-		return retstr
+		fields.append(str(len(self.population)))
+		return self.DUMP_FILE_DELIMITER.join(fields)
 
 	def network_info_format(self) -> str:
 		return ''#TODO: implement infection network dump format
@@ -105,15 +224,15 @@ class Simulation:
 	time step | (for each person: person id | location | (for each disease: disease name | disease state))
 	'''
 	def map_info_format(self) -> str:
-		retstr = 'TIME STEP' + self.DUMP_FILE_DELIMITER
+		fields = ['TIME STEP']
 		for person in self.population:
-			retstr += str(person.id) + self.DUMP_FILE_DELIMITER + 'CURRENT LOCATION' + self.DUMP_FILE_DELIMITER
+			fields.append(str(person.id))
+			fields.append('CURRENT LOCATION')
 			for disease in self.diseases:
-				retstr += disease.name + self.DUMP_FILE_DELIMITER
-				retstr += person.disease_state[disease] + self.DUMP_FILE_DELIMITER
+				fields.append(disease.name)
+				fields.append(person.disease_state[disease])
 
-		retstr = retstr[:-1]#drop the last delimiter
-		return retstr
+		return self.DUMP_FILE_DELIMITER.join(fields)
 
 	'''
 	this is the info on who was at what location at what time and what state they were in
@@ -121,14 +240,109 @@ class Simulation:
 	in reality it just gives, for each person, their location (given as (mapx,mapy) and their state at the given time)
 	'''
 	def dump_map_info(self) -> str:
-		retstr = str(self.current_time) + self.DUMP_FILE_DELIMITER
+		fields = [str(self.current_time)]
+		for person_fields in self.map_info_people():
+			fields += person_fields
+
+		return self.DUMP_FILE_DELIMITER.join(fields)
+
+	'''
+	the map dump fields for each person: [person id, (mapx,mapy), (for each disease: disease name, disease state)]
+	'''
+	def map_info_people(self) -> list:
+		if self.population_arrays is not None:
+			return self.map_info_people_arrays()
+		people = []
 		for person in self.population:
-			retstr += str(person.id) + self.DUMP_FILE_DELIMITER + str((person.currentLocation.mapx,person.currentLocation.mapy)) + self.DUMP_FILE_DELIMITER
+			person_fields = [str(person.id),str((person.currentLocation.mapx,person.currentLocation.mapy))]
+			for disease in self.diseases:
+				person_fields.append(disease.name)
+				person_fields.append(person.disease_state[disease])
+			people.append(person_fields)
+		return people
+
+	'''
+	same as map_info_people, but reading from the array engine's state
+	'''
+	def map_info_people_arrays(self) -> list:
+		pa = self.population_arrays
+		people = []
+		for i,person in enumerate(self.population):
+			loc = pa.loc_list[pa.loc[i]]
+			person_fields = [str(person.id),str((loc.mapx,loc.mapy))]
 			for disease in self.diseases:
-				retstr += disease.name + self.DUMP_FILE_DELIMITER
-				retstr += person.disease_state[disease] + self.DUMP_FILE_DELIMITER
+				person_fields.append(disease.name)
+				if disease in pa.diseases:
+					person_fields.append(DISEASE_STATES_LIST[pa.state[pa.diseases.index(disease),i]])
+				else:
+					person_fields.append(person.disease_state[disease])
+			people.append(person_fields)
+		return people
 
-		return retstr[:-1]
+	'''
+	map_delta format: the same as map, except that only every MAP_DELTA_KEYFRAME_INTERVAL'th dump (a keyframe) is a
+	full map row. the ones in between only list the people whose location or disease states changed since the
+	previous dump, and have DELTA as their second field:
+
+	time step | DELTA | (for each person that changed: person id | location | (for each disease: disease name | disease state))
+
+	(see MapWriter.load_sim_config for reading these back)
+	'''
+	def dump_map_delta_info(self,fname) -> str:
+		people = self.map_info_people()
+		previous = self.map_delta_previous.get(fname)
+		dumps_since_keyframe = self.map_delta_dumps_since_keyframe.get(fname,0)
+
+		if (previous is None) or (dumps_since_keyframe >= self.MAP_DELTA_KEYFRAME_INTERVAL):
+			fields = [str(self.current_time)]
+			for person_fields in people:
+				fields += person_fields
+			dumps_since_keyframe = 0
+		else:
+			fields = [str(self.current_time),MAP_DELTA_MARKER]
+			for person_fields,previous_fields in zip(people,previous):
+				if person_fields != previous_fields:
+					fields += person_fields
+
+		self.map_delta_previous.update({fname:people})
+		self.map_delta_dumps_since_keyframe.update({fname:dumps_since_keyframe + 1})
+		return self.DUMP_FILE_DELIMITER.join(fields)
+
+	'''
+	make sure everything dumped so far is on disk and close the dump files. full_simulation does this when it's done,
+	anyone driving simulate_day themselves should call it when they're finished
+	'''
+	def close_dumps(self):
+		self.dump_writer.close()
+
+	'''
+	header for the binary dump (see BinaryDump): the people, diseases, states and locations the frames refer to
+	'''
+	def binary_info_format(self) -> bytes:
+		M = self.map if self.map is not None else self.population[0].M
+		self.binary_dump_loc_index = {loc:i for i,loc in enumerate(M.loc_list)}
+		locations = [(loc.id,loc.mapx,loc.mapy) for loc in M.loc_list]
+		return BinaryDump.header_bytes([p.id for p in self.population],[d.name for d in self.diseases],DISEASE_STATES_LIST,locations)
+
+	'''
+	one frame of the binary dump: everyone's location and disease states right now
+	'''
+	def dump_binary_info(self) -> bytes:
+		pa = self.population_arrays
+		if pa is not None:
+			lut = np.array([self.binary_dump_loc_index[loc] for loc in pa.loc_list],dtype=np.int32)
+			loc = lut[pa.loc]
+		else:
+			loc = [self.binary_dump_loc_index[person.currentLocation] for person in self.population]
+
+		state = np.zeros((len(self.diseases),len(self.population)),dtype=np.int8)
+		state_code = {s:i for i,s in enumerate(DISEASE_STATES_LIST)}
+		for di,disease in enumerate(self.diseases):
+			if (pa is not None) and (disease in pa.diseases):
+				state[di] = pa.state[pa.diseases.index(disease)]#the array engine uses the same codes
+			else:
+				state[di] = [state_code[person.disease_state[disease]] for person in self.population]
+		return BinaryDump.frame_bytes(self.current_time,loc,state)
 
 	def dump_info(self):
 		assert((self.infodump_file is not None) or self.store_R_0s)
@@ -138,27 +352,32 @@ class Simulation:
 				write_str = ''
 				if ftype == 'infection':
 					if not self.initial_infodump_done[i]:
-						with open(file,'w') as f:
-							f.write(self.infection_info_format() + '\n')
+						self.dump_writer.write(file,[self.infection_info_format(),'\n'],mode='w')
 						self.initial_infodump_done[i] = True
 					write_str = self.dump_infection_info()
 				elif ftype == 'network':
 					if not self.initial_infodump_done[i]:
-						with open(file, 'w') as f:
-							f.write(self.network_info_format() + '\n')
+						self.dump_writer.write(file,[self.network_info_format(),'\n'],mode='w')
 						self.initial_infodump_done[i] = True
 					write_str = self.dump_network_info()
 				elif ftype == 'map':
 					if not self.initial_infodump_done[i]:
-						with open(file, 'w') as f:
-							f.write(self.map_info_format() + '\n')
+						self.dump_writer.write(file,[self.map_info_format(),'\n'],mode='w')
 						self.initial_infodump_done[i] = True
 					write_str = self.dump_map_info()
+				elif ftype == 'map_delta':
+					if not self.initial_infodump_done[i]:
+						self.dump_writer.write(file,[self.map_info_format(),'\n'],mode='w')
+						self.initial_infodump_done[i] = True
+					write_str = self.dump_map_delta_info(file)
+				elif ftype == 'binary':
+					if not self.initial_infodump_done[i]:
+						self.dump_writer.write(file,self.binary_info_format(),mode='w')
+						self.initial_infodump_done[i] = True
+					self.dump_writer.write(file,self.dump_binary_info())
 
 				if len(write_str) > 0:
-					write_str = write_str + '\n'
-					with open(file, 'a') as f:
-						f.write(write_str)
+					self.dump_writer.write(file,[write_str,'\n'])
 
 
 		if self.store_R_0s:
@@ -166,13 +385,8 @@ class Simulation:
 				# calculate the R_0 value for today
 				if len(disease.num_infected_by) > 0:
 					today_r0 = np.mean(list(disease.num_infected_by.values()))
-					# infected_now = 0
-					all_infected = True
-					for person in self.population:
-						# if person.disease_state[disease] in DISEASE_STATES_INFECTIOUS:
-						# 	infected_now += 1
-						if person.disease_state[disease] in DISEASE_STATES_SUSCEPTIBLE:
-							all_infected = False
+					state_counts = self.count_disease_states()[disease]
+					all_infected = sum(state_counts[state] for state in DISEASE_STATES_SUSCEPTIBLE) == 0
 					if today_r0 > self.true_R_0[disease]:
 						self.true_R_0[disease] = today_r0
 					if all_infected:
@@ -181,6 +395,9 @@ class Simulation:
 	def simulate_day(self):
 		self.total_direct_infections_today = 0
 		self.total_idle_infections_today = 0
+		if self.engine == 'array':
+			self.simulate_day_arrays()
+			return
 		#first call all the day begin things
 		for person in self.population:
 			person.day_begin()
@@ -198,15 +415,39 @@ class Simulation:
 
 			self.inc_time_step()#may have information dumping side effects
 
+	'''
+	simulate_day for the array engine. the Person objects are brought up to date at the end of the day, so everything
+	that looks at them between days (convergence checks, summaries) works the same as with the object engine
+	'''
+	def simulate_day_arrays(self):
+		if (self.population_arrays is None) or (self.population_arrays.diseases != self.diseases):
+			from PopulationArrays import PopulationArrays
+			M = self.map if self.map is not None else self.population[0].M
+			networks = self.population_networks
+			if (networks is not None) and (networks.N != len(self.population)):
+				networks = None#they were for some other population
+			self.population_arrays = PopulationArrays(self.population,self.diseases,M,networks=networks)
+
+		self.population_arrays.day_begin()
+		for day_time in range(TIME_STEPS_PER_DAY):
+			self.total_direct_infections_today += self.population_arrays.step(day_time)
+
+			if self.R_0_calculation_finished:
+				break
+
+			self.inc_time_step()#may have information dumping side effects
+
+		self.population_arrays.write_back()
+
 	'''
 	`strict` convergence -- all diseases in final states (dead, nonsusceptible, etc.)
 	takes about 1m 17s on the small map with 100 population to do 10 days
 	'''
 	def converged_strict(self):
-		for person in self.population:
-			for disease in person.disease_state:
-				if person.disease_state[disease] not in DISEASE_STATES_FINAL:
-					return False
+		counts = self.get_disease_state_counts()
+		for disease in counts.diseases:
+			if counts.count(disease,DISEASE_STATES - DISEASE_STATES_FINAL) > 0:
+				return False
 		return True
 
 	'''
@@ -216,19 +457,11 @@ class Simulation:
 	takes about 1m 22s on the small map with 100 population to do 10 days
 	'''
 	def converged_strict_single_dead(self):
-		diseases_dead = set(self.diseases)
-		for person in self.population:
-			dd_iterate = diseases_dead.copy()
-			for disease in dd_iterate:
-				if person.disease_state[disease] not in DISEASE_STATES_FINAL:
-					#this disease is still alive
-					diseases_dead.remove(disease)
-
-			if len(diseases_dead) == 0:
-				# then all of them are still alive, so we can keep going
-				return False
-
-		return True#one of them must never have found a person in the final disease state, so at least one is dead
+		counts = self.get_disease_state_counts()
+		for disease in self.diseases:
+			if counts.count(disease,DISEASE_STATES - DISEASE_STATES_FINAL) == 0:
+				return True#no one is in a nonfinal state for this one, so it's dead
+		return False#all of them are still alive, so we can keep going
 
 	'''
 	much 'looser' type of convergence that only requires no new infections in a while
@@ -250,7 +483,10 @@ class Simulation:
 
 	def full_simulation(self,converged=converged_strict_single_dead,verbose = False,time_limit=0,store_R_0s=False):
 		self.store_R_0s = store_R_0s
+		if (self.initial_state is None) or (self.initial_state.population is not self.population):
+			self.save_initial_state()
 		#pick a patient zero for each disease
+		zeros = []
 		diseases_running = 0	#how many diseases actually have anyone infected?
 		diseases_not_running = []#which diseases of the ones requested aren't actually running due to immunity?
 		for d in self.diseases:
@@ -262,13 +498,14 @@ class Simulation:
 						choices.append(person)
 				if len(choices) <= 0:
 					print('WARNING: disease ' + d.name + ' had no non-immune in the population, choosing a random person to make non-immune.')
-					zero = np.random.choice(self.population)
-					zero.disease_state[d] = 'S'
+					zero = RNG.choice(self.population)
+					zero.set_disease_state(d,'S')
 					choices.append(zero)
 			else:
 				choices = self.population
-			zero = np.random.choice(choices)
+			zero = RNG.choice(choices)
 			d.infect(zero)
+			zeros.append(zero)
 			if zero.disease_state[d] in DISEASE_STATES_INFECTIOUS:
 				diseases_running += 1
 				if verbose:
@@ -277,36 +514,39 @@ class Simulation:
 				diseases_not_running.append(d)
 		for dnr in diseases_not_running:
 			self.diseases.remove(dnr)
+		if self.population_arrays is not None:
+			#the arrays were made before (by an earlier run, see reset), so they need to hear about patient zero
+			index = {p:i for i,p in enumerate(self.population)}
+			self.population_arrays.read_disease_states([index[zero] for zero in zeros])
 		dayct = 0
 		if verbose:
 			print()
 
-		while (not converged(self)) and ((time_limit <= 0) or (dayct < time_limit)):
-			self.simulate_day()
-			if self.R_0_calculation_finished:
-				return
+		try:
+			while (not converged(self)) and ((time_limit <= 0) or (dayct < time_limit)):
+				self.simulate_day()
+				if self.R_0_calculation_finished:
+					return
 
-			if verbose:
-				print('day ' + str(dayct) + ' summary: ')
-				print('total infections today:\t\t' + str(self.total_idle_infections_today + self.total_direct_infections_today))
-				print('direct:\t\t\t\t\t\t' + str(self.total_direct_infections_today))
-				print('idle:\t\t\t\t\t\t' + str(self.total_idle_infections_today))
-				n_infected = {disease : 0 for disease in self.diseases}	#map diseases to number infected
-				total_infected = 0
-				for person in self.population:
+				if verbose:
+					print('day ' + str(dayct) + ' summary: ')
+					print('total infections today:\t\t' + str(self.total_idle_infections_today + self.total_direct_infections_today))
+					print('direct:\t\t\t\t\t\t' + str(self.total_direct_infections_today))
+					print('idle:\t\t\t\t\t\t' + str(self.total_idle_infections_today))
+					counts = self.get_disease_state_counts()
+					n_infected = {disease : counts.count(disease,DISEASE_STATES_INFECTIOUS) for disease in self.diseases}	#map diseases to number infected
+					total_infected = sum(n_infected.values())
+
+					print('current infected for each disease:')
 					for disease in self.diseases:
-						if person.disease_state[disease] in DISEASE_STATES_INFECTIOUS:
-							n_infected[disease] += 1
-							total_infected += 1
-
-				print('current infected for each disease:')
-				for disease in self.diseases:
-					print(str(disease) + ': ' + str(n_infected[disease]))
-				print('current infections: ' + str(total_infected))	#will be off by however many diseases are actually going
-				if store_R_0s:
-					print('current R_0 estimates: ' + str(self.true_R_0))
-				print()
-			dayct += 1
-
+						print(str(disease) + ': ' + str(n_infected[disease]))
+					print('current infections: ' + str(total_infected))	#will be off by however many diseases are actually going
+					if store_R_0s:
+						print('current R_0 estimates: ' + str(self.true_R_0))
+					print()
+				dayct += 1
+		finally:
+			#however we got out of there (converged, done working out R_0 or an exception), everything dumped so far goes to disk
+			self.close_dumps()
 		if store_R_0s:
 			return self.true_R_0
\ No newline at end of file
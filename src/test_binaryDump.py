@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from SINUtil import *
+from BinaryDump import *
+
+class TestBinaryDump(TestCase):
+
+	def write_dump(self,fname,times):
+		person_ids = [4,5,6]
+		locations = [(10,0,0),(11,3,7),(12,12,1)]
+		with open(fname,'wb') as f:
+			f.write(header_bytes(person_ids,['virus 0','STD_0'],DISEASE_STATES_LIST,locations))
+			for t in times:
+				loc = [t % 3,(t + 1) % 3,2]
+				state = [[DISEASE_STATES_LIST.index('S'),DISEASE_STATES_LIST.index('II'),DISEASE_STATES_LIST.index('D')],
+						 [DISEASE_STATES_LIST.index('VU')]*3]
+				f.write(frame_bytes(t,loc,state))
+
+	def test_read(self):
+		import os
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'dump.bin')
+			self.write_dump(fname,[0,100,200])
+			with open(fname,'ab') as f:
+				f.write(b'\0\0\0')#a frame that's still being written
+
+			dump = BinaryDump(fname)
+			assert(len(dump) == 3)
+			assert(list(dump.times) == [0,100,200])
+			assert(isinstance(dump.frames,np.memmap))
+			assert(list(dump.frames['loc'][1]) == [1,2,2])
+			assert(dump.states[dump.frames['state'][2,0,1]] == 'II')
+			assert(dump.state_counts(0)[1,DISEASE_STATES_LIST.index('VU')] == 3)
+
+			with open(fname,'wb') as f:
+				f.write(b'not a dump')
+			with self.assertRaises(AttributeError):
+				BinaryDump(fname)
+
+	def test_psv(self):
+		import os
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'dump.bin')
+			self.write_dump(fname,[0,100])
+			dump = BinaryDump(fname)
+
+			dump.to_psv(os.path.join(d,'map.psv'))
+			with open(os.path.join(d,'map.psv')) as f:
+				rows = [line.rstrip('\n').split('|') for line in f]
+			assert(len(rows) == 3)
+			assert(rows[2][:7] == ['100','4','(3, 7)','virus 0','S','STD_0','VU'])
+
+			dump.to_psv(os.path.join(d,'infection.psv'),kind='infection')
+			with open(os.path.join(d,'infection.psv')) as f:
+				rows = [line.rstrip('\n').split('|') for line in f]
+			assert(rows[0][1] == 'virus 0 ' + DISEASE_STATES_LIST[0])
+			assert(rows[1][-1] == '3')
+			assert(sum(int(c) for c in rows[1][1:-1]) == 6)#3 people x 2 diseases
+
+			#and back again
+			psv_to_binary(os.path.join(d,'map.psv'),os.path.join(d,'again.bin'))
+			again = BinaryDump(os.path.join(d,'again.bin'))
+			again.to_psv(os.path.join(d,'again.psv'))
+			with open(os.path.join(d,'map.psv')) as f, open(os.path.join(d,'again.psv')) as g:
+				assert(f.read() == g.read())
+
+			with self.assertRaises(AttributeError):
+				dump.to_psv(os.path.join(d,'nope.psv'),kind='network')
+
+	def test_psv_delta(self):
+		import os
+		import tempfile
+		rows = ['TIME STEP|4|CURRENT LOCATION|virus 0|S|5|CURRENT LOCATION|virus 0|S',
+				'0|4|(0, 0)|virus 0|S|5|(3, 7)|virus 0|S',
+				'60|' + MAP_DELTA_MARKER + '|5|(12, 1)|virus 0|II',
+				'120|' + MAP_DELTA_MARKER,
+				'180|4|(3, 7)|virus 0|D|5|(0, 0)|virus 0|R']
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'map.psv')
+			with open(fname,'w') as f:
+				f.write('\n'.join(rows) + '\n')
+			psv_to_binary(fname,os.path.join(d,'dump.bin'))
+			dump = BinaryDump(os.path.join(d,'dump.bin'))
+			assert(dump.locations == [[-1,0,0],[-1,3,7],[-1,12,1]])
+			assert(list(dump.times) == [0,60,120,180])
+			#the map_delta rows get everyone who didn't change from the row before
+			assert(dump.frames['loc'].tolist() == [[0,1],[0,2],[0,2],[1,0]])
+			assert([dump.states[s] for s in dump.frames['state'][:,0,1]] == ['S','II','II','R'])
+
+			#changes with nothing before them to apply them to
+			with open(fname,'w') as f:
+				f.write('\n'.join(rows[:1] + rows[2:]) + '\n')
+			with self.assertRaises(AttributeError):
+				psv_to_binary(fname,os.path.join(d,'dump.bin'))
@@ -54,4 +54,25 @@ class TestDisease(TestCase):
 		p0.disease_state[self.t_disease] = 'II'
 		p1.disease_state[self.t_disease] = 'VS'
 
-		assert(self.t_disease.infects(p0,p1))
\ No newline at end of file
+		assert(self.t_disease.infects(p0,p1))
+
+	def test_disease_state_counts(self):
+		from PersonState import Person
+		people = [Person(self.tl_home,self.M) for _ in range(4)]
+		for p,state in zip(people,['S','S','VS','II']):
+			p.disease_state.update({self.t_disease:state})
+
+		counts = DiseaseStateCounts([self.t_disease],people)
+		assert(counts.count(self.t_disease,DISEASE_STATES_SUSCEPTIBLE) == 3)
+
+		self.t_disease.infect(people[0])
+		self.t_disease.infect(people[2])
+		self.t_disease.disease_state_transition(people[3])#II -> IS
+		self.t_disease.disease_state_transition(people[3])#IS -> D
+
+		#should always agree with going through everyone
+		expected = {state:len([p for p in people if p.disease_state[self.t_disease] == state]) for state in DISEASE_STATES_LIST}
+		assert(counts.as_dict()[self.t_disease] == expected)
+		assert(counts.count(self.t_disease,DISEASE_STATES_INFECTIOUS) == 2)
+		assert(counts.count(self.t_disease,DISEASE_STATES_DEAD) == 1)
+		self.tl_home.people.clear()
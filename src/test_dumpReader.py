@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from SINUtil import *
+from DumpReader import *
+
+class TestDumpReader(TestCase):
+
+	def write_dump(self,fname,newline_at_end=True):
+		rows = ['TIME STEP|4|CURRENT LOCATION|virus 0|S|STD_0|VU|5|CURRENT LOCATION|virus 0|S|STD_0|VU',
+				'0|4|(0, 0)|virus 0|S|STD_0|VU|5|(3, 7)|virus 0|S|STD_0|VU',
+				'60|' + MAP_DELTA_MARKER + '|5|(12, 1)|virus 0|II|STD_0|VU',
+				'120|' + MAP_DELTA_MARKER,
+				'180|' + MAP_DELTA_MARKER + '|4|(3, 7)|virus 0|D|STD_0|VU',
+				'240|4|(3, 7)|virus 0|D|STD_0|VU|5|(0, 0)|virus 0|R|STD_0|VU']
+		with open(fname,'w') as f:
+			f.write('\n'.join(rows) + ('\n' if newline_at_end else ''))
+
+	def test_rows(self):
+		import os
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'map.psv')
+			self.write_dump(fname,newline_at_end=False)
+
+			dr = DumpReader(fname)
+			assert(len(dr) == 6)
+			assert(dr.diseases == ['virus 0','STD_0'])
+			assert(dr.person_ids == [4,5])
+			assert(list(dr.times[1:]) == [0,60,120,180,240])
+			assert(dr.keyframes == [0,1,5])
+			assert(dr[2] == ['60',MAP_DELTA_MARKER,'5','(12, 1)','virus 0','II','STD_0','VU'])
+			assert(dr[-1][0] == '240')#no newline at the end is fine
+			assert(dr.parse_row(2) == [(5,(12,1),{'virus 0':'II','STD_0':'VU'})])
+			assert(dr.parse_row(3) == [])
+			assert(dr.row_at(180) == 4)
+			with self.assertRaises(AttributeError):
+				dr.row_at(61)
+			with self.assertRaises(IndexError):
+				dr[6]
+
+			#the index gets saved, and used again as long as the dump hasn't changed
+			assert(os.path.exists(fname + INDEX_SUFFIX))
+			again = DumpReader(fname)
+			assert(again.load_index())
+			assert((again.offsets == dr.offsets).all())
+			self.write_dump(fname)
+			os.utime(fname,ns=(0,0))
+			assert(not again.load_index())
+			assert(len(DumpReader(fname)) == 6)
+
+	def test_frames(self):
+		import os
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'map.psv')
+			self.write_dump(fname)
+			dr = DumpReader(fname,use_index_file=False)
+			assert(not os.path.exists(fname + INDEX_SUFFIX))
+
+			#changes get applied to the last full row
+			assert(dr.frame(0) == [(4,(0,0),{'virus 0':'S','STD_0':'VU'}),(5,(3,7),{'virus 0':'S','STD_0':'VU'})])
+			assert(dr.frame(120) == [(4,(0,0),{'virus 0':'S','STD_0':'VU'}),(5,(12,1),{'virus 0':'II','STD_0':'VU'})])
+			assert(dr.frame(180) == [(4,(3,7),{'virus 0':'D','STD_0':'VU'}),(5,(12,1),{'virus 0':'II','STD_0':'VU'})])
+			with self.assertRaises(AttributeError):
+				dr.frame(100)
+
+			#range gives the same frames as frame, half open like range
+			frames = list(dr.range(60,240))
+			assert([t for t,_ in frames] == [60,120,180])
+			assert(all(people == dr.frame(t) for t,people in frames))
+			assert(len(list(dr.range(0,1000))) == 5)
+			assert(list(dr.range(250,1000)) == [])
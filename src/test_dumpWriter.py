@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from DumpWriter import DumpWriter
+
+class TestDumpWriter(TestCase):
+
+	def read(self,fname):
+		with open(fname) as f:
+			return f.read()
+
+	def test_write(self):
+		import os
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fa = os.path.join(d,'a.psv')
+			fb = os.path.join(d,'b.psv')
+			with open(fa,'w') as f:
+				f.write('left over from before\n')
+
+			dw = DumpWriter(queue_size=1)#everything has to squeeze through one slot at a time
+			dw.write(fa,['header','\n'])#first write truncates
+			for i in range(100):
+				dw.write(fa,[str(i),'|',str(i*i),'\n'])
+				dw.write(fb,str(i) + '\n')
+			dw.flush()
+			assert(self.read(fa) == 'header\n' + ''.join(str(i) + '|' + str(i*i) + '\n' for i in range(100)))
+			assert(self.read(fb) == ''.join(str(i) + '\n' for i in range(100)))
+
+			#after closing, writing again appends
+			dw.close()
+			dw.write(fb,'more\n')
+			dw.close()
+			assert(self.read(fb).endswith('99\nmore\n'))
+
+			#unthreaded does the same thing
+			dw = DumpWriter(threaded=False)
+			dw.write(fa,'x\n')
+			dw.write(fa,'y\n',mode='w')#mode only matters when opening
+			dw.close()
+			assert(self.read(fa) == 'x\ny\n')
+
+			#problems on the writing thread come back to whoever is writing, and nothing else gets written until close
+			dw = DumpWriter()
+			dw.write(os.path.join(d,'no such directory','c.psv'),'z\n')
+			with self.assertRaises(FileNotFoundError):
+				dw.flush()
+			with self.assertRaises(FileNotFoundError):
+				dw.write(fa,'after\n')
+			with self.assertRaises(FileNotFoundError):
+				dw.close()
+			assert(self.read(fa) == 'x\ny\n')
+			dw.write(fa,'after\n')
+			dw.close()
+			assert(self.read(fa) == 'after\n')
+
+			dw = DumpWriter(threaded=False)
+			with self.assertRaises(FileNotFoundError):
+				dw.write(os.path.join(d,'no such directory','c.psv'),'z\n')
+			with self.assertRaises(FileNotFoundError):
+				dw.write(fa,'after\n')
+			with self.assertRaises(FileNotFoundError):
+				dw.close()
+
+	def test_exit(self):
+		import os
+		import sys
+		import subprocess
+		import tempfile
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'a.psv')
+			#nobody calls close (or flush), the rows still have to be there once the interpreter is gone
+			script = 'from DumpWriter import DumpWriter\n' + \
+					 'dw = DumpWriter(queue_size=4)\n' + \
+					 'for i in range(1000):\n' + \
+					 '	dw.write(' + repr(fname) + ',[str(i),"\\n"])\n'
+			subprocess.run([sys.executable,'-c',script],check=True,cwd=os.path.dirname(os.path.abspath(__file__)))
+			assert(self.read(fname) == ''.join(str(i) + '\n' for i in range(1000)))
@@ -14,4 +14,107 @@ class TestMap(TestCase):
 
 		home_office = m.get_path(tl_home,L_office,verbose=v)
 		home_shop = m.get_path(tl_home,br_shop,verbose=v)
-		shop_office = m.get_path(br_shop,L_office,verbose=v)
\ No newline at end of file
+		shop_office = m.get_path(br_shop,L_office,verbose=v)
+
+	def test_route_cache(self):
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,TIME_STEP_PER_PIXEL=2)
+		m = mr.create_map_from_file('../test_map_small.png')
+		m.ROUTE_CACHE_SIZE = 2
+		tl_home = m.loc_list[42]
+		br_shop = m.loc_list[175]
+		L_office = m.loc_list[119]
+
+		home_office = m.get_path(tl_home,L_office)
+		assert((m.route_cache_hits,m.route_cache_misses) == (0,1))
+		again = m.get_path(tl_home,L_office)
+		assert((m.route_cache_hits,m.route_cache_misses) == (1,1))
+		assert(again == home_office == m.calc_path(tl_home,L_office))
+		again.pop()#travelers use up their paths, which shouldn't touch the cached one
+		assert(m.get_path(tl_home,L_office) == home_office)
+
+		#least recently used gets evicted
+		m.get_path(tl_home,br_shop)
+		m.get_path(br_shop,L_office)
+		assert(len(m.route_cache) == 2)
+		assert((tl_home.id,L_office.id) not in m.route_cache)
+
+		m.clear_route_cache()
+		assert((len(m.route_cache),m.route_cache_hits,m.route_cache_misses) == (0,0,0))
+
+	def test_nearest_hospital_table(self):
+		from PersonState import Person
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,TIME_STEP_PER_PIXEL=2)
+		m = mr.create_map_from_file('../test_map_small.png')
+		tl_home = m.loc_list[42]
+		L_office = m.loc_list[119]
+
+		table = m.get_nearest_hospital_table()
+		for loc in m.loc_list:
+			assert(table[loc.id] == m.calc_nearest_hospital(loc))
+		p = Person(tl_home,m)
+		assert(m.get_nearest_hospital(p) == table[tl_home.id])
+		assert(m.get_nearest_hospital_table() is table)#nothing changed, so nothing gets redone
+
+		#turning a location into a hospital should be noticed
+		L_office.loc_type = 'hospital'
+		table = m.get_nearest_hospital_table()
+		assert(table[L_office.id] == L_office)
+		tl_home.people.clear()
+
+		#but not what happens on some other map
+		other = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,TIME_STEP_PER_PIXEL=2).create_map_from_file('../test_map_small.png')
+		other.loc_list[119].loc_type = 'hospital'
+		assert(m.get_nearest_hospital_table() is table)
+
+	def test_add_random_placable_locations(self):
+		from PersonState import Person
+		RNG.seed(0)
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,TIME_STEP_PER_PIXEL=2)
+		m = mr.create_map_from_file('../test_map_small.png')
+		order = list(m.loc_list)
+		home = [loc for loc in m.loc_list if loc.loc_type == 'home'][0]
+		placable,avg_age,age_stdev = m.get_placable_table()
+		assert(len(placable) > 3)
+		assert(all(loc.loc_type in PLACABLE_LOCATION_TYPES for loc in placable))
+
+		p = Person(home,m)
+		p.age = 30
+		m.add_random_placable_locations(p,3,lambda: 30,lambda: 5.)
+		assert(len(p.places) == 3)
+		assert(p.places <= set(placable))
+		assert(all(p in loc.clientele for loc in p.places))
+		assert(m.loc_list == order)#the map's locations don't get shuffled
+
+		#nobody's anywhere near the right age for any of them, so they get the closest ones
+		for loc,age in zip(placable,range(len(placable))):
+			loc.avg_age = 1000. + age
+		m.placable_key = None
+		q = Person(home,m)
+		q.age = 0
+		m.add_random_placable_locations(q,2,lambda: 30,lambda: 5.)
+		assert(q.places == set(placable[:2]))
+
+		#asking for more than there are just gives them everything
+		m.add_random_placable_locations(q,len(placable) + 5,lambda: 30,lambda: 5.)
+		assert(q.places == set(placable))
+
+	def test_get_random_houses(self):
+		from PersonState import Person
+		RNG.seed(0)
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,TIME_STEP_PER_PIXEL=2)
+		m = mr.create_map_from_file('../test_map_small.png')
+		houses = [loc for loc in m.loc_list if loc.loc_type == 'home']
+		room = sum(loc.capacity for loc in houses)
+		Person(houses[0],m)#already somebody living here
+
+		#fill every house right up
+		homes = m.get_random_houses(room - 1)
+		assert(all(loc.loc_type == 'home' for loc in homes))
+		for loc in houses:
+			assert(homes.count(loc) == loc.capacity - len(loc.people))
+		assert(len(set(homes)) > 1)
+		with self.assertRaises(AttributeError):
+			m.get_random_houses(room)
+
+		assert(len(m.get_random_workable_locations(50)) == 50)
+		assert(all(loc.loc_type in WORKABLE_LOCATION_TYPES for loc in m.get_random_workable_locations(50)))
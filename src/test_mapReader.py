@@ -4,6 +4,21 @@ from Map import *
 
 
 class TestMapReader(TestCase):
+	def test_reformat_imgarray(self):
+		mr = MapReader()
+		iar = np.array([[(0x7f,0,0,255),(0xff,0xff,0xff,255),(0,0,0,0)],
+						[(0xdc,0x23,0x23,255),(0xf0,0xf0,0xf0,255),(0,0,0xff,255)]],dtype=np.uint8)
+		ref = mr.reformat_imgarray(iar)
+		assert(ref.dtype == np.int32)
+		assert(ref.tolist() == [[LOC_TYPE_INDEX['home'],LOC_TYPE_INDEX['VOID'],LOC_TYPE_INDEX['public']],
+								[LOC_TYPE_INDEX['hospital'],LOC_TYPE_INDEX['PROC_FINISHED'],LOC_TYPE_INDEX['shop']]])
+		assert(mr.reformat_imgarray(iar[:,:,:3]).tolist() == ref.tolist())#alpha doesn't matter
+
+		iar[1,2] = (1,2,3,255)
+		with self.assertRaises(AttributeError) as e:
+			mr.reformat_imgarray(iar)
+		assert('(2, 1) 010203' in str(e.exception))
+
 	def test_assign_number_to_contiguous_block(self):
 		img = [[0, 0, 0, 2, 0],
 			   [1, 1, 0, 2, 0],
@@ -59,7 +74,7 @@ class TestMapReader(TestCase):
 
 		mr.assign_all_blocks(do_adjacencies=False)
 
-		assert (mr.img == [[8, 8, 8, 9, 10],
+		assert (mr.img.tolist() == [[8, 8, 8, 9, 10],
 						   [11, 11, 8, 9, 10],
 						   [11, 11, 6, 9, 10],
 						   [9, 9, 9, 9, 10],
@@ -84,7 +99,7 @@ class TestMapReader(TestCase):
 
 		mr.assign_all_blocks(do_adjacencies=False)
 
-		assert (mr.img == [[8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 9],
+		assert (mr.img.tolist() == [[8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 9],
 						   [8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 9],
 						   [8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 9],
 						   [8, 8, 8, 8, 8, 8, 8, 8, 8, 8, 9],
@@ -102,6 +117,29 @@ class TestMapReader(TestCase):
 		assert (mr.loc_list[3].mapx_center == 10)
 		assert (mr.loc_list[3].mapy_center == 10)
 
+	def test_assign_all_blocks_matches_flood_fill(self):
+		#the array version should find exactly what flood filling from each next unassigned pixel does
+		RNG.seed(0)
+		img = [[int(RNG.choice([0,1,4,4,4,6])) for _ in range(23)] for _ in range(17)]
+
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(3,4))
+		mr.img = [row[:] for row in img]
+		mr.assign_all_blocks(do_adjacencies=False)
+
+		ff = MapReader(PUBLIC_BLOCK_SIZE=(3,4))
+		ff.img = [row[:] for row in img]
+		x,y = ff.scan_to_next(0,0)
+		while (x != -1) and (y != -1):
+			if ff.img[y][x] == LOC_TYPE_INDEX['public']:
+				ff.assign_number_to_contiguous_block(x,y,x + 3,y + 4,x,y)
+			else:
+				ff.assign_number_to_contiguous_block(x,y)
+			x,y = ff.scan_to_next(x,y)
+
+		assert(mr.img.tolist() == ff.img)
+		assert([(l.loc_type,l.capacity,l.mapx,l.mapy,l.mapx_center,l.mapy_center,l.travel_time) for l in mr.loc_list] ==
+			   [(l.loc_type,l.capacity,l.mapx,l.mapy,l.mapx_center,l.mapy_center,l.travel_time) for l in ff.loc_list])
+
 	def test_assign_loc_adjacencies(self):
 		img = [[8, 8, 8, 9, 10],
 			   [11, 11, 8, 9, 10],
@@ -130,6 +168,73 @@ class TestMapReader(TestCase):
 		assert(mr.loc_list[3] in mr.loc_list[1].adj_locs)
 		assert(mr.loc_list[4] in mr.loc_list[1].adj_locs)
 
+	def test_assign_adjacencies_from_labels(self):
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),RECORD_LOCATION_PIXELS=True)
+		m = mr.create_map_from_file('../test_map_small.png')
+		adj = {loc:set(loc.adj_locs) for loc in m.loc_list}
+
+		#should be the same as searching out from every location pixel by pixel
+		ff = MapReader(RECORD_LOCATION_PIXELS=True)
+		ff.loc_list = m.loc_list
+		ff.img = mr.img.tolist()
+		for loc in m.loc_list:
+			loc.adj_locs.clear()
+		x,y = ff.scan_to_next(0,0,assigned=True)
+		while (x != -1) and (y != -1):
+			ff.assign_loc_adjacencies(x,y)
+			x,y = ff.scan_to_next(x,y,assigned=True)
+		assert(adj == {loc:loc.adj_locs for loc in m.loc_list})
+		assert(all(ff.loc_px[loc] == m.loc_px[loc] for loc in m.loc_list))
+
+		#and the csr version says the same thing
+		indptr,indices = m.get_adjacency_csr()
+		for i,loc in enumerate(m.loc_list):
+			assert({m.loc_list[j] for j in indices[indptr[i]:indptr[i+1]]} == adj[loc])
+		m.calc_adjacency_csr()
+		assert((m.adj_indptr == indptr).all() and (m.adj_indices == indices).all())
+
+	def test_map_cache(self):
+		import os
+		import shutil
+		import tempfile
+		from PersonState import Location
+		def describe(mr,m):
+			index = {loc:i for i,loc in enumerate(m.loc_list)}
+			return ([(l.loc_type,l.capacity,l.mapx,l.mapy,l.mapx_center,l.mapy_center,l.travel_time,sorted(index[a] for a in l.adj_locs)) for l in m.loc_list],
+					[m.loc_px[l] for l in m.loc_list],m.adj_indptr.tolist(),m.adj_indices.tolist())
+
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'map.png')
+			shutil.copy('../test_map_small.png',fname)
+
+			mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,RECORD_LOCATION_PIXELS=True)
+			first_id = Location.LOCATION_ID_COUNTER
+			parsed = describe(mr,mr.create_map_from_file(fname))
+			cache_files = [f for f in os.listdir(d) if f.endswith('.mapcache.npz')]
+			assert(len(cache_files) == 1)
+
+			#reading it again comes from the cache, and gets the same thing (ids included)
+			Location.LOCATION_ID_COUNTER = first_id
+			mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,RECORD_LOCATION_PIXELS=True)
+			assert(mr.load_map_cache(os.path.join(d,cache_files[0]),mr.map_cache_key(fname)))
+			Location.LOCATION_ID_COUNTER = first_id
+			mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=2,RECORD_LOCATION_PIXELS=True)
+			m = mr.create_map_from_file(fname)
+			assert(describe(mr,m) == parsed)
+			assert(m.loc_list[0].id == first_id)
+			assert(mr.img.shape == (40,40))
+
+			#different settings get their own cache
+			mr = MapReader(PUBLIC_BLOCK_SIZE=(2,2),CAPACITY_PER_PIXEL=3,RECORD_LOCATION_PIXELS=True)
+			assert(not mr.load_map_cache(os.path.join(d,cache_files[0]),mr.map_cache_key(fname)))
+			m = mr.create_map_from_file(fname)
+			assert(m.loc_list[0].capacity == 3 * parsed[0][0][1] // 2)
+			assert(len([f for f in os.listdir(d) if f.endswith('.mapcache.npz')]) == 2)
+
+			mr = MapReader(USE_MAP_CACHE=False)
+			mr.create_map_from_file(fname)
+			assert(len([f for f in os.listdir(d) if f.endswith('.mapcache.npz')]) == 2)
+
 	def test_create_map_from_file(self):
 		fname = '../test_map_0.png'
 		#this has 1 hospital
@@ -12,7 +12,7 @@ class TestMapWriter(TestCase):
 		Location.LOCATION_ID_COUNTER = 0
 		mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2, RECORD_LOCATION_PIXELS=True)  # NEED to set record location pixels
 
-		np.random.seed(0)
+		RNG.seed(0)
 		from PersonState import Person
 		Person.PERSON_ID_COUNTER = 0
 		mw = MapWriter()
@@ -35,7 +35,7 @@ class TestMapWriter(TestCase):
 		tl_tl_home = mw.M.loc_list[0]  # top left home
 
 		# put a bunch of randos in the tl home
-		np.random.seed(0)
+		RNG.seed(0)
 		from PersonState import Person
 		Person.PERSON_ID_COUNTER = 0
 		people = [
@@ -51,17 +51,32 @@ class TestMapWriter(TestCase):
 		ret = mw.place_people(tl_tl_home)
 
 		# regress on this result
-		assert (ret[people[0]] == (17, 16))
-		assert (ret[people[1]] == (14, 8))
-		assert (ret[people[2]] == (0, 15))
-		assert (ret[people[3]] == (10, 2))
-		assert (ret[people[4]] == (18, 7))
+		assert (ret[people[0]] == (0, 0))
+		assert (ret[people[1]] == (2, 12))
+		assert (ret[people[2]] == (4, 4))
+		assert (ret[people[3]] == (6, 16))
+		assert (ret[people[4]] == (8, 8))
+
+		# nobody within PEOPLE_MIN_SEPARATION of anybody else, and all in the home
+		for a in people:
+			assert (ret[a] in mw.M.loc_px[tl_tl_home])
+			for b in people:
+				if a is not b:
+					assert (max(abs(ret[a][0] - ret[b][0]), abs(ret[a][1] - ret[b][1])) > mw.PEOPLE_MIN_SEPARATION)
+
+		# the same people get the same places every time, whoever else turns up
+		tl_tl_home.people.remove(people[2])
+		again = mw.place_people(tl_tl_home)
+		assert (all(again[p] == ret[p] for p in again))
 
 		# now cram 'em in *just* tight enough to cause it to warn us
 
 		Person.PERSON_ID_COUNTER = 0
 		mw = MapWriter()
 		mw.initialize_all('../test_map_small.png', 'mapwriter_data_test.psv', mr)
+		tl_tl_home.people.clear()
+		tl_tl_home = mw.M.loc_px.location_at(0, 0)  # the reader is shared, so this map has its own copy of the home
+		tl_tl_home.people.clear()
 
 		Person.PERSON_ID_COUNTER = 0
 		people = [
@@ -77,10 +92,15 @@ class TestMapWriter(TestCase):
 			Person(tl_tl_home, mw.M)
 		]
 
+		mw.PEOPLE_MIN_SEPARATION = 9  # 4 slots in the 20x20 home
 		assert (funcall_throws_error(mw.place_people, tl_tl_home, error_on_overlay=True))
+		ret = mw.place_people(tl_tl_home)  # just a warning
+		assert (len(ret) == len(people))
+		assert (len(set(ret.values())) == 4)
+		tl_tl_home.people.clear()
 
 	def test_load_sim_config(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		v = False
 		# use the map reader since making one of these by hand is going to be a pain
 		from PersonState import Location, Person
@@ -95,21 +115,64 @@ class TestMapWriter(TestCase):
 
 		pass
 
+	def test_load_sim_config_delta(self):
+		import os
+		import tempfile
+		from PersonState import Location, Person, PopulationBuilder
+		from Disease import Disease
+		from Simulation import Simulation
+		RNG.seed(0)
+		Location.LOCATION_ID_COUNTER = 0
+		Person.PERSON_ID_COUNTER = 0
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2, RECORD_LOCATION_PIXELS=True)
+		with tempfile.TemporaryDirectory() as d:
+			full_fname = os.path.join(d,'map.psv')
+			delta_fname = os.path.join(d,'map_delta.psv')
+
+			#dump the same day both ways
+			s = Simulation(infodump_file=[full_fname,delta_fname],infodump_type=['map','map_delta'],time_steps_per_infodump=60)
+			s.MAP_DELTA_KEYFRAME_INTERVAL = 4
+			s.map = mr.create_map_from_file('../test_map_small.png')
+			dis = Disease('virus 0')
+			s.set_diseases([dis])
+			pb = PopulationBuilder(s.map,30)
+			pb.set_diseases_present([dis])
+			s.population = pb.create_population()
+			s.population[0].disease_state.update({dis:'II'})
+			s.simulate_day()
+			s.close_dumps()
+			for loc in s.map.loc_list:
+				loc.people.clear()
+
+			full = MapWriter()
+			full.initialize_all('../test_map_small.png',full_fname,mr)
+			delta = MapWriter()
+			delta.initialize_all('../test_map_small.png',delta_fname,mr)
+			assert(len(full.data) == len(delta.data) == 25)
+			assert(delta.keyframes == [1,5,9,13,17,21])
+			assert(os.path.getsize(delta_fname) < os.path.getsize(full_fname))
+
+			def config(mw):
+				return [(p.currentLocation.mapx,p.currentLocation.mapy,p.disease_state[mw.diseases['virus 0']],p.is_dead) for p in mw.population]
+
+			#in order (incremental), then jumping around (from the keyframes)
+			for dat_idx in list(range(1,len(full.data))) + [23,2,19,7,7,24]:
+				full.load_sim_config(dat_idx)
+				delta.load_sim_config(dat_idx)
+				assert(delta.loaded_dat_idx == dat_idx)
+				assert(config(full) == config(delta))
+
 	def test_expand_img(self):
 		mw = MapWriter()
 		#initialize the map
 		loc_list = []
-		loc_px = {}
 		from PersonState import Location
 		for i in range(3):
 			for j in range(3):
-				l = Location('home',1)
-				px = (i,j)
-				loc_list.append(l)
-				loc_px.update({l:{px}})
+				loc_list.append(Location('home',1))
 
 		mw.M = Map(loc_list)
-		mw.M.loc_px = loc_px
+		mw.M.loc_px = LocationPixels(np.arange(9).reshape(3,3),loc_list)#loc_list[3*y + x] is at (x,y)
 
 		#reset the source image to something more predictable
 		src_img_test = [[(i,i+1,i+2,i+3) for i in range(0,12,4)] for _ in range(3)]
@@ -126,7 +189,163 @@ class TestMapWriter(TestCase):
 						  [(0,1,2,3),(0,1,2,3),(0,1,2,3),(4,5,6,7),(4,5,6,7),(4,5,6,7),(8,9,10,11),(8,9,10,11),(8,9,10,11)],
 						  ]
 		mw.expand_img()
-		assert(mw.img_src == post_expansion)
+		assert(mw.img_src.tolist() == [[list(px) for px in row] for row in post_expansion])
 		assert(mw.M.loc_px[mw.M.loc_list[0]] == {(0,0),(0,1),(0,2),
 												 (1,0),(1,1),(1,2),
-												 (2,0),(2,1),(2,2)})
\ No newline at end of file
+												 (2,0),(2,1),(2,2)})
+		assert(mw.M.loc_px[mw.M.loc_list[5]] == {(x,y) for x in range(6,9) for y in range(3,6)})
+		assert(mw.M.loc_px.npixels(mw.M.loc_list[5]) == 9)
+
+		#pixels from the original image find the right location
+		assert(mw.get_location_by_src_pixel((2,1)) == mw.M.loc_list[5])
+		assert(mw.M.loc_px.location_at(8,3) == mw.M.loc_list[5])
+		assert(mw.M.loc_px.location_at(9,3) is None)
+
+	def test_create_single_frame(self):
+		RNG.seed(0)
+		from PersonState import Location, Person
+		Location.LOCATION_ID_COUNTER = 0
+		Person.PERSON_ID_COUNTER = 0
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2, RECORD_LOCATION_PIXELS=True)
+		mw = MapWriter()
+		mw.desaturate_map = True
+		mw.initialize_all('../test_map_small.png', 'mapwriter_data_test.psv', mr)
+		assert(mw.img_src.dtype == np.uint8)
+		assert((mw.img_src[:,:,0] == mw.img_src[:,:,1]).all() and (mw.img_src[:,:,3] == 255).all())
+
+		mw.create_single_frame(1)
+		frame = mw.anim[0]
+		assert((frame.dtype,frame.shape) == (np.uint8,mw.img_src.shape))
+
+		#everyone alive is drawn once, in their own color, and nothing else changed
+		alive = [p for p in mw.population if not p.is_dead]
+		changed = np.argwhere((frame != mw.img_src).any(axis=2))
+		assert(0 < len(changed) <= len(alive))
+		colors = {tuple(c) for c in mw.person_colors(alive).tolist()}
+		assert(all(tuple(frame[y,x].tolist()) in colors for y,x in changed))
+
+		#the state with the most precedence wins
+		from Disease import Disease
+		p = mw.population[0]
+		p.disease_state = {Disease('a'):'S',Disease('b'):'IS',Disease('c'):'R'}
+		q = mw.population[1]
+		q.disease_state = {Disease('a'):'S'}
+		assert(mw.person_colors([p,q]).tolist() == [list(mw.color_map['R']),list(mw.color_map['S'])])
+		for loc in mw.M.loc_list:
+			loc.people.clear()
+
+	def test_animate(self):
+		import os
+		import tempfile
+		RNG.seed(0)
+		from PersonState import Location, Person
+		Location.LOCATION_ID_COUNTER = 0
+		Person.PERSON_ID_COUNTER = 0
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2, RECORD_LOCATION_PIXELS=True)
+		mw = MapWriter()
+		mw.img_expansion_factor = 2
+		mw.initialize_all('../test_map_small.png', 'mapwriter_data_test.psv', mr)
+
+		assert(mw.animation_rows() == [1,2,3,4])
+		assert(mw.animation_rows(start_time=300,end_time=600) == [2,3])
+		assert(mw.animation_rows(every=3) == [1,4])
+		with self.assertRaises(AttributeError):
+			mw.animation_rows(every=0)
+
+		#watch what gets handed to the gif writer
+		class RecordingWriter:
+			def __init__(self):
+				self.frames = []
+				self.closed = False
+			def __enter__(self):
+				return self
+			def __exit__(self,*args):
+				self.closed = True
+			def append_data(self,frame):
+				self.frames.append(frame.copy())
+		class RecordingImageio:
+			def get_writer(self,fname,**kwargs):
+				self.fname = fname
+				self.kwargs = kwargs
+				self.writer = RecordingWriter()
+				return self.writer
+
+		mw.imageio = RecordingImageio()
+		mw.ANIMATION_LOOKAHEAD = 1
+		mw.animate('anim.gif',start_time=300)
+		assert((mw.imageio.fname,mw.imageio.kwargs['format']) == ('anim.gif','GIF-PIL'))
+		assert(mw.imageio.writer.closed)
+		assert(len(mw.imageio.writer.frames) == 3)
+		assert(mw.imageio.writer.frames[0].shape == mw.img_src.shape)
+		assert(len(mw.anim) == 0)#nothing kept around
+		del mw.imageio
+
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d,'anim.gif')
+			mw.animate(fname,every=2)
+			with open(fname,'rb') as f:
+				assert(f.read(6) == b'GIF89a')
+
+			#problems writing come back to us
+			with self.assertRaises(Exception):
+				mw.animate(os.path.join(d,'no such directory','anim.gif'))
+		for loc in mw.M.loc_list:
+			loc.people.clear()
+
+	def test_render_frames_parallel(self):
+		RNG.seed(0)
+		from PersonState import Location, Person
+		import FrameRenderer
+		Location.LOCATION_ID_COUNTER = 0
+		Person.PERSON_ID_COUNTER = 0
+		mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2, RECORD_LOCATION_PIXELS=True)
+		mw = MapWriter()
+		mw.img_expansion_factor = 2
+		mw.initialize_all('../test_map_small.png', 'mapwriter_data_test.psv', mr)
+		loc_index = mw.M.loc_px.loc_index
+		states,colors = mw.state_color_table()
+
+		#the arrays say the same thing as the population objects
+		rows = mw.animation_rows()
+		for dat_idx,(loc,person_index,color_code) in zip(rows,mw.frame_arrays(rows)):
+			mw.load_sim_config(dat_idx)
+			alive = [p for p in mw.population if not p.is_dead]
+			expected = sorted(zip([loc_index[p.currentLocation] for p in alive],[mw.population_index[p] for p in alive],[tuple(c) for c in mw.person_colors(alive).tolist()]))
+			assert(sorted(zip(loc.tolist(),person_index.tolist(),[tuple(c) for c in colors[color_code].tolist()])) == expected)
+
+		#everyone gets drawn in their location, in their color, exactly where render_frame would draw them
+		slot_order,slot_starts = mw.get_slot_layout()
+		frame = FrameRenderer.draw_frame(loc,person_index,color_code,mw.img_src,slot_order,slot_starts,colors)
+		changed = np.argwhere((frame != mw.img_src).any(axis=2))
+		assert(0 < len(changed) <= len(loc))
+		for y,x in changed:
+			assert(mw.M.loc_px.labels[y,x] in loc)
+		assert((frame == mw.render_frame(rows[-1])).all())
+
+		#same frames however many processes there are, and in order
+		class RecordingWriter:
+			def __init__(self):
+				self.frames = []
+			def __enter__(self):
+				return self
+			def __exit__(self,*args):
+				pass
+			def append_data(self,frame):
+				self.frames.append(frame.copy())
+		class RecordingImageio:
+			def get_writer(self,fname,**kwargs):
+				self.writer = RecordingWriter()
+				return self.writer
+		mw.imageio = RecordingImageio()
+		mw.FRAME_CHUNK_SIZE = 1
+		RNG.seed(0)
+		mw.animate('anim.gif',processes=2)
+		two = mw.imageio.writer.frames
+		RNG.seed(0)
+		mw.animate('anim.gif',processes=3)
+		three = mw.imageio.writer.frames
+		assert(len(two) == len(three) == 4)
+		assert(all((a == b).all() for a,b in zip(two,three)))
+		assert(not (two[0] == two[3]).all())
+		for loc in mw.M.loc_list:
+			loc.people.clear()
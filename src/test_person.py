@@ -106,7 +106,7 @@ class TestPerson(TestCase):
 		test_wp = m.loc_list[175]  # this is the shop in the bottom right corner
 		test_wp1 = m.loc_list[119]  # this is the L-shaped office
 
-		np.random.seed(0)
+		RNG.seed(0)
 
 		p0 = Person(test_home, m)
 		p1 = Person(test_home, m)
@@ -0,0 +1,196 @@
+from unittest import TestCase
+
+from SINUtil import *
+from PersonState import Person, PopulationBuilder
+from PopulationArrays import *
+
+class TestPopulationArrays(TestCase):
+	from Map import MapReader
+	v = False
+	# use the map reader since making one of these by hand is going to be a pain
+	mr = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2)
+	M = mr.create_map_from_file('../test_map_small.png')
+	tl_home = M.loc_list[42]  # this is the home which is down-right of the top-left home (9th cell if counting left-right, top-bottom)
+
+	from Disease import Disease
+	t_disease = Disease('test disease pls ignore')
+	t_disease.infectivity = {'idle': 1,
+							 'sleep': 1,
+							 'traveling': 1,
+							 'talking': 1,
+							 'intimate': 1}
+	t_disease.symptom_show_rate = 1
+	t_disease.recovery_rate = 0
+	t_disease.die_probability = 1
+
+	def build_population(self,n):
+		pb = PopulationBuilder(self.M,n)
+		pb.set_diseases_present([self.t_disease])
+		return pb.create_population()
+
+	def test_affinity(self):
+		RNG.seed(0)
+		plist = self.build_population(100)
+		pa = PopulationArrays(plist,[self.t_disease],self.M)
+
+		a = []
+		b = []
+		for i,p in enumerate(plist):
+			for j,q in enumerate(plist):
+				if (i != j) and (p.currentLocation == q.currentLocation):
+					a.append(i)
+					b.append(j)
+		a = np.array(a)
+		b = np.array(b)
+
+		#should agree exactly with the object version
+		expected = [plist[i].affinity(plist[j]) for i,j in zip(a,b)]
+		np.testing.assert_almost_equal(pa.affinity(a,b),expected)
+
+	def test_day_begin(self):
+		p0 = Person(self.tl_home,self.M)
+		p1 = Person(self.tl_home,self.M)
+		p0.disease_state.update({self.t_disease:'II'})
+		p1.disease_state.update({self.t_disease:'VII'})
+
+		pa = PopulationArrays([p0,p1],[self.t_disease],self.M)
+		pa.day_begin()
+		assert(list(pa.state[0]) == [STATE_CODES['IS'],STATE_CODES['VIS']])
+		pa.day_begin()
+		assert(list(pa.state[0]) == [STATE_CODES['D'],STATE_CODES['VD']])
+		assert(not pa.alive.any())
+
+		pa.write_back()
+		assert(p0.disease_state[self.t_disease] == 'D')
+		assert(p1.disease_state[self.t_disease] == 'VD')
+		assert(p0.is_dead and p1.is_dead)
+		for loc in self.M.loc_list:
+			loc.people.clear()#don't leave these two lying around for other tests
+
+	def test_infection(self):
+		p0 = Person(self.tl_home,self.M)
+		p1 = Person(self.tl_home,self.M)
+		p0.disease_state.update({self.t_disease:'II'})
+		p1.disease_state.update({self.t_disease:'VS'})
+
+		pa = PopulationArrays([p0,p1],[self.t_disease],self.M)
+		pa.activity[:] = ACT_TALKING
+		pa.target[:] = [1,0]
+		assert(pa.do_current_actions() == 1)
+		assert(pa.state[0,1] == STATE_CODES['VII'])
+		assert(pa.infected_by[0,1] == 0)
+		for loc in self.M.loc_list:
+			loc.people.clear()
+
+	def test_array_engine(self):
+		RNG.seed(0)
+		from Simulation import Simulation
+		s = Simulation(engine='array')
+		s.map = self.M
+		s.set_diseases([self.t_disease])
+		s.population = self.build_population(50)
+		s.simulate_day()
+
+		#dumps look the same as they do for the object engine
+		assert(s.infection_info_format().count('|') == s.dump_infection_info().count('|'))
+		counts = s.count_disease_states()[self.t_disease]
+		assert(sum(counts.values()) == 50)
+		for state in DISEASE_STATES_LIST:
+			assert(counts[state] == len([p for p in s.population if p.disease_state[self.t_disease] == state]))
+
+		with self.assertRaises(AttributeError):
+			Simulation(engine='gpu')
+		for loc in self.M.loc_list:
+			loc.people.clear()
+
+	def test_talk_sampling(self):
+		RNG.seed(0)
+		p0 = Person(self.tl_home,self.M)
+		p1 = Person(self.tl_home,self.M)
+		p0.disease_state.update({self.t_disease:'S'})
+		p1.disease_state.update({self.t_disease:'S'})
+		pa = PopulationArrays([p0,p1],[self.t_disease],self.M)
+
+		#with only one other person here, Person.talk_to talks to them with probability = affinity, however many
+		#samples we take
+		aff = pa.affinity(np.array([0]),np.array([1]))[0]
+		trials = 4000
+		talked = 0
+		for _ in range(trials):
+			pa.talk_to(np.array([0]))
+			talked += pa.activity[0] == ACT_TALKING
+		assert(abs(talked / trials - aff) < 4 * np.sqrt(aff * (1 - aff) / trials))
+		for loc in self.M.loc_list:
+			loc.people.clear()
+
+	def test_be_intimate(self):
+		RNG.seed(0)
+		people = [Person(self.tl_home,self.M) for _ in range(4)]
+		for p in people:
+			p.disease_state.update({self.t_disease:'S'})
+		for p in people[1:]:
+			people[0].partners.add(p)
+			p.partners.add(people[0])
+		pa = PopulationArrays(people,[self.t_disease],self.M)
+		pa.loc[2:] = (pa.loc[0] + 1) % len(pa.loc_list)#somewhere else
+
+		#only one of the partners is here, so that's who it always has to be
+		for _ in range(20):
+			pa.activity[:] = ACT_IDLE
+			assert(not pa.be_intimate(np.array([0]))[0])
+			assert(pa.target[0] == 1)
+			assert(pa.activity[1] == ACT_INTIMATE)
+		pa.loc[1] = pa.loc[2]
+		assert(pa.be_intimate(np.array([0]))[0])
+		for loc in self.M.loc_list:
+			loc.people.clear()
+
+	'''
+	run both engines from the same seeds and check the epidemic curves come out the same, statistically. the diseases only
+	spread by talking or by being intimate, so the curves depend on ARRAY_TALK_SAMPLES sampling and on how be_intimate
+	picks a partner, rather than on things both engines do the same way
+	'''
+	def test_engines_agree(self):
+		import os
+		import tempfile
+		from scipy import stats
+		from Simulation import Simulation
+		from Map import MapReader
+		from Disease import Disease
+		talk = Disease('talk disease')
+		talk.infectivity = {'idle':0,'sleep':0,'traveling':0,'talking':0.01,'intimate':0}
+		intimate = Disease('intimate disease')
+		intimate.infectivity = {'idle':0,'sleep':0,'traveling':0,'talking':0,'intimate':0.02 - INTIMATE_EFFECT_MODIFIER}
+		diseases = [talk,intimate]
+
+		curves = {'object':[],'array':[]}
+		with tempfile.TemporaryDirectory() as d:
+			for seed in range(12):
+				for engine in curves:
+					fname = os.path.join(d,engine + str(seed) + '.psv')
+					s = Simulation(infodump_file=[fname],infodump_type=['infection'],time_steps_per_infodump=TIME_STEPS_PER_DAY // 6,engine=engine,seed=seed)
+					#a fresh map each time, since building the population shuffles its locations
+					s.read_map_from_image(MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2),'../test_map_small.png')
+					s.set_diseases(diseases)
+					pb = PopulationBuilder(s.map,60)
+					pb.set_diseases_present(diseases)
+					pb.set_partners_distribution(lambda possible: min(possible,3))#several partners, so there's a choice to make
+					s.create_population(pb)
+					for p in s.population[:3]:
+						talk.infect(p)
+					for p in [p for p in s.population if len(p.partners) > 0][:10]:
+						intimate.infect(p)
+					s.simulate_day()
+					s.close_dumps()
+
+					with open(fname) as f:
+						rows = [line.strip().split('|') for line in f]
+					curves[engine].append([[60 - int(row[rows[0].index(disease.name + ' S')]) for row in rows[1:]] for disease in diseases])
+
+		obj = np.array(curves['object'])#[run][disease][time]
+		arr = np.array(curves['array'])
+		for di in range(len(diseases)):
+			assert(obj[:,di,-1].mean() > 2 * obj[:,di,0].mean())#it actually spread
+			#compare the areas under the curves
+			assert(stats.mannwhitneyu(obj[:,di].sum(axis=1),arr[:,di].sum(axis=1)).pvalue > 0.05)
+			assert(stats.mannwhitneyu(obj[:,di,-1],arr[:,di,-1]).pvalue > 0.05)
@@ -15,7 +15,7 @@ class TestPopulationBuilder(TestCase):
 	L_office = M.loc_list[119]  # this is the L-shaped office
 
 	def test_assign_primitive_details(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		p = Person(self.tl_home,self.M)
 		pb = PopulationBuilder(self.M,1)
 		pb.assign_primitive_details(p)
@@ -30,7 +30,7 @@ class TestPopulationBuilder(TestCase):
 		pass
 
 	def test_assign_coworkers(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		people = [Person(self.tl_home,self.M),
 				  Person(self.tl_tl_home,self.M),
 				  Person(self.tl_home,self.M),
@@ -49,7 +49,7 @@ class TestPopulationBuilder(TestCase):
 		pass
 
 	def test_assign_partners(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		people = [Person(self.tl_home, self.M),
 				  Person(self.tl_home, self.M),
 				  Person(self.tl_home, self.M),
@@ -67,7 +67,7 @@ class TestPopulationBuilder(TestCase):
 		pass
 
 	def test_assign_friends(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		people = [Person(self.tl_home, self.M),
 				  Person(self.tl_tl_home, self.M),
 				  Person(self.tl_home, self.M),
@@ -87,7 +87,7 @@ class TestPopulationBuilder(TestCase):
 
 	def test_create_population(self):
 		#BIG MAMMA
-		np.random.seed(0)
+		RNG.seed(0)
 		pb = PopulationBuilder(self.M,100)
 		plist = pb.create_population()
 		for person in plist:
@@ -95,3 +95,99 @@ class TestPopulationBuilder(TestCase):
 				assert(person in person.home.clientele)
 				assert(person in person.home.employees_residents)
 		pass
+
+	def test_precompute_routes(self):
+		RNG.seed(0)
+		self.M.clear_route_cache()
+		pb = PopulationBuilder(self.M,30)
+		pb.set_precompute_routes(True)
+		plist = pb.create_population()
+		assert(len(self.M.route_cache) > 0)
+
+		#everyone's commute is already there
+		misses = self.M.route_cache_misses
+		for person in plist:
+			if (person.home is not None) and (person.workplace is not None) and (person.workplace != person.home):
+				self.M.get_path(person.home,person.workplace)
+				self.M.get_path(person.workplace,person.home)
+		assert(self.M.route_cache_misses == misses)
+		self.M.clear_route_cache()
+
+	def test_assign_ages_and_workplaces(self):
+		from Map import MapReader
+		RNG.seed(0)
+		M = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2).create_map_from_file('../test_map_small.png')
+		pb = PopulationBuilder(M,40)
+		pb.set_age_distribution(lambda: 10)
+		pb.set_school_age_range((5,18))
+		pb.set_max_people_in_school(15)
+		pb.set_homeless_probability(0.25)
+		plist = pb.create_population()
+
+		#the school fills up with people who have homes, then everyone else school aged is made older and gets a job
+		school = M.get_school()
+		in_school = [p for p in plist if p.age == 10 and p.home is not None]#(the school is an office, so people can work there too)
+		assert(len(in_school) == pb.current_school_people == 15)
+		assert(all(p.workplace is school for p in in_school))
+		for p in plist:
+			if p not in in_school:
+				assert((p.age == 28) or (p.home is None))
+				assert((p.workplace is not None) == ((p.home is not None) and (p.age == 28)))
+		assert(any(p.home is None for p in plist))
+
+		#nobody works if everybody's jobless
+		pb = PopulationBuilder(M,10)
+		pb.set_jobless_probability(1.)
+		assert(all(p.workplace is None for p in pb.create_population()))
+
+	def test_reproducible(self):
+		from Map import MapReader
+		from PersonState import Location
+		from Disease import Disease
+		from Simulation import Simulation
+
+		#people, locations and diseases go in sets all over, so the same seed has to give the same city and the same day
+		#(which it can't if set order depends on where in memory everything ended up)
+		def run():
+			Person.PERSON_ID_COUNTER = 0
+			Location.LOCATION_ID_COUNTER = 0
+			Disease.DISEASE_ID_COUNTER = 0
+			s = Simulation(engine='object',seed=5)
+			s.map = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2).create_map_from_file('../test_map_small.png')
+			virus = Disease('virus 0')
+			virus.infectivity = {'idle': 0.5, 'sleep': 0.5, 'traveling': 0.5, 'talking': 0.5, 'intimate': 0.5}
+			s.set_diseases([virus])
+			pb = PopulationBuilder(s.map,60)
+			s.create_population(pb)
+			for p in s.population[:20]:
+				pb.assign_friends(p)
+			built = [(p.id, p.home.id if p.home is not None else None, sorted(l.id for l in p.places),
+					  sorted(q.id for q in p.friends), sorted(q.id for q in p.coworkers)) for p in s.population]
+			s.simulate_day()
+			day = [(p.id, p.currentLocation.id, p.currentActivity.activity_type, p.disease_state[virus]) for p in s.population]
+			return built,day
+
+		first = run()
+		assert(run() == first)
+
+	def test_homeless(self):
+		from Map import MapReader
+		from Simulation import Simulation
+
+		for engine in ['object','array']:
+			s = Simulation(engine=engine,seed=0)
+			s.map = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2).create_map_from_file('../test_map_small.png')
+			s.set_diseases([])
+			pb = PopulationBuilder(s.map,60)
+			pb.set_homeless_probability(0.2)
+			s.create_population(pb)
+			homeless = [p for p in s.population if p.home is None]
+			assert(len(homeless) > 0)
+			for p in homeless:
+				p.sleep_schedule = (tconv('22'),tconv('8'))#so they're asleep when the day ends
+
+			#they've got no home to go to, so they sleep wherever they are
+			s.simulate_day()
+			asleep = [p for p in homeless if p.currentActivity.activity_type == 'sleep']
+			assert(len(asleep) > 0)
+			assert(all(p.currentLocation is not None for p in homeless))
@@ -59,7 +59,7 @@ class TestNetworks(unittest.TestCase):
 		return components
 
 	def test_network_connectedness(self):
-		np.random.seed(0)
+		RNG.seed(0)
 		pb = PopulationBuilder(self.M, 100)
 		plist = pb.create_population()
 
@@ -68,3 +68,85 @@ class TestNetworks(unittest.TestCase):
 		all = self.find_all_connected_components(plist, 'union')
 		pass
 
+	def test_social_distance_index(self):
+		from PersonState import SocialDistanceIndex, calc_bfs_dist
+		RNG.seed(0)
+		pb = PopulationBuilder(self.M, 100)
+		plist = pb.create_population()
+		index = plist[0].social_distances
+		assert(all(p.social_distances is index for p in plist))
+
+		#should agree exactly with the bfs
+		for a in plist[:20]:
+			for b in plist:
+				for edge_type in SocialDistanceIndex.EDGE_TYPES:
+					assert(index.distance(a,b,edge_type) == calc_bfs_dist(a,edge_type,b))
+
+		index.build(plist)
+		assert(len(index) > 0)
+		full_size = index.memory_usage()
+		assert(full_size > 0)
+
+		#dying throws out anything involving the dead person, which gets recalculated (the same) on demand
+		dead = plist[1]
+		knew_dead = [p for p in plist if dead.id in index.get_ego_distances(p,'friend')]
+		dead.die()
+		assert(dead.id not in index.ego_distances['friend'])
+		assert(not any(p.id in index.ego_distances['friend'] for p in knew_dead))
+		assert(index.memory_usage() < full_size)
+		for a in knew_dead:
+			assert(index.distance(a,dead,'friend') == calc_bfs_dist(a,'friend',dead))
+
+		with self.assertRaises(AttributeError):
+			index.distance(plist[0],plist[1],'family')
+		for loc in self.M.loc_list:
+			loc.people.clear()
+
+	def test_bulk_networks(self):
+		from Map import MapReader
+		from PopulationNetworks import PopulationNetworks
+		RNG.seed(0)
+		M = MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2).create_map_from_file('../test_map_small.png')
+		pb = PopulationBuilder(M, 150)
+		pb.set_partners_distribution(lambda num_people_in_house: min(1, num_people_in_house))
+		plist = pb.create_population()
+		networks = pb.networks
+		assert(networks.N == len(plist))
+
+		#everyone's ties are to people they share a workplace, home or place with
+		for p in plist:
+			assert(p not in p.coworkers and p not in p.friends and p not in p.partners)
+			for q in p.coworkers:
+				assert(q.workplace is p.workplace)
+			for q in p.partners:
+				assert(q.home is p.home)
+				assert(p in q.partners)#always both ways
+			for q in p.friends:
+				assert(({p.home} | p.places) & ({q.home} | q.places))
+			assert(len(p.friends) <= 5 + 3*3)#well within the default friends_dist
+		assert(sum(len(p.coworkers) for p in plist) > 0)
+		assert(sum(len(p.friends) for p in plist) > 0)
+		assert(sum(len(p.partners) for p in plist) > 0)
+
+		#the sets are just the arrays
+		for edge_type in ['coworkers', 'friends', 'partners']:
+			matrix = networks.matrix(edge_type)
+			assert(matrix.nnz == sum(len(getattr(p, edge_type)) for p in plist))
+			for i, p in enumerate(plist):
+				assert({plist[j] for j in matrix[i].indices} == getattr(p, edge_type))
+
+		#the array engine can do without the sets
+		from Simulation import Simulation
+		from Disease import Disease
+		RNG.seed(0)
+		pb = PopulationBuilder(M, 60)
+		pb.set_materialize_networks(False)
+		s = Simulation(engine='array')
+		s.map = M
+		s.set_diseases([Disease('virus 0')])
+		s.create_population(pb)
+		assert(all(len(p.coworkers) == len(p.friends) == len(p.partners) == 0 for p in s.population))
+		s.simulate_day()
+		assert(s.population_arrays.friends.nnz == len(s.population_networks.edges['friends'][0]) > 0)
+		with self.assertRaises(AttributeError):
+			s.population_networks.materialize(s.population[1:])
@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+from SINUtil import *
+from PersonState import PopulationBuilder
+from PopulationSnapshot import *
+
+class TestPopulationSnapshot(TestCase):
+
+	def read_map(self,fname='../test_map_small.png'):
+		from Map import MapReader
+		return MapReader(PUBLIC_BLOCK_SIZE=(2, 2), CAPACITY_PER_PIXEL=2, TIME_STEP_PER_PIXEL=2).create_map_from_file(fname)
+
+	def test_save_load(self):
+		import os
+		import tempfile
+		from Disease import Disease
+		RNG.seed(0)
+		M = self.read_map()
+		virus = Disease('virus 0')
+		pb = PopulationBuilder(M, 100)
+		pb.set_school_age_range((5, 18))
+		pb.set_max_people_in_school(10)
+		pb.set_homeless_probability(0.1)
+		pb.set_diseases_present([virus])
+		plist = pb.create_population()
+		plist[3].disease_state.update({virus: 'VU'})
+
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d, 'city.npz')
+			save_population(fname, plist, M, networks=pb.networks)
+
+			#onto the same map, read again from scratch
+			M2 = self.read_map()
+			other = Disease('virus 1')
+			again, networks = load_population(fname, M2, [Disease('virus 0'), other])
+			assert(len(again) == len(plist))
+			i2 = {loc: i for i, loc in enumerate(M2.loc_list)}
+			i1 = {loc: i for i, loc in enumerate(M.loc_list)}
+			index = lambda locs, loc: None if loc is None else locs[loc]
+			pidx = {p: i for i, p in enumerate(plist)}
+			pidx2 = {p: i for i, p in enumerate(again)}
+			for p, q in zip(plist, again):
+				assert(index(i1, p.home) == index(i2, q.home))
+				assert(index(i1, p.workplace) == index(i2, q.workplace))
+				assert(index(i1, p.currentLocation) == index(i2, q.currentLocation))
+				assert((p.age, p.hygiene_coef, p.healthiness, p.work_schedule, p.sleep_schedule) == (q.age, q.hygiene_coef, q.healthiness, q.work_schedule, q.sleep_schedule))
+				assert({i1[l] for l in p.places} == {i2[l] for l in q.places})
+				for edge_type in ['coworkers', 'friends', 'partners']:
+					assert({pidx[o] for o in getattr(p, edge_type)} == {pidx2[o] for o in getattr(q, edge_type)})
+				assert([s for s in p.disease_state.values()] == [s for d, s in q.disease_state.items() if d.name == 'virus 0'])
+				assert(q.disease_state[other] in ['S', 'VS', 'VU'])
+			assert(M2.get_school() is M2.loc_list[i1[M.get_school()]])
+			assert(all(a.capacity == b.capacity and a.avg_age == b.avg_age for a, b in zip(M.loc_list, M2.loc_list)))
+			assert(networks.matrix('friends').nnz == pb.networks.matrix('friends').nnz)
+
+			#a simulation can run straight off it
+			from Simulation import Simulation
+			s = Simulation(engine='array')
+			s.map = self.read_map()
+			s.set_diseases([Disease('virus 0')])
+			s.load_population(fname, materialize_networks=False)
+			assert(len(s.population) == 100)
+			assert(all(len(p.friends) == 0 for p in s.population))
+			s.simulate_day()
+			assert(s.population_arrays.friends.nnz == networks.matrix('friends').nnz)
+
+			#not on some other map
+			with self.assertRaises(AttributeError):
+				M3 = self.read_map()
+				M3.loc_list = M3.loc_list[1:]
+				load_population(fname, M3)
+
+	def test_reset(self):
+		from Disease import Disease
+		from Simulation import Simulation
+		for engine in ['object', 'array']:
+			RNG.seed(0)
+			deadly = Disease('deadly')
+			deadly.infectivity = {'idle': 1, 'sleep': 1, 'traveling': 1, 'talking': 1, 'intimate': 1}
+			deadly.symptom_show_rate = 1
+			deadly.die_probability = 1
+			deadly.vaccination_rate = 0.3
+			s = Simulation(engine=engine)
+			s.map = self.read_map()
+			s.set_diseases([deadly])
+			s.create_population(PopulationBuilder(s.map, 60))
+			s.population[-1].die()#anyone who started out dead stays that way
+			s.save_initial_state()
+			start = [(p.currentLocation, p.disease_state[deadly]) for p in s.population]
+			assert(any(state == 'VU' or state == 'VS' for _, state in start))
+
+			s.full_simulation(time_limit=2)
+			assert(s.current_time > 0)
+			assert(any(p.disease_state[deadly] not in ['S', 'VS', 'VU'] for p in s.population))
+			arrays = s.population_arrays
+
+			s.reset()
+			assert(s.current_time == 0)
+			assert(s.diseases == [deadly])
+			assert([(p.currentLocation, p.disease_state[deadly]) for p in s.population] == start)
+			assert(all(p.currentActivity.activity_type == 'idle' and len(p.infected_by) == 0 for p in s.population))
+			assert([p.is_dead for p in s.population] == [False]*59 + [True])
+			for p in s.population:
+				assert(p in p.currentLocation.people)
+				assert((p in p.home.employees_residents) != p.is_dead)
+			assert(sum(len(loc.people) for loc in s.map.loc_list) == 60)
+			assert(s.get_disease_state_counts().count(deadly, ['S', 'VS', 'VU']) == 60)
+			if engine == 'array':
+				assert(s.population_arrays is arrays)
+				assert(arrays.alive[:-1].all() and (not arrays.alive[-1]) and (arrays.activity == 0).all())
+
+			#and again, from the same start
+			s.full_simulation(time_limit=1)
+			assert(s.current_time == TIME_STEPS_PER_DAY)
+			assert(any(p.disease_state[deadly] not in ['S', 'VS', 'VU'] for p in s.population))
+
+		with self.assertRaises(AttributeError):
+			s.population = s.population[1:]
+			s.reset()
+
+	def test_state_order(self):
+		import os
+		import tempfile
+		import PopulationSnapshot
+		from Disease import Disease
+		RNG.seed(0)
+		M = self.read_map()
+		virus = Disease('virus 0')
+		virus.vaccination_rate = 0.5
+		pb = PopulationBuilder(M, 40)
+		pb.set_diseases_present([virus])
+		plist = pb.create_population()
+		before = [p.disease_state[virus] for p in plist]
+		assert(len(set(before)) > 1)
+
+		#another process can have the states in any other order
+		with tempfile.TemporaryDirectory() as d:
+			fname = os.path.join(d, 'city.npz')
+			original = PopulationSnapshot.DISEASE_STATES_LIST
+			try:
+				PopulationSnapshot.DISEASE_STATES_LIST = list(reversed(original))
+				save_population(fname, plist, M)
+			finally:
+				PopulationSnapshot.DISEASE_STATES_LIST = original
+			again, _ = load_population(fname, self.read_map(), [Disease('virus 0')])
+			assert([list(p.disease_state.values())[0] for p in again] == before)
@@ -11,15 +11,33 @@ def is_sorted_rev(a):
 class TestUtils(TestCase):
 
 	def test_stoch_sort(self):
-		np.random.seed(0)#determinism
+		RNG.seed(0)#determinism
 		a = list(range(10))
-		np.random.shuffle(a)
+		RNG.shuffle(a)
 
 		aa = stoch_sort(a,levels=100)#should sort the array in descending order
 		assert(is_sorted_rev(aa))
 
 		#just regression for this
 		a = list(range(10))
-		np.random.shuffle(a)
+		RNG.shuffle(a)
 		aa = stoch_sort(a,levels=1)
-		assert(aa == [9,8,7,6,5,0,2,3,1,4])
\ No newline at end of file
+		assert(aa == [6,8,4,5,7,3,9,2,1,0])
+
+	def test_random_pool(self):
+		pool = RandomPool(seed=0,block_size=16)
+		first = [pool.random() for _ in range(40)]#goes through a few blocks
+		pool.seed(0)
+		assert([pool.random() for _ in range(40)] == first)#seeding starts over
+
+		assert(not any(pool.coinflip(0) for _ in range(100)))
+		assert(all(pool.coinflip(1) for _ in range(100)))
+		flips = pool.coinflips(np.array([[0.,1.],[-1.,2.]]))
+		assert(flips.shape == (2,2))
+		assert(list(flips.flatten()) == [False,True,False,True])
+		assert(abs(pool.coinflips(np.full(10000,0.3)).mean() - 0.3) < 0.05)
+
+		assert(all(0 <= pool.integer(0,3) < 3 for _ in range(100)))
+		assert(pool.choice(['a']) == 'a')
+		picked = pool.choices(['a','b'],5)
+		assert((len(picked) == 5) and set(picked) <= {'a','b'})